@@ -23,8 +23,9 @@ from starlette.responses import StreamingResponse
 
 # --- CẤU HÌNH ---
 load_dotenv()
-FRAUD_API_URL = "https://fraudgraphml-2nz2.onrender.com/analyze"
-ETHERSCAN_API_URL = "https://api.etherscan.io/api"
+# Có thể trỏ sang server giả lập cục bộ (Model/benchmarks/mock_upstream.py) qua biến môi trường
+FRAUD_API_URL = os.getenv("FRAUD_API_URL", "https://fraudgraphml-2nz2.onrender.com/analyze")
+ETHERSCAN_API_URL = os.getenv("ETHERSCAN_API_URL", "https://api.etherscan.io/api")
 ETHERSCAN_API_KEY = os.getenv("ETHERSCAN_API_KEY")
 
 SUSPICIOUS_LOWER_BOUND = 0.45
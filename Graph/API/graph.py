@@ -16,8 +16,8 @@ import pandas as pd
 
 # --- CẤU HÌNH ---
 load_dotenv()
-FRAUD_API_URL = "http://127.0.0.1:8000/analyze"
-ETHERSCAN_API_URL = "https://api.etherscan.io/api"
+FRAUD_API_URL = os.getenv("FRAUD_API_URL", "http://127.0.0.1:8000/analyze")
+ETHERSCAN_API_URL = os.getenv("ETHERSCAN_API_URL", "https://api.etherscan.io/api")
 ETHERSCAN_API_KEY = os.getenv("ETHERSCAN_API_KEY")
 
 # Khoảng xác suất được coi là "Nghi ngờ"
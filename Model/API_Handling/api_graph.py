@@ -1,56 +1,56 @@
 # FILE: api_graph.py (PHIÊN BẢN HOÀN CHỈNH CUỐI CÙNG)
 # Version: 2.0.5 - Thêm cơ chế thử lại cho các địa chỉ bị lỗi
 
+# requests, networkx, matplotlib, mpl_toolkits và pandas chỉ được import trong hàm dùng chúng (lần gọi /graph
+# đầu tiên) để worker khởi động nhanh; đo bằng Model/benchmarks/startup_profile.py api_graph
+
 import os
-import requests
-import networkx as nx
-import matplotlib.pyplot as plt
 import asyncio
 import httpx
 from dotenv import load_dotenv
 from tqdm.asyncio import tqdm
 from typing import List, Dict, Any, Optional
-import matplotlib.lines as mlines
-import numpy as np
-from mpl_toolkits.mplot3d import Axes3D
 import math
 from datetime import datetime
-import pandas as pd
 import io
 import zipfile
 import traceback
 
 # --- FastAPI Imports ---
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Depends, Request
 from pydantic import BaseModel
 from starlette.responses import StreamingResponse
 
 # ======> IMPORT LOGIC CỐT LÕI TỪ CÁC FILE CỤC BỘ <======
-from model import load_artifacts, predict_address
-from feature_engineering_api import analyze_wallet_address
+from feature_engineering_api import analyze_wallet_addresses, WalletAnalysisResult
+from covalent_client import covalent_client_lifespan, get_covalent_client
+from model_server import model_service, service_lifespan, add_health_routes, encode_rows
+from prediction_cache import PREDICTION_CACHE, bypass_requested
 
 # --- CẤU HÌNH ---
 load_dotenv()
-ETHERSCAN_API_URL = "https://api.etherscan.io/api"
+# Có thể trỏ sang server giả lập cục bộ (Model/benchmarks/mock_upstream.py) qua biến môi trường
+ETHERSCAN_API_URL = os.getenv("ETHERSCAN_API_URL", "https://api.etherscan.io/api")
 ETHERSCAN_API_KEY = os.getenv("ETHERSCAN_API_KEY")
 COVALENT_API_KEY = os.getenv("COVALENT_API_KEY")
 
 SUSPICIOUS_LOWER_BOUND = 0.45
 SUSPICIOUS_UPPER_BOUND = 0.55
-SEMAPHORE = asyncio.Semaphore(4)
+
+# ======> MÔ HÌNH CỤC BỘ, NẠP NỀN KHI KHỞI ĐỘNG <======
+# Phiên bản được đổi nóng khi CURRENT của registry thay đổi; MODEL_SERVER_SOCKET: dùng model server chung.
+# /readyz trả 200 khi mô hình đã nạp xong (MODEL_LOAD=eager: nạp ngay lúc import)
+MODEL = model_service()
 
 # --- KHỞI TẠO ỨNG DỤNG FastAPI ---
 app = FastAPI(
     title="Ethereum Transaction Graph API (Local Model)",
     description="Một API để phân tích các giao dịch của một địa chỉ ví Ethereum, tạo báo cáo CSV và biểu đồ mạng lưới bằng mô hình GNN cục bộ.",
-    version="2.0.5"
+    version="2.0.5",
+    # Một pool kết nối Covalent cho toàn bộ fan-out của /graph + watcher của registry mô hình
+    lifespan=service_lifespan(MODEL, covalent_client_lifespan)
 )
-
-# ======> TẢI MÔ HÌNH CỤC BỘ KHI KHỞI ĐỘNG <======
-print("🚀 Đang tải các tạo tác của mô hình...")
-MODEL_ARTIFACTS_DIR = '../Model/'
-MODEL, PIPELINE, feat_names = load_artifacts(MODEL_ARTIFACTS_DIR)
-print("✅ Tải mô hình thành công.")
+add_health_routes(app, MODEL)
 
 
 # --- MÔ HÌNH DỮ LIỆU ĐẦU VÀO (Pydantic) ---
@@ -59,23 +59,82 @@ class AnalysisRequest(BaseModel):
 
 
 # --- CÁC HÀM XỬ LÝ ---
-async def get_local_fraud_prediction(address: str) -> Optional[Dict[str, Any]]:
-    """Lấy đặc trưng từ Covalent và dự đoán bằng mô hình GNN cục bộ."""
-    async with SEMAPHORE:
-        try:
-            features = await analyze_wallet_address(address)
-            if features is None:
-                # Không in lỗi ở đây để tránh nhiễu log, hàm gọi sẽ xử lý
-                return None
-
-            status, confidence, percent = predict_address(MODEL, PIPELINE, features, feat_names)
-            probability_fraud = (percent / 100) if status == 'fraud' else (1 - percent / 100)
-            return {"address": address, "prediction": status, "probability_fraud": probability_fraud}
-        except Exception as e:
-            # Ghi lại lỗi chi tiết nhưng vẫn trả về None để cơ chế retry hoạt động
-            print(f"Lỗi ngoại lệ không mong muốn khi dự đoán {address[:10]}: {e}")
-            traceback.print_exc()
-            return None
+def prediction_row(address: str, status: str, confidence: float, percent: float, model_version: str) -> Dict[str, Any]:
+    probability_fraud = (percent / 100) if status == 'fraud' else (1 - percent / 100)
+    return {"address": address, "prediction": status, "probability_fraud": probability_fraud,
+            "confidence": confidence, "model_version": model_version}
+
+
+def get_local_fraud_prediction(result: WalletAnalysisResult) -> Optional[Dict[str, Any]]:
+    """Dự đoán bằng mô hình GNN cục bộ từ đặc trưng đã lấy được từ Covalent."""
+    if result.vector is None:
+        # Không in lỗi ở đây để tránh nhiễu log, hàm gọi sẽ xử lý
+        return None
+    try:
+        return prediction_row(result.address, *MODEL.predict([result.vector])[0])
+    except Exception as e:
+        # Ghi lại lỗi chi tiết nhưng vẫn trả về None để cơ chế retry hoạt động
+        print(f"Lỗi ngoại lệ không mong muốn khi dự đoán {result.address[:10]}: {e}")
+        traceback.print_exc()
+        return None
+
+def get_local_fraud_predictions(results: List[WalletAnalysisResult]) -> List[Optional[Dict[str, Any]]]:
+    """
+    Dự đoán cả lô bằng một lần pipeline.transform + forward pass (model.predict_addresses, qua MODEL).
+    Nếu cả lô lỗi thì dự đoán lại từng địa chỉ để chỉ những địa chỉ hỏng phải thử lại.
+    """
+    ready = [result for result in results if result.vector is not None]
+    try:
+        outputs = MODEL.predict([result.vector for result in ready])
+    except Exception as e:
+        print(f"Lỗi khi dự đoán theo lô ({type(e).__name__}: {e}), chuyển sang dự đoán từng địa chỉ.")
+        return [get_local_fraud_prediction(result) for result in results]
+    predictions = {id(result): prediction_row(result.address, *output) for result, output in zip(ready, outputs)}
+    return [predictions.get(id(result)) for result in results]
+
+
+def last_seen_blocks(transactions: List[Dict[str, Any]]) -> Dict[str, int]:
+    """Block cao nhất mà mỗi địa chỉ (viết thường) xuất hiện trong danh sách giao dịch Etherscan."""
+    blocks: Dict[str, int] = {}
+    for tx in transactions:
+        block = int(tx.get('blockNumber') or 0)
+        for addr in (tx.get('from'), tx.get('to')):
+            if addr:
+                blocks[addr.lower()] = max(blocks.get(addr.lower(), 0), block)
+    return blocks
+
+
+async def cached_predictions(addresses: List[str], transactions: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    """
+    Dự đoán trong cache (xem prediction_cache.py) cho các địa chỉ đã gặp: chỉ dùng mục còn trong hạn tươi và
+    đã tính từ một block không cũ hơn giao dịch mới nhất của địa chỉ đó trong đồ thị, nên không cần gọi Covalent.
+    """
+    blocks = last_seen_blocks(transactions)
+
+    def lookup():
+        # Hỏi phiên bản hiện tại (model server có thể vừa nạp lại nóng) rồi mới đọc cache theo phiên bản đó
+        model_version = MODEL.current_version()
+        return [PREDICTION_CACHE.get(address, model_version) for address in addresses]
+    entries = await asyncio.to_thread(lookup)
+    hits = {}
+    for address, entry in zip(addresses, entries):
+        if (entry is not None and PREDICTION_CACHE.is_fresh(entry)
+                and entry.last_seen_block >= blocks.get(address, 0)):
+            PREDICTION_CACHE.stats.hits += 1
+            hits[address] = prediction_row(address, *entry.payload["prediction"], entry.model_version)
+        else:
+            PREDICTION_CACHE.stats.misses += 1
+    return hits
+
+
+async def remember_predictions(analyses: List[WalletAnalysisResult], results: List[Optional[Dict[str, Any]]]) -> None:
+    if PREDICTION_CACHE is None:
+        return
+    for analysis, result in zip(analyses, results):
+        if result:
+            await PREDICTION_CACHE.store(analysis.address, result["model_version"], analysis.last_block, {
+                "prediction": [result["prediction"], result["confidence"], result["confidence"] * 100],
+                "partial": analysis.partial, "vector": encode_rows([analysis.vector])[0]})
 
 def fibonacci_sphere(samples: int):
     """Tạo các điểm phân bố đều trên một hình cầu."""
@@ -102,6 +161,7 @@ def get_node_color(prediction_result: Optional[Dict[str, Any]]) -> str:
 
 def get_transactions(address: str) -> List[Dict[str, Any]]:
     """Lấy danh sách giao dịch từ Etherscan."""
+    import requests
     print(f"\n🔍 Đang lấy giao dịch cho địa chỉ: {address}")
     params = {"module": "account", "action": "txlist", "address": address, "startblock": 0, "endblock": 99999999,
               "sort": "asc", "apikey": ETHERSCAN_API_KEY}
@@ -123,6 +183,7 @@ def get_transactions(address: str) -> List[Dict[str, Any]]:
 def export_transactions_to_csv_buffer(transactions: List[Dict[str, Any]], predictions: Dict[str, Dict[str, Any]],
                                       central_address: str) -> io.StringIO:
     # ... (Hàm này không thay đổi)
+    import pandas as pd
     print(f"\n📄 Đang làm giàu dữ liệu và tạo buffer CSV chi tiết...")
     processed_data = []
     central_address_lower = central_address.lower()
@@ -184,6 +245,11 @@ def export_transactions_to_csv_buffer(transactions: List[Dict[str, Any]], predic
 def draw_transaction_graph_to_buffer(central_address: str, transactions: List[Dict[str, Any]],
                                      predictions: Dict[str, Dict]) -> Optional[io.BytesIO]:
     # ... (Hàm này không thay đổi)
+    import matplotlib.lines as mlines
+    import matplotlib.pyplot as plt
+    import networkx as nx
+    import numpy as np
+    from mpl_toolkits.mplot3d import Axes3D  # noqa: F401  (đăng ký projection='3d')
     print("\n🎨 Đang vẽ biểu đồ hình cầu 3D vào buffer...")
     central_address = central_address.lower()
     G = nx.DiGraph()
@@ -233,14 +299,20 @@ def draw_transaction_graph_to_buffer(central_address: str, transactions: List[Di
 
 
 @app.post("/graph")
-async def create_graph_analysis(request: AnalysisRequest):
-    """Endpoint chính: Nhận địa chỉ, phân tích và trả về file zip chứa kết quả."""
+async def create_graph_analysis(request: AnalysisRequest, http_request: Request,
+                                client: httpx.AsyncClient = Depends(get_covalent_client)):
+    """
+    Endpoint chính: Nhận địa chỉ, phân tích và trả về file zip chứa kết quả.
+    Đối tác đã có dự đoán còn tươi trong cache không được phân tích lại (header X-Prediction-Cache: bypass để tắt).
+    """
     if not ETHERSCAN_API_KEY or not COVALENT_API_KEY:
         raise HTTPException(status_code=500,
                             detail="LỖI: Biến môi trường ETHERSCAN_API_KEY hoặc COVALENT_API_KEY chưa được thiết lập trên máy chủ.")
     central_address = request.address.strip()
     if not central_address:
         raise HTTPException(status_code=400, detail="Địa chỉ không được để trống.")
+    # 503 trước khi gọi Etherscan/Covalent: lỗi dự đoán khác bị vòng thử lại bên dưới nuốt mất
+    MODEL.require_ready()
     transactions = get_transactions(central_address)
     if not transactions:
         raise HTTPException(status_code=404, detail=f"Không tìm thấy giao dịch nào cho địa chỉ: {central_address}")
@@ -253,27 +325,40 @@ async def create_graph_analysis(request: AnalysisRequest):
 
     predictions = {}
     addresses_to_process = list(unique_addresses)
+    bypass = bypass_requested(http_request.headers)
+    # Tra cache dự đoán trước khi xếp bất kỳ request Covalent nào
+    if PREDICTION_CACHE is not None and not bypass:
+        predictions.update(await cached_predictions(addresses_to_process, transactions))
+        addresses_to_process = [address for address in addresses_to_process if address not in predictions]
+        print(f"💾 {len(predictions)} địa chỉ có dự đoán trong cache.")
+    cached_count = len(predictions)
     max_attempts = 5  # Số lần thử lại tối đa
     attempt_num = 1
 
     while addresses_to_process and attempt_num <= max_attempts:
         print(f"\n🔄 Bắt đầu lượt thử thứ {attempt_num}/{max_attempts} cho {len(addresses_to_process)} địa chỉ...")
 
-        tasks = [get_local_fraud_prediction(addr) for addr in addresses_to_process]
         desc = f"Lượt {attempt_num}/{max_attempts} | Đang dự đoán {len(addresses_to_process)} địa chỉ"
-        results = await tqdm.gather(*tasks, desc=desc)
-
         failed_addresses_for_next_round = []
 
-        # Liên kết kết quả với địa chỉ ban đầu
-        for address, result in zip(addresses_to_process, results):
-            if result and 'address' in result:
+        # Cả lô đi qua bộ lập lịch fetch dùng chung; kết quả về theo thứ tự hoàn thành
+        analyses = []
+        with tqdm(total=len(addresses_to_process), desc=desc) as progress:
+            async for analysis in analyze_wallet_addresses(addresses_to_process, client, fresh=bypass):
+                analyses.append(analysis)
+                progress.update(1)
+
+        # Dự đoán cả lượt bằng một lần gọi mô hình thay vì từng địa chỉ, trong luồng riêng để lượt suy luận
+        # (hoặc lượt hỏi-đáp qua socket tới model server) không chặn event loop
+        results = await asyncio.to_thread(get_local_fraud_predictions, analyses)
+        await remember_predictions(analyses, results)
+        for analysis, result in zip(analyses, results):
+            if result:
                 # Nếu thành công, lưu kết quả
-                addr_lower = result['address'].lower()
-                predictions[addr_lower] = result
+                predictions[result['address'].lower()] = result
             else:
                 # Nếu thất bại, thêm vào danh sách để thử lại
-                failed_addresses_for_next_round.append(address)
+                failed_addresses_for_next_round.append(analysis.address)
 
         # Cập nhật danh sách các địa chỉ cần xử lý cho lần lặp tiếp theo
         addresses_to_process = failed_addresses_for_next_round
@@ -308,7 +393,10 @@ async def create_graph_analysis(request: AnalysisRequest):
             zf.writestr("transaction_graph.png", image_buffer.getvalue())
     zip_buffer.seek(0)
 
-    headers = {'Content-Disposition': f'attachment; filename="analysis_results_{central_address[:10]}.zip"'}
+    # Các lượt thử lại có thể rơi vào hai phiên bản nếu mô hình được đổi giữa chừng
+    model_versions = sorted({p["model_version"] for p in predictions.values()}) or [MODEL.version]
+    headers = {'Content-Disposition': f'attachment; filename="analysis_results_{central_address[:10]}.zip"',
+               'X-Model-Version': ",".join(model_versions), 'X-Prediction-Cache-Hits': str(cached_count)}
     return StreamingResponse(zip_buffer, media_type="application/x-zip-compressed", headers=headers)
 
 
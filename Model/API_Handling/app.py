@@ -2,59 +2,298 @@
 
 import os
 import asyncio
-from fastapi import FastAPI, HTTPException
+import httpx
+import json
+from typing import List, Optional, Tuple
+from fastapi import FastAPI, HTTPException, Depends, Request, Response
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from model import load_artifacts, predict_address, explain_address
-from feature_engineering_api import analyze_wallet_address
+from feature_engineering_api import (analyze_wallet, analyze_wallet_addresses, fetch_stats, fetch_latest_block,
+                                     get_tx_cache, ANALYSIS_FLIGHTS, WalletAnalysisResult)
+from covalent_client import covalent_client_lifespan, get_covalent_client
+from inference_batcher import MicroBatcher
+from model_server import (model_service, service_lifespan, add_health_routes, require_admin, encode_rows,
+                          decode_rows)
+from prediction_cache import PREDICTION_CACHE, BYPASS_HEADER, CachedPrediction, bypass_requested
+
+# Registry mô hình có phiên bản, nạp lại nóng (xem model_registry.py): ngay trong worker này, hoặc trong
+# model server dùng chung nếu đặt MODEL_SERVER_SOCKET (xem model_server.py). Nạp trong nền khi app khởi
+# động; tới lúc đó /readyz và các endpoint cần mô hình trả 503 (MODEL_LOAD=eager: nạp ngay lúc import).
+MODEL = model_service()
 
 app = FastAPI(
     title="Ethereum Address Analysis API (Simple)",
     description="Một API đơn giản để phân tích và giải thích dự đoán cho một địa chỉ ví Ethereum.",
-    version="1.2.0"  # Cập nhật phiên bản
+    version="1.2.0",  # Cập nhật phiên bản
+    # Pool kết nối Covalent dùng chung (đóng khi tắt server) + watcher của registry mô hình
+    lifespan=service_lifespan(MODEL, covalent_client_lifespan)
+)
+add_health_routes(app, MODEL)
+
+
+@app.middleware("http")
+async def model_version_header(request: Request, call_next):
+    response = await call_next(request)
+    if MODEL.ready:
+        response.headers["X-Model-Version"] = MODEL.version
+    return response
+
+# Số địa chỉ tối đa trong một request /analyze/batch
+MAX_BATCH_SIZE = int(os.getenv("MAX_BATCH_SIZE", "500"))
+
+# Các dự đoán đồng thời (nhiều request /analyze, các địa chỉ của /analyze/batch) được gom thành
+# một lần pipeline.transform + forward pass; mỗi kết quả kèm phiên bản mô hình đã dự đoán
+PREDICTION_BATCHER = MicroBatcher(
+    lambda rows: MODEL.predict(rows),
+    max_batch_size=int(os.getenv("INFERENCE_MAX_BATCH", "256")),
+    max_wait_ms=float(os.getenv("INFERENCE_MAX_WAIT_MS", "2")),
 )
+# Giải thích đồng thời cũng được gom lô: một lần tiền xử lý + một lượt lan truyền ngược
+EXPLAIN_BATCHER = MicroBatcher(
+    lambda rows: MODEL.explain(rows),
+    max_batch_size=int(os.getenv("INFERENCE_MAX_BATCH", "256")),
+    max_wait_ms=float(os.getenv("INFERENCE_MAX_WAIT_MS", "2")),
+)
+
+
+async def neighborhood_prediction(result):
+    """Dự đoán của ví khi được nối vào đồ thị tham chiếu, hoặc None nếu không có đồ thị tham chiếu."""
+    return (await asyncio.to_thread(MODEL.neighborhood, [result.vector]))[0]
+
+
+async def current_model_version() -> str:
+    """
+    Phiên bản đang phục vụ, hỏi lại model server nếu dùng MODEL_SERVER_SOCKET: MODEL.version của ModelClient
+    chỉ đổi khi có câu trả lời khác về, nên ngay sau khi server nạp lại nóng nó vẫn là phiên bản cũ.
+    """
+    return await asyncio.to_thread(MODEL.current_version)
 
-# Chỉ định đường dẫn và gọi hàm load_artifacts đúng cách
-MODEL_ARTIFACTS_DIR = '../Model/'
-model, pipeline, feat_names = load_artifacts(MODEL_ARTIFACTS_DIR)
-print("✅ Tải mô hình và pipeline cho app.py thành công.")
+
+async def cached_prediction(address: str, request: Request, client: httpx.AsyncClient,
+                            model_version: Optional[str] = None) -> Tuple[Optional[CachedPrediction], str]:
+    """Mục dùng được trong cache dự đoán (xem prediction_cache.py) và trạng thái: hit | revalidated | miss | bypass | off."""
+    if PREDICTION_CACHE is None:
+        return None, "off"
+    if bypass_requested(request.headers):
+        PREDICTION_CACHE.stats.bypassed += 1
+        return None, "bypass"
+    if model_version is None:
+        model_version = await current_model_version()
+    return await PREDICTION_CACHE.lookup(address, model_version, lambda: fetch_latest_block(address, client))
+
+
+def cached_result(address: str, entry: CachedPrediction) -> WalletAnalysisResult:
+    """Dựng lại kết quả phân tích từ mục cache (không gọi Covalent)."""
+    return WalletAnalysisResult(address, vector=decode_rows([entry.payload["vector"]])[0],
+                                partial=entry.payload["partial"], last_block=entry.last_seen_block)
+
+
+async def remember_prediction(result: WalletAnalysisResult, prediction: tuple) -> None:
+    if PREDICTION_CACHE is not None:
+        status, confidence, percent, model_version = prediction
+        await PREDICTION_CACHE.store(result.address, model_version, result.last_block, {
+            "prediction": [status, confidence, percent], "partial": result.partial,
+            "vector": encode_rows([result.vector])[0]})
+
+
+async def predict(result: WalletAnalysisResult, entry: Optional[CachedPrediction]) -> tuple:
+    """Dự đoán trong cache nếu có, không thì qua PREDICTION_BATCHER rồi ghi vào cache."""
+    if entry is not None:
+        return (*entry.payload["prediction"], entry.model_version)
+    prediction = await PREDICTION_BATCHER.submit(result.vector)
+    await remember_prediction(result, prediction)
+    return prediction
 
 
 class AddressRequest(BaseModel):
     address: str
 
 
+class BatchAddressRequest(BaseModel):
+    addresses: List[str]
+
+
+class ReloadRequest(BaseModel):
+    version: Optional[str] = None   # mặc định: phiên bản trong CURRENT của registry
+    force: bool = False
+
+
+async def no_explanation():
+    return None
+
+
 @app.post("/analyze")
-async def analyze(req: AddressRequest):
-    """Phân tích một địa chỉ và trả về dự đoán gian lận."""
-    features = await analyze_wallet_address(req.address)
-    if features is None:
-        raise HTTPException(status_code=404, detail=f"Không lấy được dữ liệu cho địa chỉ {req.address}")
+async def analyze(req: AddressRequest, request: Request, response: Response, explain: bool = False,
+                  client: httpx.AsyncClient = Depends(get_covalent_client)):
+    """
+    Phân tích một địa chỉ và trả về dự đoán gian lận.
+    explain=true: thêm giải thích (như /explain) tính từ cùng một lần lấy dữ liệu ví, trong trường `explanation`
+    với model_version của riêng nó (dự đoán có thể đến từ cache, tức từ một phiên bản trước).
+    Ví chưa có giao dịch mới kể từ lần dự đoán trước được trả lời từ cache dự đoán; header
+    X-Prediction-Cache của response cho biết hit/revalidated/miss, gửi X-Prediction-Cache: bypass để tính lại.
+    """
+    entry, cache_status = await cached_prediction(req.address, request, client)
+    response.headers[BYPASS_HEADER] = cache_status
+    if entry is not None:
+        result = cached_result(req.address, entry)
+    else:
+        result = await analyze_wallet(req.address, client, fresh=bypass_requested(request.headers))
+        if result.vector is None:
+            raise HTTPException(status_code=404, detail=f"Không lấy được dữ liệu cho địa chỉ {req.address}")
 
-    # <<< THAY ĐỔI QUAN TRỌNG: Thêm `feat_names` vào lệnh gọi hàm >>>
-    status, confidence, percent = predict_address(model, pipeline, features, feat_names)
+    (status, confidence, percent, model_version), neighborhood, explanation = await asyncio.gather(
+        predict(result, entry), neighborhood_prediction(result),
+        EXPLAIN_BATCHER.submit(result.vector) if explain else no_explanation())
 
-    return {
+    body = {
         "status": status,
         "percent": round(percent, 2),
         "address": req.address,
-        "confidence_score": round(confidence, 4)
+        "confidence_score": round(confidence, 4),
+        "partial": result.partial,  # True nếu lịch sử giao dịch bị cắt (trang lỗi hoặc giới hạn số trang)
+        "model_version": model_version,
+        "neighborhood": neighborhood
     }
+    if explanation is not None:
+        body["explanation"] = explanation
+    return body
+
+
+@app.post("/analyze/batch")
+async def analyze_batch(req: BatchAddressRequest, request: Request,
+                        client: httpx.AsyncClient = Depends(get_covalent_client)):
+    """
+    Phân tích nhiều địa chỉ; trả về NDJSON, mỗi dòng là kết quả của một địa chỉ ngay khi nó xong.
+    Địa chỉ thất bại có dòng riêng với trường `error` thay vì làm hỏng cả lô.
+    Địa chỉ có trong cache dự đoán được trả trước, không gọi lại Covalent; trường `cache` của mỗi dòng
+    là trạng thái cache của nó (như header X-Prediction-Cache của /analyze).
+    """
+    if not req.addresses:
+        raise HTTPException(status_code=400, detail="Danh sách địa chỉ không được để trống.")
+    if len(req.addresses) > MAX_BATCH_SIZE:
+        raise HTTPException(status_code=400, detail=f"Tối đa {MAX_BATCH_SIZE} địa chỉ mỗi lô.")
+    MODEL.require_ready()   # 503 ngay thay vì một dòng lỗi cho mỗi địa chỉ giữa luồng NDJSON
+
+    async def predict_line(result, entry=None, cache_status="miss"):
+        try:
+            (status, confidence, percent, model_version), neighborhood = await asyncio.gather(
+                predict(result, entry), neighborhood_prediction(result))
+        except Exception as e:
+            return {"address": result.address, "error": f"{type(e).__name__}: {e}"}
+        return {
+            "status": status,
+            "percent": round(percent, 2),
+            "address": result.address,
+            "confidence_score": round(confidence, 4),
+            "partial": result.partial,
+            "model_version": model_version,
+            "neighborhood": neighborhood,
+            "cache": cache_status
+        }
+
+    async def results():
+        # Tra cache trước (chỉ ví đã quá hạn tươi mới tốn một request trang mới nhất), ví trong cache trả ngay
+        addresses = list(dict.fromkeys(req.addresses))
+        model_version = await current_model_version() if PREDICTION_CACHE is not None else None
+        lookups = await asyncio.gather(*(cached_prediction(address, request, client, model_version)
+                                         for address in addresses))
+        misses = []
+        for address, (entry, cache_status) in zip(addresses, lookups):
+            if entry is None:
+                misses.append((address, cache_status))
+            else:
+                yield json.dumps(await predict_line(cached_result(address, entry), entry, cache_status),
+                                 ensure_ascii=False) + "\n"
+        miss_status = dict(misses)
+
+        # Dự đoán chạy nền qua PREDICTION_BATCHER để các ví xong gần nhau được gom chung một lô
+        predicting = set()
+        async for result in analyze_wallet_addresses(miss_status, client, fresh=bypass_requested(request.headers)):
+            if result.vector is None:
+                yield json.dumps({"address": result.address, "error": result.error}, ensure_ascii=False) + "\n"
+            else:
+                predicting.add(asyncio.create_task(predict_line(result, cache_status=miss_status[result.address])))
+            done = {task for task in predicting if task.done()}
+            predicting -= done
+            for task in done:
+                yield json.dumps(task.result(), ensure_ascii=False) + "\n"
+        for task in asyncio.as_completed(predicting):
+            yield json.dumps(await task, ensure_ascii=False) + "\n"
+
+    return StreamingResponse(results(), media_type="application/x-ndjson")
 
 
 @app.post("/explain")
-async def explain(req: AddressRequest):
+async def explain(req: AddressRequest, request: Request, response: Response,
+                  client: httpx.AsyncClient = Depends(get_covalent_client)):
     """Giải thích các đặc trưng quan trọng nhất cho dự đoán của một địa chỉ."""
-    features = await analyze_wallet_address(req.address)
-    if features is None:
-        raise HTTPException(status_code=404, detail=f"Không lấy được dữ liệu cho địa chỉ {req.address}")
+    # Mục cache dự đoán giữ cả vector đặc trưng nên giải thích cũng không cần gọi lại Covalent
+    entry, cache_status = await cached_prediction(req.address, request, client)
+    response.headers[BYPASS_HEADER] = cache_status
+    if entry is not None:
+        result = cached_result(req.address, entry)
+    else:
+        result = await analyze_wallet(req.address, client, fresh=bypass_requested(request.headers))
+        if result.vector is None:
+            raise HTTPException(status_code=404, detail=f"Không lấy được dữ liệu cho địa chỉ {req.address}")
 
-    # <<< THAY ĐỔI QUAN TRỌNG: Cập nhật lệnh gọi hàm explain_address, bỏ tham số `topk` không còn dùng >>>
-    explanation = explain_address(model, pipeline, features, feat_names)
+    explanation = await EXPLAIN_BATCHER.submit(result.vector)
 
     explanation["address"] = req.address
+    explanation["partial"] = result.partial
     return explanation
 
 
+@app.get("/cache/stats")
+async def cache_stats():
+    """Số lần hit/miss, số byte tiết kiệm được và kích thước của cache giao dịch thô."""
+    tx_cache = get_tx_cache()
+    if tx_cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **tx_cache.summary()}
+
+
+@app.get("/cache/predictions/stats")
+async def prediction_cache_stats():
+    """Số lần hit/xác nhận lại/miss/bypass và kích thước của cache dự đoán."""
+    if PREDICTION_CACHE is None:
+        return {"enabled": False}
+    return {"enabled": True, **PREDICTION_CACHE.summary()}
+
+
+@app.get("/analysis/stats")
+async def analysis_stats():
+    """Số lời gọi phân tích đã được gộp chung hoặc trả lời từ memo ngắn hạn."""
+    return ANALYSIS_FLIGHTS.summary()
+
+
+@app.get("/inference/stats")
+async def inference_stats():
+    """Số lô dự đoán/giải thích đã chạy, kích thước lô trung bình/lớn nhất và thời gian mô hình bận."""
+    return {**PREDICTION_BATCHER.summary(), "explain": EXPLAIN_BATCHER.summary()}
+
+
+@app.get("/admin/model", dependencies=[Depends(require_admin)])
+async def model_status():
+    """Phiên bản đang phục vụ, checksum, các phiên bản trong registry và lỗi nạp gần nhất."""
+    return await asyncio.to_thread(MODEL.summary)
+
+
+@app.post("/admin/model/reload", dependencies=[Depends(require_admin)])
+async def reload_model(req: ReloadRequest):
+    """Nạp một phiên bản trong nền, chạy thử rồi đổi vào; request đang chạy không bị ảnh hưởng."""
+    try:
+        return await MODEL.reload(req.version, req.force)
+    except Exception as e:
+        raise HTTPException(status_code=409, detail=f"Không nạp được mô hình: {type(e).__name__}: {e}")
+
+
+@app.get("/fetch/stats")
+async def covalent_fetch_stats():
+    """Số trang bị 429, được thử lại hoặc bỏ cuộc; tốc độ hiện tại của bộ giới hạn và latency trang."""
+    return fetch_stats()
+
+
 if __name__ == "__main__":
     import uvicorn
 
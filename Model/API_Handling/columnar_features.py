@@ -0,0 +1,167 @@
+# columnar_features.py
+# Engine tính đặc trưng dạng cột: chuyển giao dịch và log Transfer sang mảng NumPy
+# trong MỘT lượt duyệt; các phép rút gọn vector hoá trên các cột nằm ở feature_state.py.
+
+from dataclasses import dataclass
+from datetime import datetime, timezone, timedelta
+from typing import List, Dict, Any, Optional, Tuple
+
+import numpy as np
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+_MICROSECOND = timedelta(microseconds=1)
+
+
+@dataclass
+class TransactionColumns:
+    """Các cột của giao dịch thường (ETH)."""
+    timestamps: np.ndarray      # int64, micro giây kể từ epoch (UTC)
+    values: np.ndarray          # float64, đơn vị ether
+    is_sent: np.ndarray         # bool, from_address == địa chỉ đang phân tích
+    is_received: np.ndarray     # bool, to_address == địa chỉ đang phân tích
+    to_is_none: np.ndarray      # bool, giao dịch tạo contract
+    to_is_contract: np.ndarray  # bool
+    from_codes: np.ndarray      # int64, mã của from_address (giữ nguyên chuỗi gốc)
+    to_codes: np.ndarray        # int64, mã của to_address, -1 nếu rỗng
+    addresses: List[str]        # bảng tra mã -> địa chỉ (dùng chung với TokenTransferColumns)
+
+
+@dataclass
+class TokenTransferColumns:
+    """Các cột của các sự kiện ERC20 Transfer đã giải mã."""
+    timestamps: np.ndarray
+    values: np.ndarray
+    is_sent: np.ndarray
+    is_received: np.ndarray
+    to_is_contract: np.ndarray
+    from_codes: np.ndarray
+    to_codes: np.ndarray
+    symbol_codes: np.ndarray    # int64, -1 nếu không có ticker symbol
+    symbols: List[str]          # bảng tra mã -> ticker symbol
+    addresses: List[str]
+
+
+def _to_micros(block_signed_at: str) -> int:
+    dt = datetime.fromisoformat(block_signed_at.replace('Z', '+00:00'))
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return (dt - _EPOCH) // _MICROSECOND
+
+
+def parse_timestamps(raw: List[str]) -> np.ndarray:
+    """Chuyển danh sách chuỗi ISO-8601 thành mảng int64 micro giây (UTC)."""
+    if not raw:
+        return np.empty(0, dtype=np.int64)
+    # Đường nhanh: Covalent luôn trả về dạng '...Z', NumPy tự parse được khi bỏ hậu tố 'Z'
+    if all(s.endswith('Z') for s in raw):
+        try:
+            return np.array([s[:-1] for s in raw], dtype='datetime64[us]').astype(np.int64)
+        except (ValueError, TypeError):
+            pass
+    return np.fromiter((_to_micros(s) for s in raw), dtype=np.int64, count=len(raw))
+
+
+class _Interner:
+    """Gán mã số nguyên cho chuỗi theo thứ tự xuất hiện đầu tiên."""
+
+    def __init__(self):
+        self.codes: Dict[str, int] = {}
+
+    def __call__(self, value: Optional[str]) -> int:
+        if not value:
+            return -1
+        code = self.codes.get(value)
+        if code is None:
+            code = self.codes[value] = len(self.codes)
+        return code
+
+
+def build_columns(address: str, all_txs: List[Dict[str, Any]]) -> Tuple[TransactionColumns, TokenTransferColumns]:
+    """Duyệt một lần qua giao dịch và log để dựng các cột NumPy."""
+    addr = address.lower()
+    intern_addr = _Interner()
+    intern_symbol = _Interner()
+
+    tx_times: List[str] = []
+    tx_values: List[float] = []
+    tx_sent: List[bool] = []
+    tx_received: List[bool] = []
+    tx_to_none: List[bool] = []
+    tx_to_contract: List[bool] = []
+    tx_from: List[int] = []
+    tx_to: List[int] = []
+
+    tk_times: List[str] = []
+    tk_values: List[float] = []
+    tk_sent: List[bool] = []
+    tk_received: List[bool] = []
+    tk_to_contract: List[bool] = []
+    tk_from: List[int] = []
+    tk_to: List[int] = []
+    tk_symbols: List[int] = []
+
+    for tx in all_txs:
+        from_address = tx['from_address']
+        to_address = tx.get('to_address')
+        wei = tx.get('value')
+
+        tx_times.append(tx['block_signed_at'])
+        tx_values.append(float(wei) if wei else 0.0)
+        tx_sent.append(from_address.lower() == addr)
+        tx_received.append(bool(to_address) and to_address.lower() == addr)
+        tx_to_none.append(to_address is None)
+        tx_to_contract.append(bool(tx.get('to_address_is_contract')))
+        tx_from.append(intern_addr(from_address))
+        tx_to.append(intern_addr(to_address))
+
+        for log in tx.get('log_events') or ():
+            decoded = log.get('decoded')
+            if not (decoded and decoded.get('name') == "Transfer" and decoded.get('params')):
+                continue
+            params = {p['name']: p for p in decoded['params']}
+            to_param = params.get('to', {})
+            from_addr = params.get('from', {}).get('value')
+            to_addr = to_param.get('value')
+            if not (from_addr and to_addr):
+                continue
+            value = params.get('value', {}).get('value')
+
+            tk_times.append(log['block_signed_at'])
+            tk_values.append(float(value) if value is not None else 0.0)
+            tk_sent.append(from_addr.lower() == addr)
+            tk_received.append(to_addr.lower() == addr)
+            tk_to_contract.append(bool(to_param.get('is_contract')))
+            tk_from.append(intern_addr(from_addr))
+            tk_to.append(intern_addr(to_addr))
+            tk_symbols.append(intern_symbol(log.get('sender_contract_ticker_symbol')))
+
+    addresses = list(intern_addr.codes)
+    txs = TransactionColumns(
+        timestamps=parse_timestamps(tx_times),
+        values=np.array(tx_values, dtype=np.float64) / 1e18,
+        is_sent=np.array(tx_sent, dtype=bool),
+        is_received=np.array(tx_received, dtype=bool),
+        to_is_none=np.array(tx_to_none, dtype=bool),
+        to_is_contract=np.array(tx_to_contract, dtype=bool),
+        from_codes=np.array(tx_from, dtype=np.int64),
+        to_codes=np.array(tx_to, dtype=np.int64),
+        addresses=addresses,
+    )
+    tokens = TokenTransferColumns(
+        timestamps=parse_timestamps(tk_times),
+        values=np.array(tk_values, dtype=np.float64),
+        is_sent=np.array(tk_sent, dtype=bool),
+        is_received=np.array(tk_received, dtype=bool),
+        to_is_contract=np.array(tk_to_contract, dtype=bool),
+        from_codes=np.array(tk_from, dtype=np.int64),
+        to_codes=np.array(tk_to, dtype=np.int64),
+        symbol_codes=np.array(tk_symbols, dtype=np.int64),
+        symbols=list(intern_symbol.codes),
+        addresses=addresses,
+    )
+    return txs, tokens
+
+
+def ether_balance(balance_data: Dict[str, Any]) -> float:
+    eth_token = next((token for token in balance_data.get('items', []) if token.get('native_token')), None)
+    return (float(eth_token['balance']) / (10 ** eth_token['contract_decimals'])) if eth_token else 0.0
@@ -0,0 +1,56 @@
+# covalent_client.py
+# Một httpx.AsyncClient dùng chung cho cả tiến trình (HTTP/2 + keep-alive), được tạo và đóng
+# theo vòng đời (lifespan) của ứng dụng FastAPI, rồi đưa vào các endpoint qua Depends.
+
+import os
+import logging
+from contextlib import asynccontextmanager
+
+import httpx
+from fastapi import FastAPI, Request
+
+# Giới hạn pool kết nối, có thể chỉnh qua biến môi trường
+COVALENT_MAX_CONNECTIONS = int(os.environ.get('COVALENT_MAX_CONNECTIONS', 20))
+COVALENT_MAX_KEEPALIVE = int(os.environ.get('COVALENT_MAX_KEEPALIVE', 10))
+COVALENT_KEEPALIVE_EXPIRY = float(os.environ.get('COVALENT_KEEPALIVE_EXPIRY', 60.0))
+
+try:
+    import h2  # noqa: F401  (httpx chỉ bật được HTTP/2 khi có gói h2)
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+    logging.warning("Chưa cài gói h2 (httpx[http2]); client Covalent sẽ dùng HTTP/1.1 keep-alive.")
+
+
+def create_covalent_client(**overrides) -> httpx.AsyncClient:
+    """
+    Tạo client có pool kết nối giới hạn, dùng lại kết nối TCP/TLS giữa các lần phân tích.
+    `overrides` được truyền thẳng cho httpx.AsyncClient (ví dụ `verify` khi benchmark).
+    """
+    options = dict(
+        http2=HTTP2_AVAILABLE,
+        timeout=httpx.Timeout(30.0, connect=60.0),
+        limits=httpx.Limits(
+            max_connections=COVALENT_MAX_CONNECTIONS,
+            max_keepalive_connections=COVALENT_MAX_KEEPALIVE,
+            keepalive_expiry=COVALENT_KEEPALIVE_EXPIRY,
+        ),
+    )
+    options.update(overrides)
+    return httpx.AsyncClient(**options)
+
+
+@asynccontextmanager
+async def covalent_client_lifespan(app: FastAPI):
+    """Lifespan của FastAPI: mở client khi khởi động, đóng sạch các kết nối khi tắt."""
+    app.state.covalent_client = create_covalent_client()
+    try:
+        yield
+    finally:
+        await app.state.covalent_client.aclose()
+        logging.info("Đã đóng pool kết nối Covalent.")
+
+
+def get_covalent_client(request: Request) -> httpx.AsyncClient:
+    """Dependency của FastAPI trả về client dùng chung của ứng dụng."""
+    return request.app.state.covalent_client
@@ -0,0 +1,114 @@
+# covalent_decode.py
+# Giải mã "gọn" một trang transactions_v3: chỉ giữ các trường mà phần tính đặc trưng và cache dùng tới,
+# bỏ qua mọi trường khác (gas, raw_log_topics, raw_log_data, ...) ngay trong lúc parse.
+# Kết quả vẫn là dict thường với cùng tên khoá như payload gốc, nên FeatureState/build_columns,
+# merge_transactions và cache không cần biết dữ liệu đã được chiếu.
+#
+# Thứ tự ưu tiên: msgspec (giải mã thẳng vào TypedDict, không dựng các trường bị bỏ),
+# rồi orjson, rồi json chuẩn (đều kèm một bước chiếu bằng Python).
+
+import json
+import logging
+from typing import Any, Dict, List, Optional, Tuple, TypedDict
+
+try:
+    import msgspec
+    MSGSPEC_AVAILABLE = True
+except ImportError:
+    MSGSPEC_AVAILABLE = False
+
+try:
+    import orjson
+    _loads = orjson.loads
+except ImportError:
+    _loads = json.loads
+
+
+# --- Lược đồ đã chiếu (total=False: trường vắng mặt thì không có khoá, giống payload gốc) ---
+class TransferParam(TypedDict, total=False):
+    name: Optional[str]
+    value: Any
+    is_contract: Optional[bool]
+
+
+class DecodedLog(TypedDict, total=False):
+    name: Optional[str]
+    params: Optional[List[TransferParam]]
+
+
+class LogEvent(TypedDict, total=False):
+    block_signed_at: Optional[str]
+    sender_contract_ticker_symbol: Optional[str]
+    decoded: Optional[DecodedLog]
+
+
+class Transaction(TypedDict, total=False):
+    block_height: Optional[int]
+    block_signed_at: Optional[str]
+    tx_hash: Optional[str]
+    from_address: Optional[str]
+    to_address: Optional[str]
+    to_address_is_contract: Optional[bool]
+    value: Optional[str]
+    log_events: Optional[List[LogEvent]]
+
+
+class _Pagination(TypedDict, total=False):
+    has_more: Optional[bool]
+
+
+class _PageData(TypedDict, total=False):
+    items: Optional[List[Transaction]]
+    pagination: Optional[_Pagination]
+
+
+class _PageResponse(TypedDict, total=False):
+    data: Optional[_PageData]
+
+
+_TX_FIELDS = tuple(Transaction.__annotations__)
+_LOG_FIELDS = tuple(LogEvent.__annotations__)
+_PARAM_FIELDS = tuple(TransferParam.__annotations__)
+
+if MSGSPEC_AVAILABLE:
+    _PAGE_DECODER = msgspec.json.Decoder(_PageResponse)
+
+
+def _project_log(log: Dict[str, Any]) -> Dict[str, Any]:
+    out = {k: log[k] for k in _LOG_FIELDS if k in log}
+    decoded = log.get('decoded')
+    if decoded:
+        out['decoded'] = {'name': decoded.get('name')}
+        if 'params' in decoded:
+            params = decoded['params']
+            out['decoded']['params'] = (
+                [{k: p[k] for k in _PARAM_FIELDS if k in p} for p in params] if params is not None else None)
+    return out
+
+
+def project_transaction(tx: Dict[str, Any]) -> Dict[str, Any]:
+    """Chiếu một item transactions_v3 đầy đủ xuống các trường trong `Transaction`."""
+    out = {k: tx[k] for k in _TX_FIELDS if k in tx}
+    logs = tx.get('log_events')
+    if logs:
+        out['log_events'] = [_project_log(log) for log in logs]
+    return out
+
+
+def _page_from_dict(payload: Dict[str, Any], project: bool) -> Tuple[List[Dict[str, Any]], bool]:
+    data = payload.get('data') or {}
+    items = data.get('items') or []
+    if project:
+        items = [project_transaction(tx) for tx in items]
+    return items, bool(items) and bool((data.get('pagination') or {}).get('has_more', False))
+
+
+def decode_transactions_page(content: bytes) -> Tuple[List[Dict[str, Any]], bool]:
+    """Giải mã body của một trang transactions_v3 thành (items đã chiếu, has_more)."""
+    if MSGSPEC_AVAILABLE:
+        try:
+            return _page_from_dict(_PAGE_DECODER.decode(content), project=False)
+        except msgspec.ValidationError as e:
+            # Covalent đổi kiểu một trường: chậm hơn nhưng không làm hỏng trang
+            logging.warning(f"Trang transactions_v3 không khớp lược đồ đã chiếu ({e}), dùng bộ giải mã thường.")
+    return _page_from_dict(_loads(content), project=True)
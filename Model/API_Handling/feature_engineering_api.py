@@ -2,24 +2,52 @@
 
 import asyncio
 import os
+import random
+import time
 import httpx
 import logging
 from datetime import datetime
-from typing import List, Dict, Any, Optional
-from collections import Counter
+from dataclasses import dataclass, replace, asdict
+from email.utils import parsedate_to_datetime
+from typing import List, Dict, Any, Optional, Tuple, Iterable, AsyncIterator, Callable, Awaitable
+from collections import Counter, deque
 import statistics
+import threading
 from dotenv import load_dotenv
+from feature_state import FeatureState, compute_features as compute_columnar_features, compute_vector
+from feature_schema import FeatureSchema, FeatureVector, default_schema
+from covalent_client import create_covalent_client
+from covalent_decode import decode_transactions_page
+from pagination import paginate_concurrently
+from rate_limiter import AdaptiveRateLimiter
+from fetch_scheduler import FetchScheduler
+from singleflight import SingleFlight
+from tx_cache import TransactionCache, TransactionWriter, highest_block
 
 # Tải biến môi trường từ file .env
 load_dotenv()
 
 # --- Cấu hình ---
 COVALENT_API_KEY = os.environ.get('COVALENT_API_KEY')
+# Có thể trỏ sang server giả lập cục bộ (Model/benchmarks/mock_upstream.py), ví dụ http://127.0.0.1:9000/v1
+COVALENT_BASE_URL = os.environ.get('COVALENT_BASE_URL', 'https://api.covalenthq.com/v1').rstrip('/')
 CHAIN_NAME = 'eth-mainnet'
 MAX_PAGES_TO_FETCH = 50
 # <<< THAY ĐỔI: Thêm hằng số để dễ dàng điều chỉnh giới hạn tốc độ >>>
 # 4 request mỗi giây -> 1/4 = 0.25 giây mỗi request
 RATE_LIMIT_DELAY_SECONDS = 0.25
+# Số trang transactions_v3 được phép gửi đồng thời cho một địa chỉ
+MAX_PAGES_IN_FLIGHT = int(os.environ.get('MAX_PAGES_IN_FLIGHT', 4))
+# Tổng số request Covalent được phép đang bay trong toàn tiến trình (mọi ví cộng lại)
+COVALENT_MAX_IN_FLIGHT = int(os.environ.get('COVALENT_MAX_IN_FLIGHT', 8))
+# Số request được dồn liền nhau khi bộ giới hạn tốc độ đang rảnh
+COVALENT_RATE_BURST = int(os.environ.get('COVALENT_RATE_BURST', 4))
+# Thử lại một request bị 429 / lỗi 5xx / timeout tối đa COVALENT_MAX_RETRIES lần,
+# chờ theo luỹ thừa 2 từ COVALENT_RETRY_BASE_SECONDS (có jitter, tối đa COVALENT_RETRY_MAX_SECONDS)
+COVALENT_MAX_RETRIES = int(os.environ.get('COVALENT_MAX_RETRIES', 4))
+COVALENT_RETRY_BASE_SECONDS = float(os.environ.get('COVALENT_RETRY_BASE_SECONDS', 0.5))
+COVALENT_RETRY_MAX_SECONDS = float(os.environ.get('COVALENT_RETRY_MAX_SECONDS', 8))
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
@@ -32,67 +60,341 @@ HEADERS = {
     "Authorization": f"Bearer {COVALENT_API_KEY}",
 }
 
+# Ngân sách tốc độ dùng chung cho mọi request Covalent trong tiến trình, được chia lượt
+# công bằng giữa các ví bởi FETCH_SCHEDULER; tự giảm tốc khi Covalent trả về 429
+COVALENT_RATE_LIMITER = AdaptiveRateLimiter(1 / RATE_LIMIT_DELAY_SECONDS, burst=COVALENT_RATE_BURST)
+FETCH_SCHEDULER = FetchScheduler(COVALENT_RATE_LIMITER, COVALENT_MAX_IN_FLIGHT)
+# Latency (giây) của các trang gần nhất
+PAGE_LATENCIES: deque = deque(maxlen=1000)
+
+
+@dataclass
+class FetchRetryStats:
+    throttled: int = 0      # số phản hồi 429
+    retried: int = 0        # số lần gửi lại một request
+    abandoned: int = 0      # số trang bỏ cuộc sau khi hết lượt thử lại (lịch sử bị cắt)
+
+
+FETCH_RETRY_STATS = FetchRetryStats()
+
+# --- Cache dữ liệu thô trên đĩa (xem tx_cache.py) ---
+TX_CACHE_ENABLED = os.environ.get('TX_CACHE_ENABLED', '1') == '1'
+# Mặc định Model/Model/cache/ (cạnh artifact của mô hình), không phụ thuộc thư mục làm việc
+TX_CACHE_PATH = os.environ.get('TX_CACHE_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Model',
+                                                             'cache', 'transactions.sqlite3'))
+TX_CACHE_MAX_BYTES = int(os.environ.get('TX_CACHE_MAX_BYTES', 512 * 1024 * 1024))
+TX_CACHE_BALANCE_TTL_SECONDS = float(os.environ.get('TX_CACHE_BALANCE_TTL_SECONDS', 300))
+
+# Số giây giữ lại kết quả phân tích thành công để các request trùng ngay sau đó dùng lại (0 = tắt)
+ANALYSIS_MEMO_TTL_SECONDS = float(os.environ.get('ANALYSIS_MEMO_TTL_SECONDS', 30))
+
+_tx_cache: Optional[TransactionCache] = None
+_tx_cache_opened = False
+_tx_cache_lock = threading.Lock()
+
+
+def get_tx_cache() -> Optional[TransactionCache]:
+    """
+    Cache giao dịch, mở ở lần dùng đầu tiên (import module không tạo thư mục hay file SQLite);
+    None nếu TX_CACHE_ENABLED=0 hoặc không mở được.
+    """
+    global _tx_cache, _tx_cache_opened
+    if not _tx_cache_opened:
+        with _tx_cache_lock:
+            if not _tx_cache_opened:
+                if TX_CACHE_ENABLED:
+                    try:
+                        os.makedirs(os.path.dirname(TX_CACHE_PATH) or '.', exist_ok=True)
+                        _tx_cache = TransactionCache(TX_CACHE_PATH, TX_CACHE_MAX_BYTES, TX_CACHE_BALANCE_TTL_SECONDS)
+                    except Exception as e:
+                        logging.warning(f"Không mở được cache giao dịch tại {TX_CACHE_PATH}, chạy không cache: {e}")
+                _tx_cache_opened = True
+    return _tx_cache
+
 
 # --- Các hàm gọi API ---
-async def fetch_all_transactions(address: str, client: httpx.AsyncClient) -> List[Dict[str, Any]]:
-    """Lấy tất cả giao dịch, xử lý phân trang và lỗi timeout."""
+def _retry_after_seconds(response: httpx.Response) -> float:
+    """Giá trị header Retry-After (số giây hoặc ngày HTTP), 0 nếu không có hoặc không đọc được."""
+    value = response.headers.get("Retry-After")
+    if not value:
+        return 0.0
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return 0.0
+
+
+async def _covalent_get(address: str, url: str, client: httpx.AsyncClient) -> httpx.Response:
+    """
+    GET tới Covalent qua FETCH_SCHEDULER, thử lại khi gặp 429, lỗi 5xx hoặc lỗi mạng/timeout
+    với backoff luỹ thừa có jitter. 429 làm COVALENT_RATE_LIMITER giảm tốc và tôn trọng Retry-After.
+    Thời gian chờ giữa các lần thử nằm ngoài slot nên không giữ chỗ của các ví khác.
+    Ném lỗi của lần thử cuối nếu vẫn thất bại.
+    """
+    for attempt in range(COVALENT_MAX_RETRIES + 1):
+        retry_after = 0.0
+        try:
+            async with FETCH_SCHEDULER.slot(address):
+                res = await client.get(url, headers=HEADERS)
+            if res.status_code not in RETRYABLE_STATUS_CODES:
+                res.raise_for_status()
+                COVALENT_RATE_LIMITER.succeeded()
+                return res
+            if res.status_code == 429:
+                retry_after = _retry_after_seconds(res)
+                FETCH_RETRY_STATS.throttled += 1
+                COVALENT_RATE_LIMITER.throttled(retry_after)
+            if attempt == COVALENT_MAX_RETRIES:
+                res.raise_for_status()
+        except httpx.TransportError:
+            if attempt == COVALENT_MAX_RETRIES:
+                raise
+
+        FETCH_RETRY_STATS.retried += 1
+        backoff = min(COVALENT_RETRY_MAX_SECONDS, COVALENT_RETRY_BASE_SECONDS * 2 ** attempt)
+        await asyncio.sleep(max(retry_after, random.uniform(backoff / 2, backoff)))
+    raise AssertionError("unreachable")
+
+
+async def _fetch_transactions_page(address: str, page_number: int,
+                                   client: httpx.AsyncClient) -> Tuple[List[Dict[str, Any]], bool]:
+    """Lấy một trang transactions_v3 (có thử lại), trả về (items đã chiếu, has_more)."""
+    url = f"{COVALENT_BASE_URL}/{CHAIN_NAME}/address/{address}/transactions_v3/?page-number={page_number}"
+    res = await _covalent_get(address, url, client)
+    # Chỉ giữ các trường cần cho đặc trưng và cache (xem covalent_decode.py)
+    return decode_transactions_page(res.content)
+
+
+# on_page(page_number, items): nhận từng trang theo đúng thứ tự
+PageConsumer = Callable[[int, List[Dict[str, Any]]], Awaitable[None]]
+
+
+async def _fetch_transactions(address: str, client: httpx.AsyncClient, since_block: Optional[int] = None,
+                              on_page: Optional[PageConsumer] = None) -> Tuple[List[Dict[str, Any]], bool, bool]:
+    """
+    Lấy giao dịch theo trang, trả về (items, complete, truncated).
+    `complete` là False nếu có trang vẫn lỗi sau khi đã thử lại (các trang sau nó không được lấy);
+    `truncated` là True nếu dừng ở MAX_PAGES_TO_FETCH trong khi Covalent còn trang tiếp theo.
+    Nếu có `since_block`, chỉ lấy các giao dịch ở block lớn hơn nó: Covalent trả về giao dịch
+    mới nhất trước, nên dừng ngay ở trang đầu tiên chạm tới block đã biết.
+    Chế độ streaming: nếu có `on_page`, mỗi trang được chuyển cho nó rồi bỏ đi thay vì gom vào
+    `items` (khi đó `items` rỗng), nên bộ nhớ chỉ phụ thuộc vào số trang đang bay chứ không vào độ dài lịch sử.
+    """
     all_items: List[Dict[str, Any]] = []
-    page_number = 0
-    has_more = True
+    item_count = 0
+    latencies: List[float] = []
+    complete = True
+    truncated = False
+
+    async def fetch_page(page_number: int):
+        items, has_more = await _fetch_transactions_page(address, page_number, client)
+        if since_block is not None:
+            fresh = [tx for tx in items if (tx.get('block_height') or 0) > since_block]
+            if len(fresh) < len(items):
+                has_more = False
+            items = fresh
+        return items, has_more
+
+    # Khi chỉ lấy phần bổ sung thường chỉ cần trang đầu, nên không gửi trước các trang sau
+    max_in_flight = 1 if since_block is not None else MAX_PAGES_IN_FLIGHT
+    # Mỗi request tự xin slot trong _covalent_get, nên latency của trang gồm cả thời gian chờ lượt và thử lại
+    async for page in paginate_concurrently(fetch_page, MAX_PAGES_TO_FETCH, max_in_flight):
+        latencies.append(page.latency)
+        PAGE_LATENCIES.append(page.latency)
+        e = page.error
+        complete = complete and e is None
+        if e is None:
+            item_count += len(page.items)
+            if on_page is not None:
+                await on_page(page.page_number, page.items)
+            else:
+                all_items.extend(page.items)
+            truncated = page.has_more and page.page_number == MAX_PAGES_TO_FETCH - 1
+            continue
+        FETCH_RETRY_STATS.abandoned += 1
+        if isinstance(e, httpx.TimeoutException):
+            logging.error(f"Lỗi Timeout khi lấy giao dịch trên trang {page.page_number} cho địa chỉ {address}.")
+        elif isinstance(e, httpx.HTTPStatusError):
+            logging.error(
+                f"Lỗi Covalent API trên trang {page.page_number} (HTTP {e.response.status_code}): {e.request.url}")
+        else:
+            logging.error(
+                f"Lỗi không mong muốn khi lấy giao dịch trên trang {page.page_number}: {type(e).__name__} - {e}")
 
-    while has_more and page_number < MAX_PAGES_TO_FETCH:
-        url = f"https://api.covalenthq.com/v1/{CHAIN_NAME}/address/{address}/transactions_v3/?page-number={page_number}"
-        try:
-            # <<< THAY ĐỔI: Thực hiện giới hạn tốc độ TRƯỚC khi gọi API >>>
-            await asyncio.sleep(RATE_LIMIT_DELAY_SECONDS)
+    if latencies:
+        logging.info(f"Đã lấy {len(latencies)} trang cho {address}: "
+                     f"latency trung bình {statistics.mean(latencies):.3f}s, tối đa {max(latencies):.3f}s")
+    if not complete or truncated:
+        logging.warning(f"Lịch sử giao dịch của {address} bị cắt ({item_count} giao dịch): "
+                        f"{'có trang lỗi' if not complete else f'đạt giới hạn {MAX_PAGES_TO_FETCH} trang'}.")
+    return all_items, complete, truncated
 
-            res = await client.get(url, headers=HEADERS)
-            res.raise_for_status()
-            data = res.json().get("data", {})
 
-            if items := data.get("items"):
-                all_items.extend(items)
-                has_more = data.get("pagination", {}).get("has_more", False)
-            else:
-                has_more = False
+async def fetch_latest_block(address: str, client: httpx.AsyncClient) -> int:
+    """Block cao nhất trong lịch sử giao dịch của ví (0 nếu chưa có giao dịch): chỉ lấy trang mới nhất."""
+    items, _ = await _fetch_transactions_page(address, 0, client)
+    return highest_block(items)
 
-            page_number += 1
-        except httpx.TimeoutException:
-            logging.error(f"Lỗi Timeout khi lấy giao dịch trên trang {page_number} cho địa chỉ {address}.")
-            has_more = False
-        except httpx.HTTPStatusError as e:
-            error_data = e.response.json()
-            logging.error(
-                f"Lỗi Covalent API trên trang {page_number}: {error_data.get('error_message', e.request.url)}")
-            has_more = False
-        except Exception as e:
-            logging.error(f"Lỗi không mong muốn khi lấy giao dịch trên trang {page_number}: {type(e).__name__} - {e}")
-            has_more = False
+
+async def fetch_all_transactions(address: str, client: httpx.AsyncClient) -> List[Dict[str, Any]]:
+    """
+    Lấy tất cả giao dịch, phân trang song song theo cửa sổ MAX_PAGES_IN_FLIGHT và xử lý lỗi timeout.
+    Giữ toàn bộ lịch sử trong bộ nhớ; để tính đặc trưng hãy dùng stream_feature_state.
+    """
+    all_items, _, _ = await _fetch_transactions(address, client)
     return all_items
 
 
-async def fetch_balance(address: str, client: httpx.AsyncClient) -> Dict[str, Any]:
-    """Lấy số dư token, xử lý lỗi timeout."""
-    url = f"https://api.covalenthq.com/v1/{CHAIN_NAME}/address/{address}/balances_v2/"
+async def stream_feature_state(address: str, client: httpx.AsyncClient,
+                               writer: Optional[TransactionWriter] = None) -> Tuple[FeatureState, bool, bool]:
+    """
+    Lấy toàn bộ lịch sử ở chế độ streaming: mỗi trang được gộp ngay vào FeatureState (và ghi vào
+    `writer` nếu có) rồi bỏ đi. Trả về (state, complete, truncated) như _fetch_transactions.
+    """
+    state = FeatureState(address)
+
+    async def consume(page_number: int, items: List[Dict[str, Any]]) -> None:
+        # Các trang đến theo thứ tự, nên nối vào cuối cho kết quả giống hệt from_transactions(toàn bộ lịch sử)
+        state.update(items, prepend=False)
+        if writer is not None:
+            await asyncio.to_thread(writer.write_page, page_number, items)
+
+    _, complete, truncated = await _fetch_transactions(address, client, on_page=consume)
+    state.truncated = truncated
+    return state, complete, truncated
+
+
+async def fetch_feature_state(address: str, client: httpx.AsyncClient) -> Tuple[FeatureState, bool]:
+    """
+    Trả về (FeatureState, partial) của địa chỉ; `partial` là True nếu lịch sử dùng để tính bị cắt.
+    Với cache giao dịch (get_tx_cache()): nếu ví đã được cache thì chỉ lấy các trang mới hơn block cao nhất
+    đã lưu, cập nhật trạng thái đã lưu trong O(số giao dịch mới) và ghi thêm một đoạn vào cache.
+    Dữ liệu chỉ được ghi lại khi không có trang lỗi.
+    """
+    tx_cache = get_tx_cache()
+    if tx_cache is None:
+        state, complete, truncated = await stream_feature_state(address, client)
+        return state, not complete or truncated
+
+    cached_block = await asyncio.to_thread(tx_cache.get_highest_block, address)
+    if cached_block is None:
+        return await _fetch_uncached_feature_state(address, client, tx_cache)
+
+    saved = await asyncio.to_thread(tx_cache.get_feature_state, address, cached_block)
+    if saved is not None:
+        state = FeatureState.from_dict(saved)
+    else:
+        # Chưa có trạng thái khớp với lịch sử đã cache: dựng lại một lần từ dữ liệu thô
+        cached = await asyncio.to_thread(tx_cache.get_transactions, address)
+        if cached is None:
+            # Ví vừa bị xoá khỏi cache sau get_highest_block
+            return await _fetch_uncached_feature_state(address, client, tx_cache)
+        state = FeatureState.from_transactions(address, cached.items)
+
+    new_items, complete, truncated = await _fetch_transactions(address, client, since_block=cached_block)
+    # Phần bổ sung bị cắt ở giới hạn trang để lại một khoảng trống giữa nó và dữ liệu đã cache
+    complete = complete and not truncated
+    state.update(new_items, prepend=True)
+    logging.info(f"Cache hit cho {address}: cập nhật tăng dần với {len(new_items)} giao dịch mới.")
+
+    if complete and (new_items or saved is None):
+        stored = not new_items or await asyncio.to_thread(tx_cache.append_transactions, address, new_items)
+        if stored:
+            await asyncio.to_thread(tx_cache.put_feature_state, address, state.to_dict())
+    return state, not complete or state.truncated
+
+
+async def _fetch_uncached_feature_state(address: str, client: httpx.AsyncClient,
+                                        tx_cache: TransactionCache) -> Tuple[FeatureState, bool]:
+    """Lấy toàn bộ lịch sử của ví chưa có trong cache, ghi từng trang vào cache ngay khi về."""
+    # Lịch sử dừng ở MAX_PAGES_TO_FETCH vẫn được cache (phần cũ hơn không bao giờ được lấy),
+    # nhưng state.truncated được lưu lại để mọi lần dùng lại đều báo là partial
+    writer = await asyncio.to_thread(tx_cache.open_writer, address)
     try:
-        # <<< THAY ĐỔI: Thực hiện giới hạn tốc độ TRƯỚC khi gọi API >>>
-        await asyncio.sleep(RATE_LIMIT_DELAY_SECONDS)
+        state, complete, truncated = await stream_feature_state(address, client, writer)
+    except BaseException:
+        await asyncio.to_thread(writer.discard)
+        raise
+    if complete and state.txs.count:
+        if await asyncio.to_thread(writer.commit):
+            await asyncio.to_thread(tx_cache.put_feature_state, address, state.to_dict())
+    else:
+        await asyncio.to_thread(writer.discard)
+    return state, not complete or truncated
+
+
+def fetch_stats() -> Dict[str, Any]:
+    """Bộ đếm thử lại/bỏ cuộc, tốc độ hiện tại của bộ giới hạn và trạng thái hàng đợi fetch."""
+    return {
+        **asdict(FETCH_RETRY_STATS),
+        "rate_limiter": COVALENT_RATE_LIMITER.snapshot(),
+        "scheduler": FETCH_SCHEDULER.snapshot(),
+        "page_latency": page_latency_summary(),
+    }
+
+
+def page_latency_summary() -> Dict[str, float]:
+    """Thống kê latency của các trang gần đây, dùng để tinh chỉnh MAX_PAGES_IN_FLIGHT."""
+    if not PAGE_LATENCIES:
+        return {"count": 0, "p50": 0.0, "p95": 0.0, "max": 0.0}
+    ordered = sorted(PAGE_LATENCIES)
+    return {
+        "count": len(ordered),
+        "p50": ordered[len(ordered) // 2],
+        "p95": ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))],
+        "max": ordered[-1],
+    }
+
 
-        res = await client.get(url, headers=HEADERS)
-        res.raise_for_status()
+async def fetch_balance(address: str, client: httpx.AsyncClient) -> Dict[str, Any]:
+    """Lấy số dư token (có thử lại), xử lý lỗi timeout."""
+    url = f"{COVALENT_BASE_URL}/{CHAIN_NAME}/address/{address}/balances_v2/"
+    try:
+        res = await _covalent_get(address, url, client)
         return res.json().get("data", {"items": []})
     except httpx.TimeoutException:
         logging.error(f"Lỗi Timeout khi lấy số dư cho địa chỉ {address}.")
     except httpx.HTTPStatusError as e:
-        error_data = e.response.json()
-        logging.error(f"Lỗi API khi lấy số dư: {error_data.get('error_message', e.request.url)}")
+        logging.error(f"Lỗi API khi lấy số dư (HTTP {e.response.status_code}): {e.request.url}")
     except Exception as e:
         logging.error(f"Lỗi không mong muốn khi lấy số dư: {type(e).__name__} - {e}")
     return {"items": []}
 
 
+async def fetch_balance_cached(address: str, client: httpx.AsyncClient) -> Dict[str, Any]:
+    """Như fetch_balance nhưng dùng lại payload trong cache giao dịch nếu chưa quá TX_CACHE_BALANCE_TTL_SECONDS."""
+    tx_cache = get_tx_cache()
+    if tx_cache is None:
+        return await fetch_balance(address, client)
+
+    balance_data = await asyncio.to_thread(tx_cache.get_balance, address)
+    if balance_data is None:
+        balance_data = await fetch_balance(address, client)
+        # fetch_balance trả về danh sách rỗng khi lỗi, nên chỉ lưu khi có dữ liệu
+        if balance_data.get('items'):
+            await asyncio.to_thread(tx_cache.put_balance, address, balance_data)
+    return balance_data
+
+
 # --- Logic tính toán ---
 def calculate_all_features(address: str, all_txs: List[Dict[str, Any]], balance_data: Dict[str, Any]) -> Dict[str, Any]:
+    """Tính toàn bộ đặc trưng bằng engine dạng cột (xem columnar_features.py và feature_state.py)."""
+    return compute_columnar_features(address, all_txs, balance_data)
+
+
+def calculate_feature_vector(address: str, all_txs: List[Dict[str, Any]], balance_data: Dict[str, Any],
+                             schema: Optional[FeatureSchema] = None) -> FeatureVector:
+    """Đặc trưng dạng vector theo thứ tự đầu vào của mô hình (mặc định lược đồ từ metadata.json)."""
+    return compute_vector(address, all_txs, balance_data, schema or default_schema())
+
+
+def calculate_all_features_reference(address: str, all_txs: List[Dict[str, Any]],
+                                     balance_data: Dict[str, Any]) -> Dict[str, Any]:
+    """Cài đặt gốc bằng list comprehension, giữ lại làm chuẩn để đối chiếu với engine dạng cột."""
     addr = address.lower()
     features: Dict[str, Any] = {}
 
@@ -253,33 +555,88 @@ def calculate_all_features(address: str, all_txs: List[Dict[str, Any]], balance_
 
 
 # --- Hàm chính để điều phối ---
-async def analyze_wallet_address(address: str) -> Optional[Dict[str, Any]]:
+@dataclass
+class WalletAnalysisResult:
+    address: str
+    vector: Optional[FeatureVector] = None  # đặc trưng theo thứ tự đầu vào của mô hình
+    error: Optional[str] = None             # lý do thất bại, None nếu thành công
+    partial: bool = False                   # True nếu đặc trưng được tính trên lịch sử bị cắt
+    last_block: Optional[int] = None        # block cao nhất trong lịch sử đã dùng để tính đặc trưng
+
+    @property
+    def features(self) -> Optional[Dict[str, Any]]:
+        """Dict đặc trưng dựng từ vector, chỉ dùng cho debug và các API trả về dict."""
+        return self.vector.to_dict() if self.vector is not None else None
+
+
+# Các phân tích đồng thời của cùng một địa chỉ (viết thường) chỉ chạy một lần; lỗi không được memo
+# để lượt thử lại (ví dụ trong api_graph.py) thực sự gọi lại Covalent
+ANALYSIS_FLIGHTS = SingleFlight(ANALYSIS_MEMO_TTL_SECONDS,
+                                should_memoize=lambda result: result.error is None and not result.partial)
+
+
+async def analyze_wallet(address: str, client: httpx.AsyncClient, fresh: bool = False) -> WalletAnalysisResult:
+    """
+    Phân tích một địa chỉ ví, không ném ngoại lệ: lỗi được trả về trong `error`.
+    fresh=True (header X-Prediction-Cache: bypass): không dùng kết quả memo của ANALYSIS_FLIGHTS.
+    """
+    result = await ANALYSIS_FLIGHTS.run(address.lower(), lambda: _analyze_wallet(address, client), use_memo=not fresh)
+    # Kết quả dùng chung giữa các người gọi: giữ nguyên cách viết địa chỉ của từng người
+    return replace(result, address=address)
+
+
+async def _analyze_wallet(address: str, client: httpx.AsyncClient) -> WalletAnalysisResult:
     if not COVALENT_API_KEY:
         logging.error("Không thể phân tích: COVALENT_API_KEY chưa được đặt.")
-        return None
+        return WalletAnalysisResult(address, error="COVALENT_API_KEY chưa được đặt")
 
     logging.info(f"Bắt đầu phân tích địa chỉ: {address}")
 
-    timeout = httpx.Timeout(30.0, connect=60.0)
-
     try:
-        async with httpx.AsyncClient(timeout=timeout) as client:
-            tasks = [
-                fetch_all_transactions(address, client),
-                fetch_balance(address, client)
-            ]
-            all_txs, balance_data = await asyncio.gather(*tasks)
-
-        if not all_txs and not balance_data.get('items'):
+        tasks = [
+            fetch_feature_state(address, client),
+            fetch_balance_cached(address, client)
+        ]
+        (state, partial), balance_data = await asyncio.gather(*tasks)
+
+        if not state.txs.count and not balance_data.get('items'):
             logging.warning(f"Không tìm thấy dữ liệu giao dịch hoặc số dư cho {address}.")
-            return None
+            return WalletAnalysisResult(address, error="Không tìm thấy dữ liệu giao dịch hoặc số dư")
 
-        features = calculate_all_features(address, all_txs, balance_data)
-        logging.info(f"Phân tích hoàn tất cho {address}")
-        return features
+        vector = state.to_vector(default_schema(), balance_data)
+        logging.info(f"Phân tích hoàn tất cho {address}{' (lịch sử không đầy đủ)' if partial else ''}")
+        return WalletAnalysisResult(address, vector=vector, partial=partial, last_block=state.highest_block)
 
     except Exception as e:
         logging.error(f"Lỗi nghiêm trọng trong quá trình phân tích ví {address}: {type(e).__name__} - {e}")
         import traceback
         traceback.print_exc()
-        return None
\ No newline at end of file
+        return WalletAnalysisResult(address, error=f"{type(e).__name__}: {e}")
+
+
+async def analyze_wallet_address(address: str, client: Optional[httpx.AsyncClient] = None) -> Optional[Dict[str, Any]]:
+    """
+    Phân tích một địa chỉ ví, trả về dict đặc trưng hoặc None nếu thất bại.
+    `client` là client dùng chung do lifespan của ứng dụng tạo ra (xem covalent_client.py);
+    nếu không truyền vào, một client tạm sẽ được tạo và đóng ngay sau khi xong.
+    """
+    if client is None:
+        async with create_covalent_client() as own_client:
+            return await analyze_wallet_address(address, own_client)
+    return (await analyze_wallet(address, client)).features
+
+
+async def analyze_wallet_addresses(addresses: Iterable[str], client: httpx.AsyncClient,
+                                   fresh: bool = False) -> AsyncIterator[WalletAnalysisResult]:
+    """
+    Phân tích nhiều địa chỉ cùng lúc, trả về từng kết quả ngay khi xong (không theo thứ tự đầu vào).
+    Mọi request trang và số dư của cả lô đi qua FETCH_SCHEDULER, nên ví nhỏ không bị chặn sau ví lớn.
+    fresh: như analyze_wallet.
+    """
+    tasks = [asyncio.create_task(analyze_wallet(address, client, fresh)) for address in dict.fromkeys(addresses)]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        for task in tasks:
+            task.cancel()
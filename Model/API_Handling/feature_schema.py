@@ -0,0 +1,86 @@
+# feature_schema.py
+# Lược đồ đặc trưng cố định theo thứ tự đầu vào của mô hình (final_features_list trong metadata.json):
+# mỗi đặc trưng có một chỉ số cố định, FeatureState ghi thẳng vào một mảng float64 cấp phát sẵn
+# thay vì dựng dict rồi DataFrame rồi sắp xếp lại cột cho từng ví.
+# Hai cột token (chuỗi) được giữ riêng trong `labels` để kế hoạch tiền xử lý mã hoá.
+# Dict đặc trưng (FeatureVector.to_dict) chỉ còn dùng cho debug và các API trả về dict.
+
+import json
+import os
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+CATEGORICAL_FEATURES = ('ERC20 most sent token type', 'ERC20_most_rec_token_type')
+METADATA_PATH = os.getenv("MODEL_METADATA_PATH",
+                          os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Model', 'metadata.json'))
+
+
+class FeatureVector:
+    """Đặc trưng của một ví theo thứ tự của lược đồ; đặc trưng chưa ghi giữ giá trị 0.0 như khi thiếu cột."""
+
+    __slots__ = ('schema', 'values', 'labels')
+
+    def __init__(self, schema: 'FeatureSchema'):
+        self.schema = schema
+        self.values = np.zeros(len(schema.columns), dtype=np.float64)
+        self.labels: List[Any] = [0.0] * len(schema.categorical)
+
+    def __setitem__(self, name: str, value: Any) -> None:
+        slot = self.schema.label_slot.get(name)
+        if slot is not None:
+            self.labels[slot] = value
+            return
+        index = self.schema.index.get(name)
+        if index is not None:   # đặc trưng mô hình không dùng thì bỏ qua
+            self.values[index] = np.nan if value is None else value
+
+    def __getitem__(self, name: str) -> Any:
+        slot = self.schema.label_slot.get(name)
+        if slot is not None:
+            return self.labels[slot]
+        return float(self.values[self.schema.index[name]])
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Dict theo thứ tự mô hình (debug / API trả về dict); giá trị số là float, NaN đổi lại thành None."""
+        return {name: (None if isinstance(value, float) and value != value else value)
+                for name, value in ((name, self[name]) for name in self.schema.columns)}
+
+
+class FeatureSchema:
+    def __init__(self, columns: Sequence[str], categorical: Iterable[str] = CATEGORICAL_FEATURES):
+        self.columns: Tuple[str, ...] = tuple(columns)
+        self.index: Dict[str, int] = {name: i for i, name in enumerate(self.columns)}
+        self.categorical: Tuple[str, ...] = tuple(name for name in categorical if name in self.index)
+        # Cột token không có giá trị số: luôn 0 trong `values`, giá trị thật nằm ở labels[label_slot[tên]]
+        self.label_slot: Dict[str, int] = {name: k for k, name in enumerate(self.categorical)}
+
+    @classmethod
+    def from_metadata(cls, path: str = METADATA_PATH) -> 'FeatureSchema':
+        with open(path, 'r') as f:
+            metadata = json.load(f)
+        return cls(metadata['features']['final_features_list'])
+
+    def new_vector(self) -> FeatureVector:
+        return FeatureVector(self)
+
+    def vector_from_dict(self, features: Dict[str, Any]) -> FeatureVector:
+        vector = FeatureVector(self)
+        for name, value in features.items():
+            vector[name] = value
+        return vector
+
+    def stack(self, vectors: List[FeatureVector]) -> np.ndarray:
+        """Ma trận (số ví, số đặc trưng) của phần số; cột token là 0."""
+        return np.stack([v.values for v in vectors]) if vectors else np.empty((0, len(self.columns)))
+
+    def column_labels(self, vectors: List[FeatureVector], name: str) -> List[Any]:
+        slot = self.label_slot[name]
+        return [v.labels[slot] for v in vectors]
+
+
+@lru_cache(maxsize=None)
+def default_schema(path: Optional[str] = None) -> FeatureSchema:
+    """Lược đồ của mô hình đang phục vụ, đọc metadata.json một lần cho cả tiến trình."""
+    return FeatureSchema.from_metadata(path or METADATA_PATH)
@@ -0,0 +1,299 @@
+# feature_state.py
+# Trạng thái đặc trưng có thể gộp (mergeable) cho từng địa chỉ: đếm, tổng, min/max,
+# mốc thời gian đầu/cuối (đủ để tính trung bình khoảng cách giữa các giao dịch),
+# tập đối tác phân biệt và bộ đếm token symbol. Cập nhật với giao dịch mới tốn O(số giao dịch mới)
+# và cho ra cùng dict đặc trưng như khi tính lại toàn bộ (sai khác tối đa ở mức làm tròn float).
+
+from typing import List, Dict, Any, Iterator, Optional, Set, Tuple
+
+import numpy as np
+
+from columnar_features import build_columns, TransactionColumns, TokenTransferColumns, ether_balance
+from feature_schema import FeatureSchema, FeatureVector
+
+_MICROS_PER_MINUTE = 60 * 1e6
+
+
+class _Aggregate:
+    """Đếm, tổng/min/max giá trị và min/max thời gian của một nhóm giao dịch."""
+    __slots__ = ('count', 'total', 'min', 'max', 'ts_min', 'ts_max')
+
+    def __init__(self, count=0, total=0.0, min=0.0, max=0.0, ts_min=None, ts_max=None):
+        self.count, self.total, self.min, self.max = count, total, min, max
+        self.ts_min, self.ts_max = ts_min, ts_max
+
+    def add(self, values: np.ndarray, timestamps: np.ndarray) -> None:
+        if not values.size:
+            return
+        # cumsum cộng tuần tự tiếp nối tổng hiện có, giống sum() của Python trên cùng thứ tự:
+        # nạp lần lượt từng trang cho đúng cùng tổng như nạp cả lịch sử một lần
+        total = float(np.cumsum(np.concatenate(([self.total], values)))[-1])
+        batch_min, batch_max = float(values.min()), float(values.max())
+        batch_ts_min, batch_ts_max = int(timestamps.min()), int(timestamps.max())
+        if self.count:
+            self.total = total
+            self.min, self.max = min(self.min, batch_min), max(self.max, batch_max)
+            self.ts_min, self.ts_max = min(self.ts_min, batch_ts_min), max(self.ts_max, batch_ts_max)
+        else:
+            self.total, self.min, self.max = total, batch_min, batch_max
+            self.ts_min, self.ts_max = batch_ts_min, batch_ts_max
+        self.count += int(values.size)
+
+    def avg(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    def avg_minutes_between(self) -> float:
+        # Trung bình các khoảng cách liên tiếp sau khi sắp xếp = (max - min) / (n - 1)
+        if self.count < 2:
+            return 0.0
+        return (self.ts_max - self.ts_min) / _MICROS_PER_MINUTE / (self.count - 1)
+
+    def to_list(self) -> list:
+        return [self.count, self.total, self.min, self.max, self.ts_min, self.ts_max]
+
+
+class _SymbolCounter:
+    """
+    Bộ đếm token symbol giữ được quy tắc hoà của Counter.most_common(1) trên danh sách đã ghép:
+    mỗi symbol nhớ vị trí xuất hiện đầu tiên dưới dạng (khoá lô, chỉ số trong lô).
+    """
+    __slots__ = ('counts', 'first_seen')
+
+    def __init__(self, counts=None, first_seen=None):
+        self.counts: Dict[str, int] = counts or {}
+        self.first_seen: Dict[str, list] = first_seen or {}
+
+    def add(self, codes: np.ndarray, symbols: List[str], batch_key: int) -> None:
+        codes = codes[codes >= 0]
+        if not codes.size:
+            return
+        uniq, first_index, counts = np.unique(codes, return_index=True, return_counts=True)
+        for code, index, count in zip(uniq.tolist(), first_index.tolist(), counts.tolist()):
+            symbol = symbols[code]
+            self.counts[symbol] = self.counts.get(symbol, 0) + count
+            rank = [batch_key, index]
+            if symbol not in self.first_seen or rank < self.first_seen[symbol]:
+                self.first_seen[symbol] = rank
+
+    def most_common(self) -> Optional[str]:
+        if not self.counts:
+            return None
+        return min(self.counts, key=lambda s: (-self.counts[s], self.first_seen[s]))
+
+
+def _distinct(codes: np.ndarray, table: List[str]) -> Set[str]:
+    codes = codes[codes >= 0]
+    return {table[c] for c in np.unique(codes).tolist()} if codes.size else set()
+
+
+class FeatureState:
+    """Trạng thái đặc trưng của một địa chỉ, cập nhật tăng dần theo lô giao dịch."""
+
+    def __init__(self, address: str):
+        self.address = address
+        self.highest_block = 0
+        # True nếu lịch sử dừng ở giới hạn số trang: các giao dịch cũ hơn không có trong trạng thái
+        self.truncated = False
+        # Khoá lô để xếp thứ tự: lô ghép vào đầu danh sách nhận khoá âm dần, lô ghép vào cuối nhận khoá dương dần
+        self._front_key = -1
+        self._back_key = 0
+
+        self.txs = _Aggregate()
+        self.sent = _Aggregate()
+        self.received = _Aggregate()
+        self.sent_contract = _Aggregate()
+        self.created_contracts = 0
+        self.received_from: Set[str] = set()
+        self.sent_to: Set[str] = set()
+
+        self.tk_total = 0
+        self.tk_sent = _Aggregate()
+        self.tk_received = _Aggregate()
+        self.tk_sent_contract = _Aggregate()
+        self.tk_sent_to: Set[str] = set()
+        self.tk_received_from: Set[str] = set()
+        self.tk_received_contract_from: Set[str] = set()
+        self.tk_sent_symbols = _SymbolCounter()
+        self.tk_received_symbols = _SymbolCounter()
+
+    # --- Khởi tạo ---
+    @classmethod
+    def from_transactions(cls, address: str, all_txs: List[Dict[str, Any]]) -> 'FeatureState':
+        state = cls(address)
+        state.update(all_txs, prepend=False)
+        return state
+
+    @classmethod
+    def from_columns(cls, address: str, txs: TransactionColumns, tokens: TokenTransferColumns) -> 'FeatureState':
+        state = cls(address)
+        state.update_columns(txs, tokens, prepend=False)
+        return state
+
+    # --- Cập nhật ---
+    def update(self, new_txs: List[Dict[str, Any]], prepend: bool = True) -> None:
+        """
+        Gộp các giao dịch mới vào trạng thái. `prepend=True` nghĩa là các giao dịch này đứng trước
+        dữ liệu cũ trong danh sách ghép (như merge_transactions: mới nhất trước); `prepend=False`
+        dùng khi nạp lần lượt các trang theo thứ tự.
+        """
+        if not new_txs:
+            return
+        txs, tokens = build_columns(self.address, new_txs)
+        self.update_columns(txs, tokens, prepend)
+        self.highest_block = max(self.highest_block, max(tx.get('block_height') or 0 for tx in new_txs))
+
+    def update_columns(self, txs: TransactionColumns, tokens: TokenTransferColumns, prepend: bool) -> None:
+        if prepend:
+            batch_key, self._front_key = self._front_key, self._front_key - 1
+        else:
+            batch_key, self._back_key = self._back_key, self._back_key + 1
+
+        sent, received = txs.is_sent, txs.is_received
+        sent_contract = sent & txs.to_is_contract
+        self.txs.add(txs.values, txs.timestamps)
+        self.sent.add(txs.values[sent], txs.timestamps[sent])
+        self.received.add(txs.values[received], txs.timestamps[received])
+        self.sent_contract.add(txs.values[sent_contract], txs.timestamps[sent_contract])
+        self.created_contracts += int((sent & txs.to_is_none).sum())
+        self.received_from |= _distinct(txs.from_codes[received], txs.addresses)
+        self.sent_to |= _distinct(txs.to_codes[sent], txs.addresses)
+
+        tk_sent, tk_received = tokens.is_sent, tokens.is_received
+        tk_sent_contract = tk_sent & tokens.to_is_contract
+        self.tk_total += int(tokens.values.size)
+        self.tk_sent.add(tokens.values[tk_sent], tokens.timestamps[tk_sent])
+        self.tk_received.add(tokens.values[tk_received], tokens.timestamps[tk_received])
+        self.tk_sent_contract.add(tokens.values[tk_sent_contract], tokens.timestamps[tk_sent_contract])
+        self.tk_sent_to |= _distinct(tokens.to_codes[tk_sent], tokens.addresses)
+        self.tk_received_from |= _distinct(tokens.from_codes[tk_received], tokens.addresses)
+        self.tk_received_contract_from |= _distinct(
+            tokens.from_codes[tk_received & tokens.to_is_contract], tokens.addresses)
+        self.tk_sent_symbols.add(tokens.symbol_codes[tk_sent], tokens.symbols, batch_key)
+        self.tk_received_symbols.add(tokens.symbol_codes[tk_received], tokens.symbols, batch_key)
+
+    # --- Xuất đặc trưng ---
+    def feature_items(self, balance_data: Dict[str, Any]) -> Iterator[Tuple[str, Any]]:
+        """Các cặp (tên, giá trị) đặc trưng, cùng khoá và thứ tự với calculate_all_features_reference."""
+        yield 'Avg min between sent tnx', self.sent.avg_minutes_between()
+        yield 'Avg min between received tnx', self.received.avg_minutes_between()
+        yield 'Time Diff between first and last (Mins)', (
+            (self.txs.ts_max - self.txs.ts_min) / _MICROS_PER_MINUTE if self.txs.count else 0)
+        yield 'Sent tnx', self.sent.count
+        yield 'Received Tnx', self.received.count
+        yield 'Number of Created Contracts', self.created_contracts
+        yield 'Unique Received From Addresses', len(self.received_from)
+        yield 'Unique Sent To Addresses', len(self.sent_to)
+
+        yield 'min value received', self.received.min
+        yield 'max value received', self.received.max
+        yield 'avg val received', self.received.avg()
+        yield 'min val sent', self.sent.min
+        yield 'max val sent', self.sent.max
+        yield 'avg val sent', self.sent.avg()
+        yield 'min value sent to contract', self.sent_contract.min
+        yield 'max val sent to contract', self.sent_contract.max
+        yield 'avg value sent to contract', self.sent_contract.avg()
+
+        # Chú ý: Giữ nguyên lỗi typo để khớp với model đã huấn luyện
+        yield 'total transactions (including tnx to create contract', self.txs.count
+        yield 'total Ether sent', self.sent.total
+        yield 'total ether received', self.received.total
+        yield 'total ether sent contracts', self.sent_contract.total
+        yield 'total ether balance', ether_balance(balance_data)
+
+        yield 'Total ERC20 tnxs', self.tk_total
+        yield 'ERC20 total Ether received', self.tk_received.total
+        yield 'ERC20 total ether sent', self.tk_sent.total
+        yield 'ERC20 total Ether sent contract', self.tk_sent_contract.total
+
+        # Các cột "bẩn" từ dữ liệu training (bản sao '.1' và 'rec 2')
+        uniq_sent_addr = len(self.tk_sent_to)
+        yield 'ERC20 uniq sent addr', uniq_sent_addr
+        yield 'ERC20 uniq sent addr.1', uniq_sent_addr
+        yield 'ERC20 uniq rec addr', len(self.tk_received_from)
+        yield 'ERC20 uniq rec contract addr', len(self.tk_received_contract_from)
+
+        yield 'ERC20 avg time between sent tnx', self.tk_sent.avg_minutes_between()
+        avg_time_rec = self.tk_received.avg_minutes_between()
+        yield 'ERC20 avg time between rec tnx', avg_time_rec
+        yield 'ERC20 avg time between rec 2 tnx', avg_time_rec
+        yield 'ERC20 avg time between contract tnx', self.tk_sent_contract.avg_minutes_between()
+
+        yield 'ERC20 min val rec', self.tk_received.min
+        yield 'ERC20 max val rec', self.tk_received.max
+        yield 'ERC20 avg val rec', self.tk_received.avg()
+        yield 'ERC20 min val sent', self.tk_sent.min
+        yield 'ERC20 max val sent', self.tk_sent.max
+        yield 'ERC20 avg val sent', self.tk_sent.avg()
+        yield 'ERC20 min val sent contract', self.tk_sent_contract.min
+        yield 'ERC20 max val sent contract', self.tk_sent_contract.max
+        yield 'ERC20 avg val sent contract', self.tk_sent_contract.avg()
+
+        yield 'ERC20 uniq sent token name', len(self.tk_sent_symbols.counts)
+        yield 'ERC20 uniq rec token name', len(self.tk_received_symbols.counts)
+
+        yield 'ERC20 most sent token type', self.tk_sent_symbols.most_common()
+        yield 'ERC20_most_rec_token_type', self.tk_received_symbols.most_common()
+
+    def to_features(self, balance_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Dict đặc trưng (dùng cho debug và calculate_all_features)."""
+        return dict(self.feature_items(balance_data))
+
+    def to_vector(self, schema: FeatureSchema, balance_data: Dict[str, Any]) -> FeatureVector:
+        """Ghi đặc trưng thẳng vào vector theo chỉ số cố định của lược đồ (thứ tự đầu vào mô hình)."""
+        vector = schema.new_vector()
+        for name, value in self.feature_items(balance_data):
+            vector[name] = value
+        return vector
+
+    # --- Lưu trữ (JSON) ---
+    _AGGREGATES = ('txs', 'sent', 'received', 'sent_contract', 'tk_sent', 'tk_received', 'tk_sent_contract')
+    _SETS = ('received_from', 'sent_to', 'tk_sent_to', 'tk_received_from', 'tk_received_contract_from')
+    _COUNTERS = ('tk_sent_symbols', 'tk_received_symbols')
+
+    def to_dict(self) -> Dict[str, Any]:
+        data: Dict[str, Any] = {
+            'address': self.address,
+            'highest_block': self.highest_block,
+            'truncated': self.truncated,
+            'front_key': self._front_key,
+            'back_key': self._back_key,
+            'created_contracts': self.created_contracts,
+            'tk_total': self.tk_total,
+        }
+        for name in self._AGGREGATES:
+            data[name] = getattr(self, name).to_list()
+        for name in self._SETS:
+            data[name] = sorted(getattr(self, name))
+        for name in self._COUNTERS:
+            counter = getattr(self, name)
+            data[name] = {'counts': counter.counts, 'first_seen': counter.first_seen}
+        return data
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'FeatureState':
+        state = cls(data['address'])
+        state.highest_block = data['highest_block']
+        state.truncated = data.get('truncated', False)
+        state._front_key, state._back_key = data['front_key'], data['back_key']
+        state.created_contracts, state.tk_total = data['created_contracts'], data['tk_total']
+        for name in cls._AGGREGATES:
+            setattr(state, name, _Aggregate(*data[name]))
+        for name in cls._SETS:
+            setattr(state, name, set(data[name]))
+        for name in cls._COUNTERS:
+            setattr(state, name, _SymbolCounter(data[name]['counts'], data[name]['first_seen']))
+        return state
+
+
+def compute_features(address: str, all_txs: List[Dict[str, Any]], balance_data: Dict[str, Any]) -> Dict[str, Any]:
+    """Tính đặc trưng một lần cho toàn bộ lịch sử (engine dạng cột + FeatureState)."""
+    txs, tokens = build_columns(address, all_txs)
+    return FeatureState.from_columns(address, txs, tokens).to_features(balance_data)
+
+
+def compute_vector(address: str, all_txs: List[Dict[str, Any]], balance_data: Dict[str, Any],
+                   schema: FeatureSchema) -> FeatureVector:
+    """Như compute_features nhưng ghi thẳng vào FeatureVector theo thứ tự của mô hình."""
+    txs, tokens = build_columns(address, all_txs)
+    return FeatureState.from_columns(address, txs, tokens).to_vector(schema, balance_data)
@@ -0,0 +1,70 @@
+# fetch_scheduler.py
+# Bộ lập lịch dùng chung cho mọi request Covalent trong tiến trình.
+# Giới hạn số request đang bay và chia lượt theo vòng tròn giữa các ví: khi một chỗ trống xuất hiện,
+# nó được cấp cho ví kế tiếp trong vòng thay vì cho request đến sớm nhất, nên một ví nhỏ
+# không phải xếp hàng sau toàn bộ các trang của một ví sàn giao dịch 50 trang.
+
+import asyncio
+from collections import deque, OrderedDict
+from contextlib import asynccontextmanager
+from typing import Deque, Dict
+
+from rate_limiter import AdaptiveRateLimiter
+
+
+class FetchScheduler:
+    def __init__(self, rate_limiter: AdaptiveRateLimiter, max_in_flight: int):
+        self.rate_limiter = rate_limiter
+        self.max_in_flight = max_in_flight
+        self._active = 0
+        # key -> các request đang chờ của ví đó; thứ tự của dict chính là vòng tròn
+        self._waiting: "OrderedDict[str, Deque[asyncio.Future]]" = OrderedDict()
+
+    @property
+    def queued(self) -> int:
+        return sum(len(q) for q in self._waiting.values())
+
+    @asynccontextmanager
+    async def slot(self, key: str):
+        """Giữ một chỗ trong số request đang bay (đã qua bộ giới hạn tốc độ) cho ví `key`."""
+        key = key.lower()
+        await self._acquire(key)
+        try:
+            await self.rate_limiter.acquire()
+            yield
+        finally:
+            self._release()
+
+    async def _acquire(self, key: str) -> None:
+        if self._active < self.max_in_flight and not self._waiting:
+            self._active += 1
+            return
+        future = asyncio.get_running_loop().create_future()
+        self._waiting.setdefault(key, deque()).append(future)
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # Đã được cấp chỗ nhưng bị huỷ ngay sau đó: trả lại chỗ
+                self._release()
+            raise
+
+    def _release(self) -> None:
+        self._active -= 1
+        self._dispatch()
+
+    def _dispatch(self) -> None:
+        while self._active < self.max_in_flight and self._waiting:
+            key, queue = next(iter(self._waiting.items()))
+            future = queue.popleft()
+            # Chuyển ví này xuống cuối vòng (hoặc bỏ khỏi vòng nếu hết request chờ)
+            del self._waiting[key]
+            if queue:
+                self._waiting[key] = queue
+            if future.cancelled():
+                continue
+            self._active += 1
+            future.set_result(None)
+
+    def snapshot(self) -> Dict[str, int]:
+        return {"active": self._active, "queued": self.queued, "wallets_waiting": len(self._waiting)}
@@ -0,0 +1,134 @@
+# fused_inference.py
+# Suy luận không cần torch cho ImprovedFraudGNN lúc phục vụ.
+# Khi phục vụ, edge_index rỗng: GCNConv chỉ còn self-loop với bậc 1, chuẩn hoá D^-1/2 (A+I) D^-1/2 = I,
+# nên mỗi lớp là một phép affine x @ W^T + b. Cả mô hình (ở chế độ eval, dropout tắt) rút gọn thành
+#   relu(x @ W1 + b1) -> relu(. @ W2 + b2) -> . @ W3 + b3 -> softmax
+# (conv3 không được dùng trong forward nên bị bỏ). Trọng số được gấp sẵn thành ma trận NumPy float32
+# và lưu .npz (không pickle), kèm sha256 của file .pth nguồn để phát hiện trọng số cũ.
+#
+# Xuất (cần torch + torch_geometric, chạy một lần sau mỗi lần huấn luyện) và kiểm tra khớp với torch:
+#   cd Model/API_Handling && python fused_inference.py export --verify
+
+import argparse
+import os
+from typing import Optional
+
+import numpy as np
+
+from preprocessing_plan import file_sha256
+
+FUSED_FORMAT = "fraud-gnn-fused"
+FUSED_VERSION = 1
+FUSED_FILENAME = 'fraud_gnn_fused.npz'
+WEIGHTS_FILENAME = 'fraud_gnn_weights.pth'
+
+
+class FusedFraudModel:
+    """Ba phép affine đã gấp từ ImprovedFraudGNN; đầu vào là ma trận đã tiền xử lý (n, số đặc trưng)."""
+
+    def __init__(self, w1, b1, w2, b2, w3, b3, source_sha256: Optional[str] = None):
+        self.layers = [(np.ascontiguousarray(w, dtype=np.float32), np.asarray(b, dtype=np.float32))
+                       for w, b in ((w1, b1), (w2, b2), (w3, b3))]
+        self.source_sha256 = source_sha256
+        self.num_features = self.layers[0][0].shape[0]
+
+    @property
+    def first_layer_weight(self) -> np.ndarray:
+        """Trọng số lớp đầu dạng (đầu ra, đầu vào) như conv1.lin.weight, dùng cho explain_address."""
+        return self.layers[0][0].T
+
+    @classmethod
+    def from_state_dict(cls, state_dict, source_sha256: Optional[str] = None) -> 'FusedFraudModel':
+        def array(name):
+            value = state_dict[name]
+            return value.detach().cpu().numpy() if hasattr(value, 'detach') else np.asarray(value)
+        return cls(array('conv1.lin.weight').T, array('conv1.bias'),
+                   array('conv2.lin.weight').T, array('conv2.bias'),
+                   array('classifier.weight').T, array('classifier.bias'), source_sha256)
+
+    @classmethod
+    def load(cls, path: str) -> 'FusedFraudModel':
+        with np.load(path, allow_pickle=False) as data:
+            if str(data['format']) != FUSED_FORMAT or int(data['version']) != FUSED_VERSION:
+                raise ValueError(f"{path} không phải trọng số gấp phiên bản {FUSED_VERSION}")
+            return cls(data['w1'], data['b1'], data['w2'], data['b2'], data['w3'], data['b3'],
+                       str(data['source_sha256']) or None)
+
+    def save(self, path: str) -> None:
+        (w1, b1), (w2, b2), (w3, b3) = self.layers
+        np.savez(path, format=FUSED_FORMAT, version=FUSED_VERSION, source_sha256=self.source_sha256 or '',
+                 w1=w1, b1=b1, w2=w2, b2=b2, w3=w3, b3=b3)
+
+    def logits(self, x: np.ndarray) -> np.ndarray:
+        h = np.asarray(x, dtype=np.float32)
+        (w1, b1), (w2, b2), (w3, b3) = self.layers
+        h = np.maximum(h @ w1 + b1, 0)
+        h = np.maximum(h @ w2 + b2, 0)
+        return h @ w3 + b3
+
+    def fraud_log_odds_gradient(self, x: np.ndarray) -> np.ndarray:
+        """
+        Gradient của log-odds gian lận (logit[1] - logit[0]) theo đầu vào, cho cả lô trong một lượt
+        lan truyền ngược viết tay: mạng là affine + ReLU nên gradient chỉ phụ thuộc các mặt nạ ReLU.
+        """
+        h = np.asarray(x, dtype=np.float32)
+        (w1, b1), (w2, b2), (w3, b3) = self.layers
+        z1 = h @ w1 + b1
+        z2 = np.maximum(z1, 0) @ w2 + b2
+        grad = (w3[:, 1] - w3[:, 0]) * (z2 > 0)   # (n, 32)
+        grad = (grad @ w2.T) * (z1 > 0)             # (n, 64)
+        return grad @ w1.T                           # (n, số đặc trưng)
+
+    def predict_proba(self, x: np.ndarray) -> np.ndarray:
+        logits = self.logits(x)
+        logits -= logits.max(axis=1, keepdims=True)
+        np.exp(logits, out=logits)
+        logits /= logits.sum(axis=1, keepdims=True)
+        return logits
+
+
+def fold_weights(artifacts_dir: str) -> FusedFraudModel:
+    import torch
+    weights_path = os.path.join(artifacts_dir, WEIGHTS_FILENAME)
+    return FusedFraudModel.from_state_dict(torch.load(weights_path, map_location='cpu'), file_sha256(weights_path))
+
+
+def verify(fused: FusedFraudModel, artifacts_dir: str, n_rows: int = 4096, seed: int = 0) -> float:
+    """So xác suất với mô hình torch (edge_index rỗng) trên dữ liệu ngẫu nhiên đã chuẩn hoá; trả về sai khác lớn nhất."""
+    import torch
+    from gnn_model import load_torch_model
+    model = load_torch_model(os.path.join(artifacts_dir, WEIGHTS_FILENAME), fused.num_features)
+    # Đầu ra của StandardScaler quanh 0, thêm vài giá trị lớn như các ví có giao dịch bất thường
+    rng = np.random.default_rng(seed)
+    x = rng.standard_normal((n_rows, fused.num_features)).astype(np.float32)
+    x[: n_rows // 8] *= 50
+    with torch.no_grad():
+        expected = torch.softmax(model(torch.from_numpy(x), torch.empty((2, 0), dtype=torch.long)), dim=1).numpy()
+    actual = fused.predict_proba(x)
+    if not np.array_equal(expected.argmax(axis=1), actual.argmax(axis=1)):
+        raise AssertionError("Nhãn dự đoán của bản gấp lệch với mô hình torch")
+    return float(np.max(np.abs(expected - actual)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Gấp trọng số ImprovedFraudGNN thành ma trận NumPy")
+    sub = parser.add_subparsers(dest="command", required=True)
+    exp = sub.add_parser("export")
+    exp.add_argument("--artifacts", default='../Model/')
+    exp.add_argument("--out", help=f"mặc định <artifacts>/{FUSED_FILENAME}")
+    exp.add_argument("--verify", action="store_true", help="so với mô hình torch trước khi kết thúc")
+    args = parser.parse_args()
+
+    fused = fold_weights(args.artifacts)
+    if args.verify:
+        worst = verify(fused, args.artifacts)
+        print(f"Sai khác xác suất lớn nhất so với torch: {worst:.3g}")
+        if worst > 1e-5:
+            raise SystemExit("Bản gấp lệch với mô hình torch quá 1e-5, không ghi file.")
+    out = args.out or os.path.join(args.artifacts, FUSED_FILENAME)
+    fused.save(out)
+    print(f"Đã ghi trọng số gấp ({fused.num_features} đặc trưng) vào {out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,31 @@
+# gnn_model.py
+# Định nghĩa mô hình GNN bằng torch/torch_geometric, tách khỏi model.py để đường phục vụ dùng
+# fused_inference (chỉ NumPy) không phải import torch. Chỉ cần khi huấn luyện, xuất trọng số
+# hoặc chạy với INFERENCE_BACKEND=torch.
+
+import torch
+import torch.nn.functional as F
+from torch_geometric.nn import GCNConv
+
+
+class ImprovedFraudGNN(torch.nn.Module):
+    def __init__(self, num_features):
+        super().__init__()
+        self.conv1 = GCNConv(num_features, 64)
+        self.conv2 = GCNConv(64, 32)
+        self.conv3 = GCNConv(32, 16)
+        self.classifier = torch.nn.Linear(32, 2)
+        self.dropout = torch.nn.Dropout(0.5)
+
+    def forward(self, x, edge_index):
+        x = F.relu(self.conv1(x, edge_index))
+        x = self.dropout(x)
+        x = F.relu(self.conv2(x, edge_index))
+        return self.classifier(x)
+
+
+def load_torch_model(weights_path: str, num_features: int) -> ImprovedFraudGNN:
+    model = ImprovedFraudGNN(num_features)
+    model.load_state_dict(torch.load(weights_path, map_location='cpu'))
+    model.eval()
+    return model
@@ -0,0 +1,109 @@
+# inference_batcher.py
+# Gom các yêu cầu dự đoán đồng thời thành lô (micro-batching): yêu cầu đầu tiên mở một cửa sổ
+# `max_wait_ms`, mọi yêu cầu đến trong cửa sổ đó (tối đa `max_batch_size`) được dự đoán bằng
+# một lần gọi `predict_batch` (ví dụ model.predict_addresses) trên một luồng riêng,
+# nên event loop vẫn nhận request trong lúc mô hình đang chạy.
+
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, asdict
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+
+@dataclass
+class MicroBatchStats:
+    requests: int = 0       # tổng số lời gọi submit()
+    batches: int = 0        # số lần predict_batch được gọi
+    max_batch: int = 0      # lô lớn nhất đã chạy
+    fallbacks: int = 0      # số lô lỗi phải dự đoán lại từng phần tử
+    busy_seconds: float = 0.0
+
+
+class MicroBatcher:
+    def __init__(self, predict_batch: Callable[[List[Any]], List[Any]], max_batch_size: int = 256,
+                 max_wait_ms: float = 2.0):
+        self.predict_batch = predict_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+        self.stats = MicroBatchStats()
+        self._pending: List[Tuple[Any, asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._running: Set[asyncio.Task] = set()
+        # Một luồng: các lô chạy nối tiếp, phần song song để cho thread pool của torch/numpy
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="micro-batch")
+
+    async def submit(self, item: Any) -> Any:
+        """Dự đoán một phần tử; trả về kết quả tương ứng của predict_batch hoặc ném lỗi của riêng phần tử đó."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self.stats.requests += 1
+        self._pending.append((item, future))
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait_ms / 1000, self._flush)
+        return await future
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            task = asyncio.get_running_loop().create_task(self._run(batch))
+            self._running.add(task)
+            task.add_done_callback(self._running.discard)
+
+    async def _run(self, batch: List[Tuple[Any, asyncio.Future]]) -> None:
+        loop = asyncio.get_running_loop()
+        items = [item for item, _ in batch]
+        self.stats.batches += 1
+        self.stats.max_batch = max(self.stats.max_batch, len(items))
+        start = time.perf_counter()
+        try:
+            outcomes = await loop.run_in_executor(self._executor, self._predict, items)
+        except BaseException as e:
+            # Lỗi của cả lô (executor đã đóng, task bị huỷ, ...): không để người gọi submit() chờ mãi
+            for _, future in batch:
+                if not future.done():
+                    if isinstance(e, asyncio.CancelledError):
+                        future.cancel()
+                    else:
+                        future.set_exception(e)
+            if not isinstance(e, Exception):
+                raise
+            return
+        finally:
+            self.stats.busy_seconds += time.perf_counter() - start
+        for (_, future), (ok, value) in zip(batch, outcomes):
+            if future.done():  # người gọi đã huỷ
+                continue
+            if ok:
+                future.set_result(value)
+            else:
+                future.set_exception(value)
+
+    def _predict(self, items: List[Any]) -> List[Tuple[bool, Any]]:
+        try:
+            results = self.predict_batch(items)
+        except Exception:
+            # Một phần tử hỏng không được làm hỏng cả lô: dự đoán lại từng phần tử
+            self.stats.fallbacks += 1
+        else:
+            if len(results) != len(items):
+                raise ValueError(f"predict_batch trả về {len(results)} kết quả cho {len(items)} phần tử")
+            return [(True, result) for result in results]
+        outcomes = []
+        for item in items:
+            try:
+                outcomes.append((True, self.predict_batch([item])[0]))
+            except Exception as e:
+                outcomes.append((False, e))
+        return outcomes
+
+    def summary(self) -> Dict[str, Any]:
+        stats = asdict(self.stats)
+        stats["mean_batch"] = round(self.stats.requests / self.stats.batches, 2) if self.stats.batches else 0.0
+        return {**stats, "pending": len(self._pending), "max_batch_size": self.max_batch_size,
+                "max_wait_ms": self.max_wait_ms}
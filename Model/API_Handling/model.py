@@ -1,26 +1,33 @@
-import torch
-import torch.nn.functional as F
-from torch_geometric.nn import GCNConv
-import joblib
 import numpy as np
 import pandas as pd
 import json
+import logging
 import os
-
-class ImprovedFraudGNN(torch.nn.Module):
-    def __init__(self, num_features):
-        super().__init__()
-        self.conv1 = GCNConv(num_features, 64)
-        self.conv2 = GCNConv(64, 32)
-        self.conv3 = GCNConv(32, 16)
-        self.classifier = torch.nn.Linear(32, 2)
-        self.dropout = torch.nn.Dropout(0.5)
-
-    def forward(self, x, edge_index):
-        x = F.relu(self.conv1(x, edge_index))
-        x = self.dropout(x)
-        x = F.relu(self.conv2(x, edge_index))
-        return self.classifier(x)
+import weakref
+from preprocessing_plan import PreprocessingPlan, PLAN_FILENAME, file_sha256
+from feature_schema import FeatureVector
+from fused_inference import FusedFraudModel, FUSED_FILENAME
+from onnx_inference import OnnxFraudModel, ONNX_FILENAME, INT8_FILENAME
+
+# "plan": dùng preprocessing_plan.json nếu có và khớp với .pkl (không cần joblib/sklearn);
+# "pipeline": luôn unpickle preprocessing_pipeline.pkl
+PREPROCESSING_BACKEND = os.getenv("PREPROCESSING_BACKEND", "plan")
+# "fused": dùng fraud_gnn_fused.npz nếu có và khớp với .pth (không import torch/torch_geometric);
+# "onnx": phiên ONNX Runtime trên fraud_gnn.onnx (xem onnx_inference.py, số luồng qua ORT_*_THREADS);
+# "onnx-int8": như "onnx" với bản lượng tử hoá fraud_gnn_int8.onnx (xem quantize_model.py);
+# "torch": luôn dựng ImprovedFraudGNN bằng torch
+INFERENCE_BACKEND = os.getenv("INFERENCE_BACKEND", "fused")
+# backend ONNX -> (file mô hình, lệnh tạo lại)
+ONNX_BACKENDS = {"onnx": (ONNX_FILENAME, "onnx_inference.py export --verify"),
+                 "onnx-int8": (INT8_FILENAME, "quantize_model.py")}
+
+
+def __getattr__(name):
+    # Giữ `from model import ImprovedFraudGNN` mà không import torch khi chỉ dùng bản gấp
+    if name == "ImprovedFraudGNN":
+        from gnn_model import ImprovedFraudGNN
+        return ImprovedFraudGNN
+    raise AttributeError(f"module 'model' has no attribute {name!r}")
 
 def load_artifacts(artifacts_dir: str):
     """
@@ -34,80 +41,172 @@ def load_artifacts(artifacts_dir: str):
     if not all(os.path.exists(p) for p in [pipeline_path, metadata_path, weights_path]):
         raise FileNotFoundError(f"Một hoặc nhiều file mô hình không được tìm thấy trong thư mục: {artifacts_dir}. Vui lòng kiểm tra lại đường dẫn.")
 
-    pipeline = joblib.load(pipeline_path)
+    pipeline = load_preprocessing(artifacts_dir, pipeline_path)
     with open(metadata_path, 'r') as f:
         metadata = json.load(f)
 
     final_features_list = metadata['features']['final_features_list']
     num_features = len(final_features_list)
 
-    model = ImprovedFraudGNN(num_features)
-    model.load_state_dict(torch.load(weights_path, map_location='cpu'))
-    model.eval()
+    model = load_model_weights(artifacts_dir, weights_path, num_features)
+    _explainer(model)   # tính sẵn độ quan trọng toàn cục cho explain_address
 
     # Trả về cả danh sách các đặc trưng mong muốn để tái sử dụng
     return model, pipeline, final_features_list
 
-def predict_address(model, pipeline, features_dict: dict, expected_columns: list):
+def _feature_frame(features_list: list, expected_columns: list) -> pd.DataFrame:
     """
-    Dự đoán một địa chỉ.
-    Tối ưu: Nhận 'expected_columns' trực tiếp thay vì đọc lại file metadata mỗi lần gọi.
+    Xếp các dict đặc trưng thành một DataFrame theo đúng thứ tự cột của mô hình.
+    Cột thiếu trong một dict được điền 0.0 cho riêng dòng đó (giống predict_address một dòng trước đây).
     """
-    df = pd.DataFrame([features_dict])
-
-    # Sắp xếp lại và điền các cột bị thiếu để khớp với đầu vào của mô hình
-    missing_cols = set(expected_columns) - set(df.columns)
-    for col in missing_cols:
-        df[col] = 0.0
-    df = df[expected_columns]
+    rows = [[features.get(col, 0.0) for col in expected_columns] for features in features_list]
+    df = pd.DataFrame(rows, columns=expected_columns)
+    # Cột token có cả chuỗi lẫn None bị pandas đổi None thành NaN, và ControlCharacterCleaner sẽ mã hoá
+    # thành 'nan' thay vì 'None' như DataFrame một dòng -> giữ nguyên giá trị gốc dưới dạng object
+    for i, col in enumerate(expected_columns):
+        if not pd.api.types.is_numeric_dtype(df[col]):
+            df[col] = pd.Series([row[i] for row in rows], dtype=object)
+    return df
+
+
+def load_preprocessing(artifacts_dir: str, pipeline_path: str):
+    """Kế hoạch NumPy đã biên dịch (xem preprocessing_plan.py) nếu dùng được, ngược lại là sklearn Pipeline."""
+    plan_path = os.path.join(artifacts_dir, PLAN_FILENAME)
+    if PREPROCESSING_BACKEND == "plan" and os.path.exists(plan_path):
+        plan = PreprocessingPlan.load(plan_path)
+        if plan.source_sha256 == file_sha256(pipeline_path):
+            return plan
+        logging.warning(f"{PLAN_FILENAME} được biên dịch từ một preprocessing_pipeline.pkl khác, dùng lại pipeline. "
+                        f"Chạy lại: python preprocessing_plan.py compile")
+    import joblib
+    return joblib.load(pipeline_path)
+
+
+def load_model_weights(artifacts_dir: str, weights_path: str, num_features: int):
+    """
+    Mô hình theo INFERENCE_BACKEND: bản gấp NumPy (fused_inference.py), phiên ONNX Runtime (onnx_inference.py)
+    (bản float hoặc int8) hoặc ImprovedFraudGNN của torch. Bản gấp/ONNX cũ hơn file .pth thì quay về torch
+    (kèm cảnh báo); INFERENCE_BACKEND không hợp lệ thì báo lỗi.
+    """
+    if INFERENCE_BACKEND not in ("fused", "torch", *ONNX_BACKENDS):
+        raise ValueError(f"INFERENCE_BACKEND={INFERENCE_BACKEND!r} không hợp lệ, "
+                         f"chọn một trong: fused, torch, {', '.join(ONNX_BACKENDS)}")
+    onnx_file, rebuild = ONNX_BACKENDS.get(INFERENCE_BACKEND, (None, None))
+    if onnx_file and os.path.exists(os.path.join(artifacts_dir, onnx_file)):
+        session = OnnxFraudModel(os.path.join(artifacts_dir, onnx_file))
+        if session.source_sha256 == file_sha256(weights_path) and session.num_features == num_features:
+            return session
+        logging.warning(f"{onnx_file} được xuất từ một fraud_gnn_weights.pth khác, dùng lại torch. "
+                        f"Chạy lại: python {rebuild}")
+    fused_path = os.path.join(artifacts_dir, FUSED_FILENAME)
+    if INFERENCE_BACKEND == "fused" and os.path.exists(fused_path):
+        fused = FusedFraudModel.load(fused_path)
+        if fused.source_sha256 == file_sha256(weights_path) and fused.num_features == num_features:
+            return fused
+        logging.warning(f"{FUSED_FILENAME} được xuất từ một fraud_gnn_weights.pth khác, dùng lại torch. "
+                        f"Chạy lại: python fused_inference.py export --verify")
+    from gnn_model import load_torch_model
+    return load_torch_model(weights_path, num_features)
+
+
+def predict_proba(model, x_proc) -> np.ndarray:
+    """Xác suất (n, 2) cho ma trận đã tiền xử lý, với bản gấp, phiên ONNX hoặc mô hình torch (edge_index rỗng)."""
+    x = np.asarray(x_proc, dtype=np.float32)
+    if isinstance(model, (FusedFraudModel, OnnxFraudModel)):
+        return model.predict_proba(x)
+    import torch
+    with torch.no_grad():
+        return torch.softmax(model(torch.from_numpy(x), torch.empty((2, 0), dtype=torch.long)), dim=1).numpy()
 
-    x_proc = pipeline.transform(df)
-    x_tensor = torch.tensor(x_proc, dtype=torch.float32)
-    edge_index = torch.tensor([], dtype=torch.long).reshape(2, 0)
 
-    with torch.no_grad():
-        logits = model(x_tensor, edge_index)
-        probs = torch.softmax(logits, dim=1)[0]
-        pred_index = int(torch.argmax(probs))
-        confidence_percent = float(probs[pred_index]) * 100
+def preprocess(pipeline, features_list: list, expected_columns: list) -> np.ndarray:
+    """Ma trận đã tiền xử lý (số ví, số đặc trưng); phần tử là FeatureVector hoặc dict đặc trưng."""
+    vectors = all(isinstance(f, FeatureVector) for f in features_list)
+    if isinstance(pipeline, PreprocessingPlan) and pipeline.columns == list(expected_columns):
+        return (pipeline.transform_vectors(features_list) if vectors else
+                pipeline.transform_records([f.to_dict() if isinstance(f, FeatureVector) else f for f in features_list]))
+    # sklearn Pipeline cần DataFrame: đi qua dict
+    records = [f.to_dict() if isinstance(f, FeatureVector) else f for f in features_list]
+    return pipeline.transform(_feature_frame(records, expected_columns))
 
-    status = "fraud" if pred_index == 1 else "non-fraud"
-    return status, (confidence_percent / 100), confidence_percent
 
-def explain_address(model, pipeline, features_dict, feat_names, topk=None):  # Thêm topk optional để khớp với app.py, nhưng bỏ qua nó
-    # Tương tự, thêm reorder cho hàm này để tránh lỗi nếu gọi
-    with open('../Model/metadata.json', 'r') as f:
-        metadata = json.load(f)
-    expected_columns = metadata['features']['final_features_list']  # Giữ key như attachment
+def predict_addresses(model, pipeline, features_list: list, expected_columns: list) -> list:
+    """
+    Dự đoán nhiều địa chỉ trong một lần: pipeline.transform và forward pass chạy một lần cho cả ma trận.
+    Không có cạnh nên mỗi dòng độc lập (GCNConv chỉ thêm self-loop), kết quả từng dòng giống gọi riêng lẻ.
+    Phần tử của features_list là FeatureVector (đường chính) hoặc dict đặc trưng.
+    Trả về danh sách (status, confidence, confidence_percent) theo thứ tự của features_list.
+    """
+    if not features_list:
+        return []
+    probs = predict_proba(model, preprocess(pipeline, features_list, expected_columns))
+    pred_indices = probs.argmax(axis=1)
+    confidences = probs[np.arange(len(probs)), pred_indices]
 
-    df = pd.DataFrame([features_dict])
+    return [("fraud" if pred_index == 1 else "non-fraud", confidence, confidence * 100)
+            for pred_index, confidence in zip(pred_indices.tolist(), confidences.tolist())]
 
-    # Debug: In để kiểm tra trước reorder
-    print("🔍 Explain features columns before reorder:", df.columns.tolist())
 
-    # Reorder và fill default
-    missing_cols = set(expected_columns) - set(df.columns)
-    for col in missing_cols:
-        df[col] = 0.0
-    df = df[expected_columns]
+def predict_address(model, pipeline, features_dict: dict, expected_columns: list):
+    """
+    Dự đoán một địa chỉ.
+    Tối ưu: Nhận 'expected_columns' trực tiếp thay vì đọc lại file metadata mỗi lần gọi.
+    """
+    return predict_addresses(model, pipeline, [features_dict], expected_columns)[0]
 
-    # Debug: In sau reorder
-    print("✅ Explain features columns after reorder:", df.columns.tolist())
+# mô hình -> (FusedFraudModel float để tính gradient, độ quan trọng toàn cục); tính một lần khi tải artifact
+_EXPLAINERS: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
 
-    x_proc = pipeline.transform(df)
-    x_tensor = torch.tensor(x_proc, dtype=torch.float32)
-    importance = model.conv1.lin.weight.abs().sum(dim=0).detach().numpy()
-    feat_names_aligned = feat_names if len(feat_names) == len(importance) else [f"f{i}" for i in range(len(importance))]
 
-    # Sắp xếp tất cả features theo importance giảm dần (bỏ qua topk)
-    idx = importance.argsort()[::-1]  # Từ cao đến thấp
-    all_features = np.array(feat_names_aligned)[idx]
-    all_importance = importance[idx].round(3)
+def _explainer(model):
+    cached = _EXPLAINERS.get(model)
+    if cached is None:
+        if isinstance(model, FusedFraudModel):
+            fused = model
+        elif isinstance(model, OnnxFraudModel):
+            fused = model.to_fused()
+        else:
+            fused = FusedFraudModel.from_state_dict(model.state_dict())
+        # Độ quan trọng toàn cục: tổng |trọng số| lớp đầu theo từng đặc trưng, không đổi giữa các lần gọi
+        cached = _EXPLAINERS[model] = (fused, np.abs(fused.first_layer_weight).sum(axis=0))
+    return cached
 
-    # Convert numpy.float32 sang float để serialize JSON
-    feature_importance = {feat: float(value) for feat, value in zip(all_features, all_importance)}
 
-    return {
-        "explanation": "Giải thích importance của tất cả các đặc trưng (sắp xếp từ ảnh hưởng cao nhất đến thấp nhất)",
-        "feature_importance": feature_importance
-    }
+def explain_addresses(model, pipeline, features_list: list, feat_names: list) -> list:
+    """
+    Giải thích nhiều địa chỉ trong một lần: một lần tiền xử lý và một lượt lan truyền ngược cho cả lô.
+    Mỗi phần tử gồm độ quan trọng toàn cục (feature_importance, như trước) và attribution riêng của ví:
+    gradient x input của log-odds gian lận theo đặc trưng đã chuẩn hoá (mốc 0 = trung bình tập train).
+    """
+    if not features_list:
+        return []
+    fused, importance = _explainer(model)
+    x_proc = np.asarray(preprocess(pipeline, features_list, feat_names), dtype=np.float32)
+    attributions = x_proc * fused.fraud_log_odds_gradient(x_proc)
+    logits = fused.logits(x_proc)
+    log_odds = logits[:, 1] - logits[:, 0]
+
+    names = np.array(feat_names if len(feat_names) == len(importance) else [f"f{i}" for i in range(len(importance))])
+    # Sắp xếp tất cả features theo importance giảm dần (bỏ qua topk)
+    idx = importance.argsort()[::-1]
+    feature_importance = {str(feat): float(value) for feat, value in zip(names[idx], importance[idx].round(3))}
+
+    explanations = []
+    for row, row_log_odds in zip(attributions, log_odds.tolist()):
+        order = np.abs(row).argsort()[::-1]
+        explanations.append({
+            "explanation": "Giải thích importance của tất cả các đặc trưng (sắp xếp từ ảnh hưởng cao nhất đến thấp nhất)",
+            "feature_importance": feature_importance,
+            "attribution": {
+                "method": "gradient_x_input",
+                "target": "fraud_log_odds",
+                "fraud_log_odds": round(row_log_odds, 4),
+                # dương: đẩy về phía gian lận; sắp xếp theo độ lớn giảm dần
+                "values": {str(feat): round(float(value), 4) for feat, value in zip(names[order], row[order])},
+            },
+        })
+    return explanations
+
+
+def explain_address(model, pipeline, features_dict, feat_names, topk=None):  # topk giữ để tương thích, không dùng
+    return explain_addresses(model, pipeline, [features_dict], feat_names)[0]
@@ -0,0 +1,320 @@
+# model_registry.py
+# Registry mô hình có phiên bản, nạp lại nóng (hot reload) không cần khởi động lại worker.
+#
+# Bố cục (MODEL_REGISTRY_DIR, mặc định ../Model/registry/):
+#   registry/CURRENT               tên phiên bản đang phục vụ (ghi nguyên tử bằng os.replace)
+#   registry/<phiên bản>/manifest.json   sha256 của từng file trong bộ artifact
+#   registry/<phiên bản>/preprocessing_pipeline.pkl, fraud_gnn_weights.pth, metadata.json
+#                         (+ các file dẫn xuất nếu có: preprocessing_plan.json, fraud_gnn_fused.npz, ...)
+# Chưa có registry thì phục vụ thư mục phẳng ../Model/ như trước, phiên bản "base-<sha của .pth>".
+#
+# Nạp một phiên bản: kiểm tra checksum theo manifest -> load_artifacts -> đồ thị tham chiếu -> chạy thử
+# (warm-up) -> gán ModelRegistry.current bằng một phép gán duy nhất. Request đang chạy giữ tham chiếu tới
+# bộ cũ nên không bị rớt; request mới dùng bộ mới. Watcher đọc lại CURRENT mỗi MODEL_REGISTRY_POLL_SECONDS giây.
+#
+# Đăng ký và kích hoạt (cd Model/API_Handling):
+#   python model_registry.py publish --from ../Model/ --version 2025-08-08 --activate
+#   python model_registry.py activate 2025-08-08
+#   python model_registry.py list
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import shutil
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from feature_schema import default_schema
+from fused_inference import FUSED_FILENAME, WEIGHTS_FILENAME
+from model import load_artifacts, predict_addresses, explain_addresses, preprocess
+from onnx_inference import ONNX_FILENAME, INT8_FILENAME
+from preprocessing_plan import PIPELINE_FILENAME, PLAN_FILENAME, file_sha256
+from reference_graph import REFERENCE_FILENAME, FAISS_FILENAME, load_reference_graph
+
+MANIFEST_FORMAT = "fraud-model-manifest"
+MANIFEST_FILENAME = 'manifest.json'
+CURRENT_FILENAME = 'CURRENT'
+METADATA_FILENAME = 'metadata.json'
+REQUIRED_FILES = (PIPELINE_FILENAME, WEIGHTS_FILENAME, METADATA_FILENAME)
+DERIVED_FILES = (PLAN_FILENAME, FUSED_FILENAME, ONNX_FILENAME, INT8_FILENAME, REFERENCE_FILENAME, FAISS_FILENAME)
+
+MODEL_REGISTRY_DIR = os.getenv("MODEL_REGISTRY_DIR", '../Model/registry/')
+MODEL_ARTIFACTS_DIR = '../Model/'
+MODEL_REGISTRY_POLL_SECONDS = float(os.getenv("MODEL_REGISTRY_POLL_SECONDS", "5"))   # 0 = tắt watcher
+
+
+@dataclass
+class ModelBundle:
+    """Một phiên bản mô hình đã nạp và chạy thử, dùng nguyên khối cho một request/lô."""
+    version: str
+    artifacts_dir: str
+    model: Any
+    pipeline: Any
+    feat_names: List[str]
+    reference: Any = None
+    checksums: Dict[str, str] = field(default_factory=dict)
+    loaded_at: str = ""
+    load_seconds: float = 0.0
+
+    def summary(self) -> Dict[str, Any]:
+        return {"version": self.version, "artifacts_dir": self.artifacts_dir, "loaded_at": self.loaded_at,
+                "load_seconds": round(self.load_seconds, 3), "model": type(self.model).__name__,
+                "preprocessing": type(self.pipeline).__name__, "reference_graph": self.reference is not None,
+                "checksums": self.checksums}
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat(timespec='seconds')
+
+
+def verify_checksums(artifacts_dir: str) -> Dict[str, str]:
+    """Kiểm tra mọi file trong manifest.json; trả về checksum, ném ValueError nếu thiếu hoặc sai."""
+    with open(os.path.join(artifacts_dir, MANIFEST_FILENAME), 'r') as f:
+        manifest = json.load(f)
+    if manifest.get("format") != MANIFEST_FORMAT:
+        raise ValueError(f"{artifacts_dir}: manifest.json không đúng định dạng")
+    missing = [name for name in REQUIRED_FILES if name not in manifest["files"]]
+    if missing:
+        raise ValueError(f"{artifacts_dir}: manifest thiếu {missing}")
+    for name, expected in manifest["files"].items():
+        path = os.path.join(artifacts_dir, name)
+        if not os.path.exists(path):
+            raise ValueError(f"{artifacts_dir}: thiếu file {name}")
+        if file_sha256(path) != expected:
+            raise ValueError(f"{artifacts_dir}: checksum của {name} không khớp manifest")
+    return dict(manifest["files"])
+
+
+def flat_version(artifacts_dir: str) -> str:
+    """Tên phiên bản của thư mục phẳng (không có registry): theo sha256 của file trọng số."""
+    return f"base-{file_sha256(os.path.join(artifacts_dir, WEIGHTS_FILENAME))[:12]}"
+
+
+def load_bundle(artifacts_dir: str, version: Optional[str] = None) -> ModelBundle:
+    """Nạp, kiểm tra và chạy thử một bộ artifact (chặn; gọi trong luồng riêng khi đang phục vụ)."""
+    start = time.perf_counter()
+    if version is not None:
+        checksums = verify_checksums(artifacts_dir)
+    else:   # thư mục phẳng không có manifest: chỉ ghi lại checksum để báo cáo
+        checksums = {name: file_sha256(os.path.join(artifacts_dir, name)) for name in REQUIRED_FILES}
+        version = flat_version(artifacts_dir)
+
+    model, pipeline, feat_names = load_artifacts(artifacts_dir)
+    # FeatureVector được tính theo lược đồ của cả tiến trình: đổi danh sách đặc trưng cần khởi động lại
+    if list(feat_names) != list(default_schema().columns):
+        raise ValueError(f"Phiên bản {version} dùng danh sách đặc trưng khác mô hình đang chạy; cần khởi động lại worker.")
+    reference = load_reference_graph(artifacts_dir)
+
+    # Chạy thử để request đầu tiên sau khi đổi phiên bản không phải trả chi phí khởi tạo
+    warmup = [dict.fromkeys(feat_names, 0.0)]
+    predict_addresses(model, pipeline, warmup, feat_names)
+    explain_addresses(model, pipeline, warmup, feat_names)
+    if reference is not None:
+        reference.predict(preprocess(pipeline, warmup, feat_names))
+
+    return ModelBundle(version, artifacts_dir, model, pipeline, list(feat_names), reference, checksums,
+                       _now(), time.perf_counter() - start)
+
+
+def active_version(registry_dir: str) -> Optional[str]:
+    """Tên phiên bản trong CURRENT, hoặc None nếu chưa có registry (phục vụ thư mục phẳng)."""
+    try:
+        with open(os.path.join(registry_dir, CURRENT_FILENAME), 'r') as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def list_versions(registry_dir: str) -> List[str]:
+    if not os.path.isdir(registry_dir):
+        return []
+    return sorted(name for name in os.listdir(registry_dir)
+                  if os.path.exists(os.path.join(registry_dir, name, MANIFEST_FILENAME)))
+
+
+class ModelRegistry:
+    def __init__(self, registry_dir: str = MODEL_REGISTRY_DIR, fallback_dir: str = MODEL_ARTIFACTS_DIR):
+        self.registry_dir = registry_dir
+        self.fallback_dir = fallback_dir
+        # Giá trị CURRENT lúc nạp lần cuối; watcher chỉ phản ứng khi CURRENT khác giá trị này
+        self._seen_active = self.active_version()
+        self.current: ModelBundle = self._load(self._seen_active)
+        self.last_error: Optional[str] = None
+        self.reloads = 0
+        self._lock: Optional[asyncio.Lock] = None
+
+    def active_version(self) -> Optional[str]:
+        return active_version(self.registry_dir)
+
+    def versions(self) -> List[str]:
+        return list_versions(self.registry_dir)
+
+    def _load(self, version: Optional[str]) -> ModelBundle:
+        if version is None:
+            return load_bundle(self.fallback_dir)
+        return load_bundle(os.path.join(self.registry_dir, version), version)
+
+    # --- nạp lại ---
+    async def reload(self, version: Optional[str] = None, force: bool = False) -> Dict[str, Any]:
+        """
+        Nạp `version` (mặc định: theo CURRENT) trong luồng nền rồi đổi sang nó; lỗi thì giữ phiên bản cũ.
+        Không làm gì nếu phiên bản đó đang chạy, trừ khi force.
+        """
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            target = version or self.active_version()
+            if target is not None and target not in self.versions():
+                raise ValueError(f"Không có phiên bản {target} trong {self.registry_dir}")
+            previous = self.current
+            if not force and (target or flat_version(self.fallback_dir)) == previous.version:
+                return {"changed": False, "current": previous.summary()}
+            try:
+                bundle = await asyncio.to_thread(self._load, target)
+            except Exception as e:
+                self.last_error = f"{type(e).__name__}: {e}"
+                logging.warning(f"Không nạp được phiên bản {target}: {self.last_error}. Giữ phiên bản {previous.version}.")
+                raise
+            self.current = bundle   # một phép gán: request mới dùng bộ mới, request đang chạy giữ bộ cũ
+            self.last_error = None
+            self.reloads += 1
+            logging.info(f"Đã đổi mô hình {previous.version} -> {bundle.version} ({bundle.load_seconds:.2f}s)")
+            return {"changed": True, "previous": previous.version, "current": bundle.summary()}
+
+    async def watch(self, interval: float = MODEL_REGISTRY_POLL_SECONDS) -> None:
+        """
+        Đọc lại CURRENT định kỳ và nạp phiên bản mới khi CURRENT thay đổi. Chỉ phản ứng với thay đổi:
+        phiên bản nạp tay qua endpoint admin không bị đổi ngược, phiên bản hỏng không bị thử lại mãi.
+        """
+        if interval <= 0:
+            return
+        while True:
+            await asyncio.sleep(interval)
+            target = self.active_version()
+            if target == self._seen_active:
+                continue
+            self._seen_active = target
+            if target is None or target == self.current.version:
+                continue
+            try:
+                await self.reload(target)
+            except Exception:
+                pass   # đã ghi vào last_error; ghi lại CURRENT hoặc reload qua endpoint admin để thử lại
+
+    def summary(self) -> Dict[str, Any]:
+        return {"current": self.current.summary(), "active": self.active_version(), "versions": self.versions(),
+                "registry_dir": self.registry_dir, "reloads": self.reloads, "last_error": self.last_error}
+
+
+class LocalModelService:
+    """
+    Mô hình chạy ngay trong tiến trình (mặc định, và là lõi của model_server.py); cùng giao diện với
+    model_server.ModelClient. Mỗi lô lấy registry.current một lần nên cả lô cùng một phiên bản.
+    """
+
+    def __init__(self, registry: Optional[ModelRegistry] = None):
+        self.registry = registry or ModelRegistry()
+
+    @property
+    def version(self) -> str:
+        return self.registry.current.version
+
+    def current_version(self) -> str:
+        return self.version
+
+    def predict(self, rows: list) -> List[Tuple[str, float, float, str]]:
+        """(status, confidence, percent, phiên bản) cho từng dòng."""
+        bundle = self.registry.current
+        return [(*prediction, bundle.version) for prediction in
+                predict_addresses(bundle.model, bundle.pipeline, rows, bundle.feat_names)]
+
+    def explain(self, rows: list) -> List[Dict[str, Any]]:
+        bundle = self.registry.current
+        return [{**explanation, "model_version": bundle.version} for explanation in
+                explain_addresses(bundle.model, bundle.pipeline, rows, bundle.feat_names)]
+
+    def neighborhood(self, rows: list) -> List[Optional[Dict[str, Any]]]:
+        """Dự đoán trên đồ thị tham chiếu; None cho mọi dòng nếu phiên bản này không có đồ thị tham chiếu."""
+        bundle = self.registry.current
+        if bundle.reference is None or not rows:
+            return [None] * len(rows)
+        predictions = bundle.reference.predict(preprocess(bundle.pipeline, rows, bundle.feat_names))
+        return [{**prediction, "model_version": bundle.version} for prediction in predictions]
+
+    def summary(self) -> Dict[str, Any]:
+        return self.registry.summary()
+
+    async def reload(self, version: Optional[str] = None, force: bool = False) -> Dict[str, Any]:
+        return await self.registry.reload(version, force)
+
+    async def watch(self) -> None:
+        await self.registry.watch()
+
+
+# --- CLI ---
+def publish(source_dir: str, registry_dir: str, version: str) -> str:
+    """Sao chép bộ artifact vào registry/<version>/ kèm manifest.json; trả về thư mục phiên bản."""
+    target = os.path.join(registry_dir, version)
+    if os.path.exists(target):
+        raise SystemExit(f"Phiên bản {version} đã tồn tại trong {registry_dir}")
+    missing = [name for name in REQUIRED_FILES if not os.path.exists(os.path.join(source_dir, name))]
+    if missing:
+        raise SystemExit(f"{source_dir} thiếu {missing}")
+    staging = target + '.tmp'
+    os.makedirs(staging)
+    files = {}
+    for name in REQUIRED_FILES + DERIVED_FILES:
+        path = os.path.join(source_dir, name)
+        if os.path.exists(path):
+            shutil.copy2(path, os.path.join(staging, name))
+            files[name] = file_sha256(os.path.join(staging, name))
+    with open(os.path.join(staging, MANIFEST_FILENAME), 'w') as f:
+        json.dump({"format": MANIFEST_FORMAT, "version": version, "created_utc": _now(),
+                   "source": os.path.abspath(source_dir), "files": files}, f, indent=1)
+    os.replace(staging, target)   # phiên bản chỉ xuất hiện khi đã đủ file
+    return target
+
+
+def activate(registry_dir: str, version: str) -> None:
+    if not os.path.exists(os.path.join(registry_dir, version, MANIFEST_FILENAME)):
+        raise SystemExit(f"Không có phiên bản {version} trong {registry_dir}")
+    verify_checksums(os.path.join(registry_dir, version))
+    tmp = os.path.join(registry_dir, CURRENT_FILENAME + '.tmp')
+    with open(tmp, 'w') as f:
+        f.write(version + '\n')
+    os.replace(tmp, os.path.join(registry_dir, CURRENT_FILENAME))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Quản lý registry mô hình có phiên bản")
+    parser.add_argument("--registry", default=MODEL_REGISTRY_DIR)
+    sub = parser.add_subparsers(dest="command", required=True)
+    pub = sub.add_parser("publish", help="đăng ký một bộ artifact thành phiên bản mới")
+    pub.add_argument("--from", dest="source", default=MODEL_ARTIFACTS_DIR)
+    pub.add_argument("--version", required=True)
+    pub.add_argument("--activate", action="store_true", help="ghi luôn CURRENT")
+    act = sub.add_parser("activate", help="chuyển CURRENT sang một phiên bản (worker tự nạp lại)")
+    act.add_argument("version")
+    sub.add_parser("list")
+    args = parser.parse_args()
+
+    if args.command == "publish":
+        print(f"Đã đăng ký {publish(args.source, args.registry, args.version)}")
+        if args.activate:
+            activate(args.registry, args.version)
+            print(f"CURRENT -> {args.version}")
+    elif args.command == "activate":
+        activate(args.registry, args.version)
+        print(f"CURRENT -> {args.version}")
+    else:
+        active = active_version(args.registry)
+        for name in list_versions(args.registry):
+            print(("* " if name == active else "  ") + name)
+
+
+if __name__ == "__main__":
+    main()
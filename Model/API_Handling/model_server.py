@@ -0,0 +1,428 @@
+# model_server.py
+# Một tiến trình giữ mô hình cho mọi worker của app.py / api_graph.py trên cùng máy.
+#
+# Mặc định (MODEL_SERVER_SOCKET không đặt) mỗi worker tự nạp registry, pipeline và trọng số
+# (model_registry.LocalModelService). Khi đặt MODEL_SERVER_SOCKET, worker chỉ giữ một ModelClient:
+# các lô dự đoán/giải thích/đồ thị lân cận được gửi qua Unix socket tới model server, nơi một
+# MicroBatcher cho mỗi loại gom tiếp các lô của mọi worker thành một lần chạy mô hình. Worker không
+# import model.py (pandas, sklearn/torch nếu dùng) nên mỗi worker nhẹ hơn nhiều, xem
+# benchmarks/bench_worker_memory.py. Registry, watcher và việc nạp lại nóng nằm ở model server; các
+# endpoint /admin/model của worker chuyển tiếp tới đó.
+#
+# Giao thức: mỗi thông điệp là 4 byte độ dài (big-endian) + JSON UTF-8. Một kết nối mỗi luồng của
+# worker, hỏi-đáp tuần tự. FeatureVector gửi dạng {"values": [...], "labels": [...]}.
+# Socket chỉ chủ sở hữu đọc/ghi được (0600).
+#
+# Chạy:
+#   cd Model/API_Handling && python model_server.py --socket /tmp/fraud-model.sock
+#   MODEL_SERVER_SOCKET=/tmp/fraud-model.sock uvicorn app:app --workers 4
+#
+# Cách thay thế không cần tiến trình riêng: MODEL_LOAD=eager gunicorn --preload -k uvicorn.workers.UvicornWorker app:app
+# nạp mô hình một lần trong master rồi fork, các worker chia sẻ trang bộ nhớ copy-on-write
+# (chỉ áp dụng khi không đặt MODEL_SERVER_SOCKET).
+#
+# Khởi động: mặc định (MODEL_LOAD=background) worker import xong là nhận request ngay; mô hình (hoặc kết nối
+# tới model server) được nạp trong luồng nền khi app khởi động (ServiceLoader). /healthz trả 200 khi tiến
+# trình đã lên, /readyz chỉ trả 200 khi mô hình đã nạp và chạy thử xong; trước đó các endpoint cần mô hình
+# trả 503 kèm Retry-After. MODEL_LOAD=eager nạp ngay lúc import như trước (cần cho gunicorn --preload).
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import signal
+import socket
+import struct
+import threading
+import time
+from contextlib import asynccontextmanager
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from fastapi import FastAPI, Header, HTTPException, Request
+from fastapi.responses import JSONResponse
+
+from feature_schema import FeatureVector, default_schema
+from inference_batcher import MicroBatcher
+
+MODEL_SERVER_SOCKET = os.getenv("MODEL_SERVER_SOCKET")   # không đặt = mô hình trong chính worker
+MODEL_SERVER_TIMEOUT = float(os.getenv("MODEL_SERVER_TIMEOUT", "30"))
+# Worker khởi động trước model server (ví dụ cùng lúc trong docker compose) thì chờ tối đa chừng này giây
+MODEL_SERVER_CONNECT_SECONDS = float(os.getenv("MODEL_SERVER_CONNECT_SECONDS", "30"))
+DEFAULT_SOCKET = '/tmp/fraud-model.sock'
+# Endpoint admin (nạp lại mô hình) chỉ mở khi đặt ADMIN_TOKEN; gửi kèm header X-Admin-Token
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+# background: nạp mô hình trong nền khi app khởi động; eager: nạp ngay lúc import (gunicorn --preload)
+MODEL_LOAD = os.getenv("MODEL_LOAD", "background")
+# Nạp lỗi (thiếu artifact, model server chưa lên quá MODEL_SERVER_CONNECT_SECONDS) thì thử lại sau chừng này giây
+MODEL_LOAD_RETRY_SECONDS = float(os.getenv("MODEL_LOAD_RETRY_SECONDS", "10"))
+
+ROW_OPS = ("predict", "explain", "neighborhood")
+_LENGTH = struct.Struct('>I')
+
+
+class ModelServerError(RuntimeError):
+    """Model server trả lỗi cho một yêu cầu (thông điệp gốc nằm trong chuỗi lỗi)."""
+
+
+class ModelNotReady(RuntimeError):
+    """Mô hình chưa nạp xong (hoặc lần nạp gần nhất lỗi); các endpoint trả 503 kèm Retry-After."""
+
+
+# --- giao thức ---
+def _json_default(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"Không mã hoá được {type(value).__name__}")
+
+
+def encode_message(message: Dict[str, Any]) -> bytes:
+    body = json.dumps(message, default=_json_default, ensure_ascii=False).encode('utf-8')
+    return _LENGTH.pack(len(body)) + body
+
+
+def encode_rows(rows: list) -> List[Dict[str, Any]]:
+    return [{"values": row.values.tolist(), "labels": list(row.labels)} if isinstance(row, FeatureVector)
+            else {"features": row} for row in rows]
+
+
+def decode_rows(rows: List[Dict[str, Any]]) -> list:
+    schema = default_schema()
+    decoded = []
+    for row in rows:
+        if "features" in row:
+            decoded.append(row["features"])
+            continue
+        if len(row["values"]) != len(schema.columns):
+            raise ValueError(f"FeatureVector có {len(row['values'])} giá trị, lược đồ có {len(schema.columns)} cột")
+        vector = FeatureVector(schema)
+        vector.values = np.asarray(row["values"], dtype=np.float64)
+        vector.labels = list(row["labels"])
+        decoded.append(vector)
+    return decoded
+
+
+def _recv_exactly(conn: socket.socket, size: int) -> bytes:
+    chunks, remaining = [], size
+    while remaining:
+        chunk = conn.recv(remaining)
+        if not chunk:
+            raise ConnectionResetError("Model server đã đóng kết nối")
+        chunks.append(chunk)
+        remaining -= len(chunk)
+    return b''.join(chunks)
+
+
+# --- phía worker ---
+class ModelClient:
+    """Cùng giao diện với model_registry.LocalModelService, chạy qua Unix socket tới model server."""
+
+    def __init__(self, socket_path: str, timeout: float = MODEL_SERVER_TIMEOUT,
+                 connect_seconds: float = MODEL_SERVER_CONNECT_SECONDS):
+        self.socket_path = socket_path
+        self.timeout = timeout
+        # Phiên bản trong câu trả lời gần nhất của server: có thể cũ nếu server vừa nạp lại nóng,
+        # cần phiên bản chắc chắn (khoá cache dự đoán) thì dùng current_version()
+        self.version: Optional[str] = None
+        self._local = threading.local()      # một kết nối cho mỗi luồng (luồng micro-batch, to_thread, ...)
+        deadline = time.monotonic() + connect_seconds
+        while True:
+            try:
+                self.summary()
+                break
+            except OSError:
+                if time.monotonic() >= deadline:
+                    raise
+                time.sleep(0.2)
+
+    def _connection(self) -> socket.socket:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            conn.settimeout(self.timeout)
+            try:
+                conn.connect(self.socket_path)
+            except OSError:
+                conn.close()
+                raise
+            self._local.conn = conn
+        return conn
+
+    def _close(self) -> None:
+        conn = getattr(self._local, 'conn', None)
+        self._local.conn = None
+        if conn is not None:
+            conn.close()
+
+    def _call(self, op: str, **payload) -> Any:
+        for attempt in range(2):
+            try:
+                conn = self._connection()
+                conn.sendall(encode_message({"op": op, **payload}))
+                (size,) = _LENGTH.unpack(_recv_exactly(conn, _LENGTH.size))
+                reply = json.loads(_recv_exactly(conn, size))
+                break
+            except ConnectionError:
+                # Kết nối cũ bị đóng (model server khởi động lại): mở kết nối mới và thử lại một lần
+                self._close()
+                if attempt:
+                    raise
+            except OSError:
+                self._close()   # timeout: câu trả lời muộn không được đọc nhầm cho yêu cầu sau
+                raise
+        self.version = reply.get("version", self.version)
+        if "error" in reply:
+            raise ModelServerError(reply["error"])
+        return reply["result"]
+
+    def predict(self, rows: list) -> List[Tuple[str, float, float, str]]:
+        return [tuple(prediction) for prediction in self._call("predict", rows=encode_rows(rows))]
+
+    def explain(self, rows: list) -> List[Dict[str, Any]]:
+        return self._call("explain", rows=encode_rows(rows))
+
+    def neighborhood(self, rows: list) -> List[Optional[Dict[str, Any]]]:
+        return self._call("neighborhood", rows=encode_rows(rows))
+
+    def summary(self) -> Dict[str, Any]:
+        return self._call("summary")
+
+    def current_version(self) -> str:
+        """Phiên bản server đang phục vụ lúc này (một lượt hỏi-đáp nhỏ, không qua batcher)."""
+        return self._call("version")
+
+    async def reload(self, version: Optional[str] = None, force: bool = False) -> Dict[str, Any]:
+        return await asyncio.to_thread(self._call, "reload", version=version, force=force)
+
+    async def watch(self) -> None:
+        """Watcher của registry chạy trong model server."""
+
+
+def create_service():
+    """LocalModelService (mặc định) hoặc ModelClient nếu đặt MODEL_SERVER_SOCKET."""
+    if MODEL_SERVER_SOCKET:
+        return ModelClient(MODEL_SERVER_SOCKET)
+    from model_registry import LocalModelService   # chỉ chế độ trong tiến trình mới cần model.py
+    return LocalModelService()
+
+
+class ServiceLoader:
+    """
+    Giữ chỗ cho service của create_service() để worker nhận request trước khi mô hình nạp xong.
+    Thuộc tính của service (MODEL.predict, MODEL.version, ...) được chuyển tiếp khi đã nạp, trước đó ném
+    ModelNotReady. Nạp một lần duy nhất dù gọi từ nhiều luồng.
+    """
+
+    def __init__(self, factory=create_service):
+        self._factory = factory
+        self._service = None
+        self._lock = threading.Lock()
+        self.started_at = time.monotonic()
+        self.load_seconds: Optional[float] = None
+        self.error: Optional[str] = None   # lỗi của lần nạp gần nhất
+
+    @property
+    def ready(self) -> bool:
+        return self._service is not None
+
+    def require_ready(self) -> None:
+        if self._service is None:
+            raise ModelNotReady(self.error or "Mô hình đang được nạp")
+
+    def load(self):
+        with self._lock:
+            if self._service is None:
+                start = time.perf_counter()
+                try:
+                    service = self._factory()
+                except Exception as e:
+                    self.error = f"{type(e).__name__}: {e}"
+                    raise
+                self.load_seconds = time.perf_counter() - start
+                self.error = None
+                self._service = service
+                print(f"✅ Tải mô hình thành công (phiên bản {service.version}, {self.load_seconds:.2f}s).")
+        return self._service
+
+    def __getattr__(self, name: str):
+        self.require_ready()
+        return getattr(self._service, name)
+
+    async def run(self) -> None:
+        """Nạp trong luồng nền (thử lại nếu lỗi) rồi chạy watcher của registry; dùng trong lifespan."""
+        while self._service is None:
+            try:
+                await asyncio.to_thread(self.load)
+            except Exception:
+                logging.warning(f"Không nạp được mô hình ({self.error}), thử lại sau {MODEL_LOAD_RETRY_SECONDS:.0f}s")
+                await asyncio.sleep(MODEL_LOAD_RETRY_SECONDS)
+        await self._service.watch()
+
+    def readiness(self) -> Dict[str, Any]:
+        return {"ready": self.ready, "version": self._service.version if self.ready else None,
+                "load_seconds": self.load_seconds, "error": self.error,
+                "uptime_seconds": round(time.monotonic() - self.started_at, 3)}
+
+
+def model_service() -> ServiceLoader:
+    """MODEL của app.py / api_graph.py: nạp trong nền khi app khởi động, hoặc ngay bây giờ nếu MODEL_LOAD=eager."""
+    loader = ServiceLoader()
+    if MODEL_LOAD == "eager":
+        loader.load()
+    return loader
+
+
+# --- FastAPI ---
+def service_lifespan(service: ServiceLoader, inner):
+    """
+    Bọc lifespan sẵn có (ví dụ covalent_client_lifespan): nạp mô hình trong nền (không chặn việc nhận request)
+    rồi chạy watcher của registry trong suốt vòng đời app.
+    """
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        async with inner(app):
+            loader = asyncio.create_task(service.run())
+            try:
+                yield
+            finally:
+                loader.cancel()
+    return lifespan
+
+
+def add_health_routes(app: FastAPI, service: ServiceLoader) -> None:
+    """
+    /healthz (liveness): tiến trình đang chạy và event loop trả lời được, không đụng tới mô hình.
+    /readyz (readiness): 200 khi mô hình đã nạp và chạy thử, 503 kèm Retry-After khi chưa.
+    ModelNotReady ném từ bất kỳ endpoint nào cũng thành 503 kèm Retry-After.
+    """
+    retry_after = {"Retry-After": str(max(1, round(MODEL_LOAD_RETRY_SECONDS / 2)))}
+
+    @app.exception_handler(ModelNotReady)
+    async def model_not_ready(request: Request, exc: ModelNotReady):
+        return JSONResponse(status_code=503, headers=retry_after,
+                            content={"detail": f"Mô hình chưa sẵn sàng: {exc}"})
+
+    @app.get("/healthz", tags=["Status"])
+    async def healthz():
+        return {"status": "ok", "pid": os.getpid()}
+
+    @app.get("/readyz", tags=["Status"])
+    async def readyz():
+        readiness = service.readiness()
+        if not readiness["ready"]:
+            return JSONResponse(status_code=503, headers=retry_after, content=readiness)
+        return readiness
+
+
+def require_admin(x_admin_token: Optional[str] = Header(None)) -> None:
+    """Dependency cho các endpoint admin."""
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Endpoint admin bị tắt (chưa đặt ADMIN_TOKEN).")
+    if x_admin_token != ADMIN_TOKEN:
+        raise HTTPException(status_code=401, detail="Sai X-Admin-Token.")
+
+
+# --- phía model server ---
+class ModelServer:
+    def __init__(self, service, max_batch_size: int = int(os.getenv("INFERENCE_MAX_BATCH", "256")),
+                 max_wait_ms: float = float(os.getenv("INFERENCE_MAX_WAIT_MS", "2"))):
+        self.service = service
+        # Gom các lô của nhiều worker: lô con của mỗi worker được xếp vào cùng một lần chạy mô hình
+        self.batchers = {op: MicroBatcher(getattr(service, op), max_batch_size, max_wait_ms) for op in ROW_OPS}
+        self.connections = 0
+        self.requests = 0
+        self._open: Dict[asyncio.Task, asyncio.StreamWriter] = {}
+
+    async def _answer(self, message: Dict[str, Any]) -> Any:
+        op = message.get("op")
+        if op in ROW_OPS:
+            batcher = self.batchers[op]
+            return await asyncio.gather(*(batcher.submit(row) for row in decode_rows(message["rows"])))
+        if op == "summary":
+            return self.summary()
+        if op == "version":
+            return self.service.version
+        if op == "reload":
+            return await self.service.reload(message.get("version"), bool(message.get("force")))
+        raise ValueError(f"Không có thao tác {op!r}")
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self.connections += 1
+        self._open[asyncio.current_task()] = writer
+        try:
+            while True:
+                try:
+                    (size,) = _LENGTH.unpack(await reader.readexactly(_LENGTH.size))
+                    message = json.loads(await reader.readexactly(size))
+                except (asyncio.IncompleteReadError, asyncio.CancelledError):
+                    return   # worker đóng kết nối, hoặc server đang tắt (close)
+                self.requests += 1
+                try:
+                    reply = {"result": await self._answer(message)}
+                except Exception as e:
+                    reply = {"error": f"{type(e).__name__}: {e}"}
+                reply["version"] = self.service.version
+                writer.write(encode_message(reply))
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            self.connections -= 1
+            self._open.pop(asyncio.current_task(), None)
+            writer.close()
+
+    async def close(self) -> None:
+        """Dừng mọi handler và đóng kết nối của chúng."""
+        handlers = list(self._open)
+        for handler in handlers:
+            handler.cancel()
+        await asyncio.gather(*handlers, return_exceptions=True)
+
+    def summary(self) -> Dict[str, Any]:
+        return {**self.service.summary(),
+                "server": {"pid": os.getpid(), "connections": self.connections, "requests": self.requests,
+                           **{op: batcher.summary() for op, batcher in self.batchers.items()}}}
+
+
+async def serve(socket_path: str) -> None:
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        probe.connect(socket_path)
+        raise SystemExit(f"Đã có model server đang chạy trên {socket_path}")
+    except (FileNotFoundError, ConnectionRefusedError):
+        pass   # chưa có, hoặc file socket cũ của một tiến trình đã chết
+    finally:
+        probe.close()
+    if os.path.exists(socket_path):
+        os.remove(socket_path)
+
+    from model_registry import LocalModelService
+    service = LocalModelService()
+    server = ModelServer(service)
+    listener = await asyncio.start_unix_server(server.handle, path=socket_path)
+    os.chmod(socket_path, 0o600)
+    watcher = asyncio.create_task(service.watch())
+    stop = asyncio.Event()
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        asyncio.get_running_loop().add_signal_handler(signum, stop.set)
+    print(f"✅ Model server (phiên bản {service.version}) đang nghe trên {socket_path}")
+    try:
+        async with listener:
+            await stop.wait()
+    finally:
+        watcher.cancel()
+        await server.close()
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tiến trình giữ mô hình dùng chung cho các worker qua Unix socket")
+    parser.add_argument("--socket", default=MODEL_SERVER_SOCKET or DEFAULT_SOCKET)
+    args = parser.parse_args()
+    asyncio.run(serve(args.socket))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+# onnx_inference.py
+# Backend ONNX Runtime cho ImprovedFraudGNN lúc phục vụ (INFERENCE_BACKEND=onnx).
+# Đồ thị ONNX là dạng phục vụ của mô hình (edge_index rỗng, xem fused_inference.py):
+#   x -> Gemm(W1,b1) -> Relu -> Gemm(W2,b2) -> Relu -> Gemm(W3,b3) -> Softmax -> probs
+# với trục batch động. Đồ thị được dựng trực tiếp từ state_dict bằng onnx.helper thay vì
+# torch.onnx.export: bản export của GCNConv kéo theo cả phần thêm self-loop/scatter cho edge_index
+# (chậm hơn ~7 lần ở batch 1) và tên initializer thay đổi theo phiên bản torch.
+# sha256 của file .pth nguồn nằm trong metadata_props của mô hình để phát hiện trọng số cũ.
+#
+# Xuất (cần torch + torch_geometric + onnx, chạy một lần sau mỗi lần huấn luyện) và kiểm tra với torch:
+#   cd Model/API_Handling && python onnx_inference.py export --verify
+# Lúc phục vụ cần onnxruntime (explain_address đọc trọng số bằng gói onnx).
+# Số luồng CPU: ORT_INTRA_OP_THREADS, ORT_INTER_OP_THREADS (0 = mặc định của ORT).
+
+import argparse
+import os
+from typing import Dict, Optional
+
+import numpy as np
+
+from fused_inference import FusedFraudModel, WEIGHTS_FILENAME, fold_weights, verify as verify_fused
+
+ONNX_FORMAT = "fraud-gnn-onnx"
+ONNX_VERSION = 1
+ONNX_FILENAME = 'fraud_gnn.onnx'
+INT8_FILENAME = 'fraud_gnn_int8.onnx'   # biến thể lượng tử hoá, xem quantize_model.py
+# onnxruntime cũ hơn onnx không đọc được IR mới nhất; 8 + opset 17 đủ cho Gemm/Relu/Softmax
+ONNX_IR_VERSION = 8
+ONNX_OPSET = 17
+
+ORT_INTRA_OP_THREADS = int(os.getenv("ORT_INTRA_OP_THREADS", "0"))
+ORT_INTER_OP_THREADS = int(os.getenv("ORT_INTER_OP_THREADS", "0"))
+
+
+class OnnxFraudModel:
+    """Phiên ONNX Runtime trên CPU; predict_proba nhận ma trận đã tiền xử lý như FusedFraudModel."""
+
+    def __init__(self, path: str, intra_op_threads: int = ORT_INTRA_OP_THREADS,
+                 inter_op_threads: int = ORT_INTER_OP_THREADS):
+        import onnxruntime as ort
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = intra_op_threads
+        options.inter_op_num_threads = inter_op_threads
+        options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL   # đồ thị tuyến tính, không có nhánh song song
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.path = path
+        self.session = ort.InferenceSession(path, options, providers=['CPUExecutionProvider'])
+        self.metadata: Dict[str, str] = dict(self.session.get_modelmeta().custom_metadata_map)
+        if self.metadata.get("format") != ONNX_FORMAT or self.metadata.get("version") != str(ONNX_VERSION):
+            raise ValueError(f"{path} không phải mô hình ONNX phiên bản {ONNX_VERSION}")
+        self.source_sha256: Optional[str] = self.metadata.get("source_sha256") or None
+        model_input = self.session.get_inputs()[0]
+        self.input_name = model_input.name
+        self.num_features = int(model_input.shape[1])
+        self._first_layer_weight: Optional[np.ndarray] = None
+
+    def to_fused(self) -> FusedFraudModel:
+        """
+        Các lớp affine float đọc từ initializer w1..b3 (cần gói onnx; bản int8 được giải lượng tử
+        w{k}_int8 x w{k}_scale), dùng cho explain_address.
+        """
+        import onnx
+        from onnx import numpy_helper
+        arrays = {init.name: numpy_helper.to_array(init) for init in onnx.load(self.path).graph.initializer}
+
+        def weight(k):
+            if f'w{k}' in arrays:
+                return arrays[f'w{k}']
+            return arrays[f'w{k}_int8'].astype(np.float32) * arrays[f'w{k}_scale']
+        return FusedFraudModel(weight(1), arrays['b1'], weight(2), arrays['b2'], weight(3), arrays['b3'],
+                               self.source_sha256)
+
+    @property
+    def first_layer_weight(self) -> np.ndarray:
+        """Trọng số lớp đầu dạng (đầu ra, đầu vào) như FusedFraudModel.first_layer_weight."""
+        if self._first_layer_weight is None:
+            self._first_layer_weight = self.to_fused().first_layer_weight
+        return self._first_layer_weight
+
+    def predict_proba(self, x: np.ndarray) -> np.ndarray:
+        return self.session.run(None, {self.input_name: np.asarray(x, dtype=np.float32)})[0]
+
+
+def build_onnx(fused: FusedFraudModel):
+    """Dựng ModelProto từ các lớp affine đã gấp (tên initializer cố định w1..b3)."""
+    from onnx import TensorProto, helper, numpy_helper
+    initializers, nodes, current = [], [], 'x'
+    for k, (w, b) in enumerate(fused.layers, start=1):
+        initializers += [numpy_helper.from_array(w, f'w{k}'), numpy_helper.from_array(b, f'b{k}')]
+        nodes.append(helper.make_node('Gemm', [current, f'w{k}', f'b{k}'], [f'h{k}'], name=f'gemm{k}'))
+        current = f'h{k}'
+        if k < len(fused.layers):
+            nodes.append(helper.make_node('Relu', [current], [f'a{k}'], name=f'relu{k}'))
+            current = f'a{k}'
+    nodes.append(helper.make_node('Softmax', [current], ['probs'], axis=1, name='softmax'))
+    graph = helper.make_graph(
+        nodes, 'improved_fraud_gnn_serving',
+        [helper.make_tensor_value_info('x', TensorProto.FLOAT, ['batch', fused.num_features])],
+        [helper.make_tensor_value_info('probs', TensorProto.FLOAT, ['batch', 2])],
+        initializers)
+    model = helper.make_model(graph, opset_imports=[helper.make_opsetid('', ONNX_OPSET)],
+                              ir_version=ONNX_IR_VERSION, producer_name='onnx_inference.py')
+    helper.set_model_props(model, {"format": ONNX_FORMAT, "version": str(ONNX_VERSION),
+                                   "source_sha256": fused.source_sha256 or ''})
+    import onnx
+    onnx.checker.check_model(model)
+    return model
+
+
+def export(artifacts_dir: str, out: str) -> None:
+    import onnx
+    onnx.save(build_onnx(fold_weights(artifacts_dir)), out)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Xuất ImprovedFraudGNN (dạng phục vụ) sang ONNX")
+    sub = parser.add_subparsers(dest="command", required=True)
+    exp = sub.add_parser("export")
+    exp.add_argument("--artifacts", default='../Model/')
+    exp.add_argument("--out", help=f"mặc định <artifacts>/{ONNX_FILENAME}")
+    exp.add_argument("--verify", action="store_true", help="chạy bằng onnxruntime và so với mô hình torch")
+    args = parser.parse_args()
+
+    out = args.out or os.path.join(args.artifacts, ONNX_FILENAME)
+    tmp = out + '.tmp'
+    export(args.artifacts, tmp)
+    if args.verify:
+        # verify của fused_inference chỉ cần predict_proba/num_features nên dùng lại được cho phiên ORT
+        worst = verify_fused(OnnxFraudModel(tmp), args.artifacts)
+        print(f"Sai khác xác suất lớn nhất so với torch ({WEIGHTS_FILENAME}): {worst:.3g}")
+        if worst > 1e-5:
+            os.remove(tmp)
+            raise SystemExit("Mô hình ONNX lệch với mô hình torch quá 1e-5, không ghi file.")
+    os.replace(tmp, out)
+    print(f"Đã ghi mô hình ONNX vào {out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+# pagination.py
+# Phân trang song song có cửa sổ: giữ nhiều request trang cùng lúc, dừng phát trang mới
+# ngay khi gặp trang cuối (has_more=false) và trả kết quả theo đúng thứ tự trang.
+
+import asyncio
+import time
+from dataclasses import dataclass
+from typing import List, Dict, Any, Optional, Tuple, Callable, Awaitable, AsyncIterator
+
+# fetch_page(page_number) -> (items, has_more)
+PageFetcher = Callable[[int], Awaitable[Tuple[List[Dict[str, Any]], bool]]]
+
+
+@dataclass
+class PageResult:
+    page_number: int
+    items: List[Dict[str, Any]]
+    has_more: bool
+    latency: float                          # giây, tính từ lúc phát request tới lúc nhận xong
+    error: Optional[BaseException] = None
+
+
+async def _timed_fetch(fetch_page: PageFetcher, page_number: int) -> PageResult:
+    start = time.perf_counter()
+    try:
+        items, has_more = await fetch_page(page_number)
+        return PageResult(page_number, items, has_more and bool(items), time.perf_counter() - start)
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:
+        return PageResult(page_number, [], False, time.perf_counter() - start, error=e)
+
+
+async def paginate_concurrently(fetch_page: PageFetcher, max_pages: int,
+                                max_in_flight: int) -> AsyncIterator[PageResult]:
+    """
+    Lấy các trang 0..max_pages-1 với tối đa `max_in_flight` request đồng thời.
+    Trang lỗi hoặc trang có has_more=false được coi là trang cuối; các trang sau nó
+    đang bay sẽ bị huỷ và không được trả về.
+    """
+    in_flight: Dict[int, asyncio.Task] = {}
+    completed: Dict[int, PageResult] = {}
+    next_to_issue = 0
+    next_to_yield = 0
+    last_page = max_pages - 1
+
+    try:
+        while next_to_yield <= last_page:
+            while next_to_issue <= last_page and len(in_flight) < max_in_flight:
+                in_flight[next_to_issue] = asyncio.create_task(_timed_fetch(fetch_page, next_to_issue))
+                next_to_issue += 1
+
+            done, _ = await asyncio.wait(in_flight.values(), return_when=asyncio.FIRST_COMPLETED)
+            for result in sorted((task.result() for task in done), key=lambda r: r.page_number):
+                if result.page_number > last_page:
+                    continue  # đã bị loại (và xoá khỏi in_flight) bởi một trang cuối trong cùng đợt
+                del in_flight[result.page_number]
+                completed[result.page_number] = result
+                if not result.has_more and result.page_number < last_page:
+                    last_page = result.page_number
+                    for page_number in [p for p in in_flight if p > last_page]:
+                        in_flight.pop(page_number).cancel()
+
+            while next_to_yield in completed and next_to_yield <= last_page:
+                yield completed.pop(next_to_yield)
+                next_to_yield += 1
+    finally:
+        for task in in_flight.values():
+            task.cancel()
@@ -0,0 +1,201 @@
+# prediction_cache.py
+# Cache kết quả dự đoán theo ví: bộ nhớ (LRU) + tuỳ chọn SQLite trên đĩa (dùng chung giữa các worker).
+#
+# Khoá: (địa chỉ viết thường, phiên bản mô hình, block cao nhất của ví lúc tính). Mỗi (địa chỉ, phiên bản)
+# giữ một mục mới nhất; mục của block mới hơn thay thế mục cũ. Mục chứa dự đoán, cờ partial và
+# FeatureVector đã mã hoá (như model_server.encode_rows) để /analyze vẫn tính được đồ thị lân cận và
+# giải thích mà không gọi lại Covalent.
+#
+# Hai TTL tính từ lúc tính dự đoán / lúc xác nhận lại gần nhất:
+# - PREDICTION_CACHE_FRESH_SECONDS: dùng ngay, không gọi mạng;
+# - PREDICTION_CACHE_MAX_AGE_SECONDS: quá hạn tươi thì hỏi trang giao dịch mới nhất của ví (một request
+#   Covalent thay vì cả lịch sử + số dư); block cao nhất không đổi thì dùng lại và làm tươi mục, đổi thì
+#   tính lại. Quá tuổi tối đa luôn tính lại (số dư token có thể đổi mà không có giao dịch mới).
+# Lịch sử bị cắt (partial) không được cache. Header X-Prediction-Cache: bypass (hoặc
+# Cache-Control: no-cache) bỏ qua lượt đọc nhưng vẫn ghi kết quả mới.
+
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, asdict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+PREDICTION_CACHE_ENABLED = os.environ.get('PREDICTION_CACHE_ENABLED', '1') == '1'
+PREDICTION_CACHE_MAX_ENTRIES = int(os.environ.get('PREDICTION_CACHE_MAX_ENTRIES', 10000))
+PREDICTION_CACHE_FRESH_SECONDS = float(os.environ.get('PREDICTION_CACHE_FRESH_SECONDS', 60))
+PREDICTION_CACHE_MAX_AGE_SECONDS = float(os.environ.get('PREDICTION_CACHE_MAX_AGE_SECONDS', 3600))
+# Không đặt = chỉ cache trong bộ nhớ của worker
+PREDICTION_CACHE_PATH = os.environ.get('PREDICTION_CACHE_PATH')
+
+BYPASS_HEADER = 'X-Prediction-Cache'
+
+
+@dataclass
+class CachedPrediction:
+    address: str
+    model_version: str
+    last_seen_block: int
+    payload: Dict[str, Any]     # {"prediction": [status, confidence, percent], "partial": bool, "vector": {...}}
+    stored_at: float            # lúc tính dự đoán
+    validated_at: float         # lúc tính hoặc lúc xác nhận lại block cao nhất gần nhất
+
+
+@dataclass
+class PredictionCacheStats:
+    hits: int = 0               # dùng trong hạn tươi
+    revalidated: int = 0        # quá hạn tươi, block cao nhất không đổi
+    misses: int = 0
+    bypassed: int = 0
+    disk_hits: int = 0          # mục không có trong bộ nhớ nhưng có trong SQLite
+    evictions: int = 0
+
+
+def bypass_requested(headers) -> bool:
+    return (headers.get(BYPASS_HEADER, '').lower() == 'bypass'
+            or 'no-cache' in headers.get('Cache-Control', '').lower())
+
+
+class PredictionCache:
+    def __init__(self, max_entries: int, fresh_seconds: float, max_age_seconds: float, path: Optional[str] = None):
+        self.max_entries = max_entries
+        self.fresh_seconds = fresh_seconds
+        self.max_age_seconds = max_age_seconds
+        self.path = path
+        self.stats = PredictionCacheStats()
+        self._memory: "OrderedDict[Tuple[str, str], CachedPrediction]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        if path is not None:
+            self._conn = sqlite3.connect(path, check_same_thread=False)
+            self._conn.executescript("""
+                PRAGMA journal_mode=WAL;
+                CREATE TABLE IF NOT EXISTS predictions (
+                    address TEXT NOT NULL,
+                    model_version TEXT NOT NULL,
+                    last_seen_block INTEGER NOT NULL,
+                    payload TEXT NOT NULL,
+                    stored_at REAL NOT NULL,
+                    validated_at REAL NOT NULL,
+                    PRIMARY KEY (address, model_version)
+                );
+                CREATE INDEX IF NOT EXISTS predictions_stored_at ON predictions (stored_at);
+            """)
+
+    # --- tra cứu ---
+    def get(self, address: str, model_version: str) -> Optional[CachedPrediction]:
+        """Mục mới nhất của (địa chỉ, phiên bản) còn trong tuổi tối đa, hoặc None (chặn nếu có SQLite)."""
+        key = (address.lower(), model_version)
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if now - entry.stored_at <= self.max_age_seconds:
+                    self._memory.move_to_end(key)
+                    return entry
+                del self._memory[key]
+            if self._conn is None:
+                return None
+            row = self._conn.execute(
+                "SELECT last_seen_block, payload, stored_at, validated_at FROM predictions "
+                "WHERE address = ? AND model_version = ? AND stored_at >= ?",
+                (key[0], model_version, now - self.max_age_seconds)).fetchone()
+            if row is None:
+                return None
+            self.stats.disk_hits += 1
+            entry = CachedPrediction(key[0], model_version, row[0], json.loads(row[1]), row[2], row[3])
+            self._remember(key, entry)
+            return entry
+
+    def is_fresh(self, entry: CachedPrediction) -> bool:
+        return time.time() - entry.validated_at <= self.fresh_seconds
+
+    # --- ghi ---
+    def put(self, address: str, model_version: str, last_seen_block: int, payload: Dict[str, Any]) -> None:
+        now = time.time()
+        entry = CachedPrediction(address.lower(), model_version, last_seen_block, payload, now, now)
+        with self._lock:
+            self._remember((entry.address, model_version), entry)
+            if self._conn is not None:
+                self._conn.execute("INSERT OR REPLACE INTO predictions VALUES (?, ?, ?, ?, ?, ?)",
+                                   (entry.address, model_version, last_seen_block,
+                                    json.dumps(payload, separators=(',', ':')), now, now))
+                self._conn.execute("DELETE FROM predictions WHERE stored_at < ?", (now - self.max_age_seconds,))
+                self._conn.commit()
+
+    def revalidate(self, entry: CachedPrediction) -> None:
+        """Block cao nhất của ví chưa đổi: làm tươi mục (tuổi tối đa vẫn tính từ lúc tính dự đoán)."""
+        entry.validated_at = time.time()
+        if self._conn is not None:
+            with self._lock:
+                self._conn.execute(
+                    "UPDATE predictions SET validated_at = ? WHERE address = ? AND model_version = ? "
+                    "AND last_seen_block = ?", (entry.validated_at, entry.address, entry.model_version,
+                                                entry.last_seen_block))
+                self._conn.commit()
+
+    def _remember(self, key: Tuple[str, str], entry: CachedPrediction) -> None:
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self.stats.evictions += 1
+
+    def summary(self) -> Dict[str, Any]:
+        summary = {**asdict(self.stats), "memory_entries": len(self._memory), "max_entries": self.max_entries,
+                   "fresh_seconds": self.fresh_seconds, "max_age_seconds": self.max_age_seconds, "path": self.path}
+        if self._conn is not None:
+            with self._lock:
+                summary["disk_entries"] = self._conn.execute("SELECT COUNT(*) FROM predictions").fetchone()[0]
+        return summary
+
+    # --- dùng từ các endpoint ---
+    async def lookup(self, address: str, model_version: str,
+                     latest_block: Callable[[], Awaitable[int]]) -> Tuple[Optional[CachedPrediction], str]:
+        """
+        Trả về (mục dùng được hoặc None, "hit" | "revalidated" | "miss"). `latest_block` chỉ được gọi khi
+        mục đã quá hạn tươi; lỗi của nó được tính là miss.
+        """
+        entry = (self.get(address, model_version) if self._conn is None
+                 else await asyncio.to_thread(self.get, address, model_version))
+        if entry is not None and self.is_fresh(entry):
+            self.stats.hits += 1
+            return entry, "hit"
+        if entry is not None:
+            try:
+                head = await latest_block()
+            except Exception as e:
+                logging.warning(f"Không kiểm tra được block mới nhất của {address}: {type(e).__name__}: {e}")
+                head = None
+            if head == entry.last_seen_block:
+                await asyncio.to_thread(self.revalidate, entry)
+                self.stats.revalidated += 1
+                return entry, "revalidated"
+        self.stats.misses += 1
+        return None, "miss"
+
+    async def store(self, address: str, model_version: str, last_seen_block: Optional[int],
+                    payload: Dict[str, Any]) -> None:
+        if last_seen_block is None or payload.get("partial"):
+            return
+        if self._conn is None:
+            self.put(address, model_version, last_seen_block, payload)
+        else:
+            await asyncio.to_thread(self.put, address, model_version, last_seen_block, payload)
+
+
+PREDICTION_CACHE: Optional[PredictionCache] = None
+if PREDICTION_CACHE_ENABLED:
+    try:
+        if PREDICTION_CACHE_PATH:
+            os.makedirs(os.path.dirname(PREDICTION_CACHE_PATH) or '.', exist_ok=True)
+        PREDICTION_CACHE = PredictionCache(PREDICTION_CACHE_MAX_ENTRIES, PREDICTION_CACHE_FRESH_SECONDS,
+                                           PREDICTION_CACHE_MAX_AGE_SECONDS, PREDICTION_CACHE_PATH)
+    except sqlite3.Error as e:
+        logging.warning(f"Không mở được cache dự đoán tại {PREDICTION_CACHE_PATH}, chỉ cache trong bộ nhớ: {e}")
+        PREDICTION_CACHE = PredictionCache(PREDICTION_CACHE_MAX_ENTRIES, PREDICTION_CACHE_FRESH_SECONDS,
+                                           PREDICTION_CACHE_MAX_AGE_SECONDS)
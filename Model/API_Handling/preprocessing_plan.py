@@ -0,0 +1,212 @@
+# preprocessing_plan.py
+# "Biên dịch" preprocessing_pipeline.pkl đã fit (ColumnDropper -> ControlCharacterCleaner ->
+# IntelligentImputer -> StandardScaler) thành một kế hoạch số đông cứng lưu dạng JSON:
+# thứ tự cột, giá trị điền, bảng tra của OrdinalEncoder, mean/scale của scaler.
+# PreprocessingPlan.transform cho kết quả giống hệt pipeline.transform nhưng chỉ dùng NumPy,
+# nên lúc phục vụ không cần joblib/sklearn và không phải unpickle file .pkl.
+#
+# Biên dịch (cần sklearn + ml_transformers, chỉ chạy một lần sau mỗi lần huấn luyện):
+#   cd Model/API_Handling && python preprocessing_plan.py compile
+#   python preprocessing_plan.py compile --verify-csv ../Dataset/transaction_dataset.csv
+
+import argparse
+import hashlib
+import json
+import math
+import os
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+
+PLAN_FORMAT = "fraud-preprocessing-plan"
+PLAN_VERSION = 1
+PLAN_FILENAME = 'preprocessing_plan.json'
+PIPELINE_FILENAME = 'preprocessing_pipeline.pkl'
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _remove_control_char(value: Any) -> Optional[str]:
+    """Giống ControlCharacterCleaner._remove_control_char; None thay cho np.nan."""
+    cleaned = ''.join(c for c in str(value) if ord(c) >= 32 or c in '\t\n\r')
+    return cleaned if cleaned.strip() != '' else None
+
+
+def _is_missing(value: Any) -> bool:
+    return value is None or (isinstance(value, float) and math.isnan(value))
+
+
+class PreprocessingPlan:
+    """Kế hoạch tiền xử lý đã biên dịch; `transform` thay thế trực tiếp cho pipeline.transform."""
+
+    def __init__(self, plan: Dict[str, Any]):
+        if plan.get("format") != PLAN_FORMAT or plan.get("version") != PLAN_VERSION:
+            raise ValueError(f"Không phải kế hoạch tiền xử lý phiên bản {PLAN_VERSION}: "
+                             f"{plan.get('format')} v{plan.get('version')}")
+        self.plan = plan
+        self.columns: List[str] = plan["columns"]
+        self.source_sha256: Optional[str] = plan.get("source", {}).get("sha256")
+        numeric = plan["numeric"]
+        categorical = plan["categorical"]
+        self.numeric_fill_value = float(numeric["fill_value"])
+        self._numeric = set(numeric["columns"])
+        self._clean = set(categorical["clean_control_chars"])
+        self.categorical_fill_value: str = categorical["fill_value"]
+        self.unknown_value = float(categorical["unknown_value"])
+        self._lookup = {col: {category: float(code) for code, category in enumerate(categories)}
+                        for col, categories in categorical["categories"].items()}
+        self._codes: Dict[str, Dict[Any, float]] = {col: {} for col in self._lookup}
+        scaler = plan["scaler"]
+        self.mean = np.asarray(scaler["mean"], dtype=np.float64) if scaler["mean"] is not None else None
+        self.scale = np.asarray(scaler["scale"], dtype=np.float64) if scaler["scale"] is not None else None
+
+    @classmethod
+    def load(cls, path: str) -> "PreprocessingPlan":
+        with open(path, 'r', encoding='utf-8') as f:
+            return cls(json.load(f))
+
+    def save(self, path: str) -> None:
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.plan, f, ensure_ascii=False, indent=1)
+
+    # --- transform ---
+    def _encode(self, col: str, value: Any) -> float:
+        """Cleaner -> điền 'Unknown' -> OrdinalEncoder cho một giá trị, có memo theo giá trị gốc."""
+        memo = self._codes[col]
+        key = value if not _is_missing(value) else ('__missing__', value is None)
+        code = memo.get(key)
+        if code is None:
+            if col in self._clean:
+                value = _remove_control_char(value)   # None -> 'None', NaN -> 'nan' như pandas
+            if _is_missing(value):
+                value = self.categorical_fill_value
+            code = self._lookup[col].get(value, self.unknown_value)
+            if len(memo) < 4096:
+                memo[key] = code
+        return code
+
+    def _transform_columns(self, column_values: Callable[[str], Sequence[Any]], n_rows: int) -> np.ndarray:
+        out = np.empty((n_rows, len(self.columns)), dtype=np.float64)
+        for j, col in enumerate(self.columns):
+            values = column_values(col)
+            if col in self._lookup:
+                out[:, j] = [self._encode(col, v) for v in values]
+            else:
+                column = np.asarray(values).astype(np.float64)   # None -> NaN
+                if col in self._numeric:
+                    column[np.isnan(column)] = self.numeric_fill_value
+                out[:, j] = column
+        if self.mean is not None:
+            out -= self.mean
+        if self.scale is not None:
+            out /= self.scale
+        return out
+
+    def transform(self, X) -> np.ndarray:
+        """Nhận DataFrame như pipeline.transform (cột thừa như Index/Address bị bỏ qua)."""
+        return self._transform_columns(lambda col: X[col].to_numpy(), len(X))
+
+    def transform_records(self, records: List[Dict[str, Any]]) -> np.ndarray:
+        """
+        Biến đổi thẳng từ các dict đặc trưng, không dựng DataFrame.
+        Cột thiếu trong một dict được điền 0.0 cho dòng đó, giống model._feature_frame.
+        """
+        return self._transform_columns(lambda col: [r.get(col, 0.0) for r in records], len(records))
+
+    def transform_vectors(self, vectors: list) -> np.ndarray:
+        """
+        Biến đổi các feature_schema.FeatureVector: cột số lấy thẳng từ ma trận xếp chồng,
+        cột token lấy từ labels. Cột của kế hoạch mà lược đồ không có được coi là 0.0.
+        """
+        schema = vectors[0].schema
+        matrix = schema.stack(vectors)
+
+        def column(col: str):
+            if col in schema.label_slot:
+                return schema.column_labels(vectors, col)
+            if col in schema.index:
+                return matrix[:, schema.index[col]]
+            return np.zeros(len(vectors))
+        return self._transform_columns(column, len(vectors))
+
+
+def compile_pipeline(pipeline, source_path: Optional[str] = None) -> PreprocessingPlan:
+    """Đọc các tham số đã fit của pipeline (ColumnDropper, Cleaner, Imputer, StandardScaler) thành kế hoạch."""
+    steps = dict(pipeline.steps)
+    expected = ['column_dropper', 'control_char_cleaner', 'intelligent_imputer', 'scaler']
+    if list(steps) != expected:
+        raise ValueError(f"Pipeline có các bước {list(steps)}, chỉ biên dịch được {expected}")
+    imputer, scaler = steps['intelligent_imputer'], steps['scaler']
+    columns = [str(c) for c in scaler.feature_names_in_]
+    encoder = imputer.encoder_
+    if encoder.handle_unknown != 'use_encoded_value':
+        raise ValueError("OrdinalEncoder phải dùng handle_unknown='use_encoded_value'")
+
+    source = {}
+    if source_path:
+        import sklearn
+        source = {"path": os.path.basename(source_path), "sha256": file_sha256(source_path),
+                  "sklearn_version": sklearn.__version__}
+    return PreprocessingPlan({
+        "format": PLAN_FORMAT,
+        "version": PLAN_VERSION,
+        "source": source,
+        "columns": columns,
+        "drop_columns": list(steps['column_dropper'].columns_to_drop),
+        "numeric": {"columns": list(imputer.numeric_cols_), "fill_value": imputer.numeric_fill_value},
+        "categorical": {
+            "clean_control_chars": list(steps['control_char_cleaner'].object_cols_),
+            "fill_value": imputer.categorical_fill_value,
+            "unknown_value": encoder.unknown_value,
+            "categories": {col: [str(c) for c in cats]
+                           for col, cats in zip(imputer.categorical_cols_, encoder.categories_)},
+        },
+        "scaler": {
+            "mean": scaler.mean_.tolist() if scaler.with_mean else None,
+            "scale": scaler.scale_.tolist() if scaler.with_std else None,
+        },
+    })
+
+
+def verify(plan: PreprocessingPlan, pipeline, frame) -> float:
+    """Sai khác tuyệt đối lớn nhất giữa plan.transform và pipeline.transform trên cùng một DataFrame."""
+    return float(np.max(np.abs(plan.transform(frame) - np.asarray(pipeline.transform(frame), dtype=np.float64))))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Biên dịch preprocessing_pipeline.pkl thành kế hoạch NumPy")
+    sub = parser.add_subparsers(dest="command", required=True)
+    comp = sub.add_parser("compile")
+    comp.add_argument("--artifacts", default='../Model/')
+    comp.add_argument("--out", help=f"mặc định <artifacts>/{PLAN_FILENAME}")
+    comp.add_argument("--verify-csv", help="kiểm tra trên một file dạng transaction_dataset.csv")
+    args = parser.parse_args()
+
+    import joblib
+    pipeline_path = os.path.join(args.artifacts, PIPELINE_FILENAME)
+    pipeline = joblib.load(pipeline_path)
+    plan = compile_pipeline(pipeline, pipeline_path)
+
+    if args.verify_csv:
+        import pandas as pd
+        df = pd.read_csv(args.verify_csv, index_col=0)   # đọc giống lúc huấn luyện
+        df.columns = df.columns.str.strip()
+        frame = df.drop(columns='FLAG', errors='ignore')
+        worst = verify(plan, pipeline, frame)
+        print(f"Sai khác lớn nhất so với pipeline trên {len(frame)} dòng: {worst:.3g}")
+        if worst != 0.0:
+            raise SystemExit("Kế hoạch không khớp pipeline, không ghi file.")
+
+    out = args.out or os.path.join(args.artifacts, PLAN_FILENAME)
+    plan.save(out)
+    print(f"Đã ghi kế hoạch tiền xử lý ({len(plan.columns)} cột) vào {out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+# quantize_model.py
+# Biến thể int8 của mô hình phục vụ (dạng ONNX, xem onnx_inference.py) -> fraud_gnn_int8.onnx
+# cạnh fraud_gnn_weights.pth. Phục vụ bằng INFERENCE_BACKEND=onnx-int8.
+#
+# Lượng tử hoá động sau huấn luyện cho ba lớp tuyến tính:
+# - trọng số int8 đối xứng, một scale cho mỗi cột đầu ra (lưu sẵn trong file);
+# - kích hoạt lượng tử hoá lúc chạy với một scale cho MỖI DÒNG (max|x| của dòng / 127),
+#   nhân bằng MatMulInteger (int8 x int8 -> int32) rồi nhân lại scale dòng x scale cột, cộng bias.
+# Không dùng onnxruntime.quantization.quantize_dynamic: nó lấy một scale cho cả tensor kích hoạt, nên
+# một ví có đặc trưng chuẩn hoá cực lớn (tới ~160) làm mất độ phân giải của mọi ví khác trong cùng lô
+# và kết quả của một ví phụ thuộc vào lô nó được micro-batch cùng (recall gian lận 0.96 -> 0.81 khi cả tập test là một lô).
+#
+# Cổng chất lượng: file chỉ được ghi nếu, trên tập test của transaction_dataset.csv (chia giống
+# ethereum_retrain.py: train_test_split 10%, random_state=42) ở dạng phục vụ (không cạnh),
+# F1 và recall lớp gian lận của bản int8 không giảm quá ngưỡng so với bản float, và dự đoán cả lô
+# trùng với dự đoán từng dòng. Kết quả cổng được ghi vào metadata_props của mô hình int8.
+#
+# Chạy (cần onnx, onnxruntime, scikit-learn; fraud_gnn_fused.npz đã xuất):
+#   cd Model/API_Handling && python quantize_model.py --max-f1-drop 0.01 --max-recall-drop 0.01
+
+import argparse
+import json
+import os
+from typing import Dict
+
+import numpy as np
+
+from fused_inference import FusedFraudModel, FUSED_FILENAME, WEIGHTS_FILENAME
+from onnx_inference import (OnnxFraudModel, ONNX_FILENAME, ONNX_FORMAT, ONNX_VERSION, ONNX_IR_VERSION,
+                            ONNX_OPSET, INT8_FILENAME)
+from preprocessing_plan import PreprocessingPlan, PLAN_FILENAME, file_sha256
+
+QUANTIZATION = "dynamic-int8-per-row"
+DATASET_PATH = os.path.join('..', 'Dataset', 'transaction_dataset.csv')
+
+
+def quantize_weight(w: np.ndarray):
+    """(đầu vào, đầu ra) float32 -> (int8, scale float32 theo cột đầu ra)."""
+    scale = (np.maximum(np.abs(w).max(axis=0), 1e-12) / 127).astype(np.float32)
+    return np.clip(np.round(w / scale), -127, 127).astype(np.int8), scale
+
+
+def build_int8_onnx(fused: FusedFraudModel):
+    from onnx import TensorProto, helper, numpy_helper
+    initializers = [numpy_helper.from_array(np.float32(127), 'qmax'),
+                    numpy_helper.from_array(np.float32(-127), 'qmin'),
+                    numpy_helper.from_array(np.float32(1e-12), 'eps')]
+    nodes, current = [], 'x'
+
+    def node(op, inputs, output, **attrs):
+        nodes.append(helper.make_node(op, inputs, [output], name=output, **attrs))
+        return output
+
+    for k, (w, b) in enumerate(fused.layers, start=1):
+        w_int8, w_scale = quantize_weight(w)
+        initializers += [numpy_helper.from_array(w_int8, f'w{k}_int8'),
+                         numpy_helper.from_array(w_scale, f'w{k}_scale'),
+                         numpy_helper.from_array(b, f'b{k}')]
+        p = f'l{k}_'
+        # scale của từng dòng: max|x| / 127 (eps để dòng toàn 0 không chia cho 0)
+        row_max = node('ReduceMax', [node('Abs', [current], p + 'abs')], p + 'row_max', axes=[1], keepdims=1)
+        x_scale = node('Div', [node('Max', [row_max, 'eps'], p + 'row_max_eps'), 'qmax'], p + 'x_scale')
+        x_int8 = node('Cast', [node('Clip', [node('Round', [node('Div', [current, x_scale], p + 'x_div')],
+                                                      p + 'x_round'), 'qmin', 'qmax'], p + 'x_clip')],
+                      p + 'x_int8', to=TensorProto.INT8)
+        acc = node('Cast', [node('MatMulInteger', [x_int8, f'w{k}_int8'], p + 'acc_int32')],
+                   p + 'acc', to=TensorProto.FLOAT)
+        current = node('Add', [node('Mul', [node('Mul', [acc, x_scale], p + 'acc_row'), f'w{k}_scale'],
+                                    p + 'acc_scaled'), f'b{k}'], p + 'h')
+        if k < len(fused.layers):
+            current = node('Relu', [current], p + 'relu')
+    node('Softmax', [current], 'probs', axis=1)
+
+    graph = helper.make_graph(
+        nodes, 'improved_fraud_gnn_serving_int8',
+        [helper.make_tensor_value_info('x', TensorProto.FLOAT, ['batch', fused.num_features])],
+        [helper.make_tensor_value_info('probs', TensorProto.FLOAT, ['batch', 2])],
+        initializers)
+    model = helper.make_model(graph, opset_imports=[helper.make_opsetid('', ONNX_OPSET)],
+                              ir_version=ONNX_IR_VERSION, producer_name='quantize_model.py')
+    helper.set_model_props(model, {"format": ONNX_FORMAT, "version": str(ONNX_VERSION),
+                                   "source_sha256": fused.source_sha256 or '', "quantization": QUANTIZATION})
+    import onnx
+    onnx.checker.check_model(model)
+    return model
+
+
+def load_test_split(csv_path: str, test_size: float = 0.1, random_state: int = 42):
+    """Tập test giống ethereum_retrain.train_val_test_split (bước chia đầu tiên chỉ phụ thuộc test_size)."""
+    import pandas as pd
+    from sklearn.model_selection import train_test_split
+    df = pd.read_csv(csv_path, index_col=0)
+    df.columns = df.columns.str.strip()
+    _, test_df = train_test_split(df, test_size=test_size, random_state=random_state)
+    return test_df.drop(columns='FLAG'), test_df['FLAG'].to_numpy()
+
+
+def fraud_metrics(y_true: np.ndarray, y_pred: np.ndarray) -> Dict[str, float]:
+    from sklearn.metrics import f1_score, recall_score
+    return {"f1_fraud": float(f1_score(y_true, y_pred, pos_label=1, zero_division=0)),
+            "recall_fraud": float(recall_score(y_true, y_pred, pos_label=1, zero_division=0))}
+
+
+def accuracy_gate(float_model, int8_model, x_test: np.ndarray, y_test: np.ndarray,
+                  max_f1_drop: float, max_recall_drop: float) -> Dict[str, object]:
+    """So bản int8 với bản float trên cùng tập test; `passed` là điều kiện để ghi file."""
+    float_pred = float_model.predict_proba(x_test).argmax(axis=1)
+    int8_pred = int8_model.predict_proba(x_test).argmax(axis=1)
+    # Như /analyze (lô 1) so với /graph, /analyze/batch (cả lô): hai cách phải cho cùng nhãn
+    row_pred = np.array([int8_model.predict_proba(x_test[i:i + 1]).argmax(axis=1)[0] for i in range(len(x_test))])
+    reference, candidate = fraud_metrics(y_test, float_pred), fraud_metrics(y_test, int8_pred)
+    f1_drop = reference["f1_fraud"] - candidate["f1_fraud"]
+    recall_drop = reference["recall_fraud"] - candidate["recall_fraud"]
+    batch_independent = bool(np.array_equal(row_pred, int8_pred))
+    return {
+        "rows": int(len(y_test)),
+        "float": reference,
+        "int8": candidate,
+        "label_agreement": float(np.mean(float_pred == int8_pred)),
+        "batch_independent": batch_independent,
+        "max_f1_drop": max_f1_drop,
+        "max_recall_drop": max_recall_drop,
+        "passed": bool(f1_drop <= max_f1_drop and recall_drop <= max_recall_drop and batch_independent),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Lượng tử hoá động int8 mô hình phục vụ, có cổng F1/recall")
+    parser.add_argument("--artifacts", default='../Model/')
+    parser.add_argument("--csv", default=DATASET_PATH)
+    parser.add_argument("--out", help=f"mặc định <artifacts>/{INT8_FILENAME}")
+    parser.add_argument("--max-f1-drop", type=float, default=0.01)
+    parser.add_argument("--max-recall-drop", type=float, default=0.01)
+    args = parser.parse_args()
+
+    fused_path = os.path.join(args.artifacts, FUSED_FILENAME)
+    float_path = os.path.join(args.artifacts, ONNX_FILENAME)
+    fused = FusedFraudModel.load(fused_path)
+    if fused.source_sha256 != file_sha256(os.path.join(args.artifacts, WEIGHTS_FILENAME)):
+        raise SystemExit(f"{FUSED_FILENAME} cũ hơn {WEIGHTS_FILENAME}. Chạy trước: python fused_inference.py export --verify")
+
+    import onnx
+    out = args.out or os.path.join(args.artifacts, INT8_FILENAME)
+    tmp = out + '.tmp'
+    model = build_int8_onnx(fused)
+    onnx.save(model, tmp)
+
+    plan = PreprocessingPlan.load(os.path.join(args.artifacts, PLAN_FILENAME))
+    frame, y_test = load_test_split(args.csv)
+    x_test = plan.transform(frame).astype(np.float32)
+    # Bản float tham chiếu: fraud_gnn.onnx nếu có, không thì chính bản gấp NumPy (cùng phép tính)
+    float_model = OnnxFraudModel(float_path) if os.path.exists(float_path) else fused
+    report = accuracy_gate(float_model, OnnxFraudModel(tmp), x_test, y_test, args.max_f1_drop, args.max_recall_drop)
+    os.remove(tmp)
+    print(json.dumps(report, indent=2))
+    if not report["passed"]:
+        raise SystemExit("Bản int8 không qua cổng chất lượng, không ghi file.")
+
+    props = {p.key: p.value for p in model.metadata_props}
+    props["accuracy_gate"] = json.dumps(report)
+    onnx.helper.set_model_props(model, props)
+    onnx.save(model, out)
+    print(f"Đã ghi mô hình int8 vào {out} ({os.path.getsize(out)} byte; "
+          f"{FUSED_FILENAME} {os.path.getsize(fused_path)} byte)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+# rate_limiter.py
+# Bộ giới hạn tốc độ dùng chung cho toàn tiến trình: mọi request tới Covalent đều
+# phải xin một "lượt" trước khi gửi, bất kể có bao nhiêu phân tích chạy song song.
+
+import asyncio
+import time
+
+
+class AdaptiveRateLimiter:
+    """
+    Token bucket (dạng GCRA: lưu thời điểm đến lý thuyết thay vì số token) cho phép
+    dồn tối đa `burst` request rồi giữ `rate` request mỗi giây, và tự thích nghi với 429:
+    - throttled(retry_after): giảm một nửa tốc độ (không dưới `min_rate`) và dừng mọi lượt
+      cho tới hết Retry-After;
+    - succeeded(): tăng dần tốc độ trở lại `max_rate` (mỗi lần thành công cộng `max_rate / 20`).
+    """
+
+    def __init__(self, rate_per_second: float, burst: int = 1, min_rate: float = 0.5):
+        self.max_rate = rate_per_second
+        self.min_rate = min(min_rate, rate_per_second)
+        self.rate = rate_per_second
+        self.burst = max(1, burst)
+        self.throttled_count = 0
+        self._tat = 0.0                 # thời điểm đến lý thuyết của request kế tiếp
+        self._paused_until = 0.0
+
+    @property
+    def interval(self) -> float:
+        return 1.0 / self.rate
+
+    async def acquire(self) -> None:
+        # Không có await giữa lúc đọc và ghi _tat nên không cần khoá
+        now = time.monotonic()
+        interval = self.interval
+        slot = max(now, self._paused_until, self._tat - (self.burst - 1) * interval)
+        self._tat = max(self._tat, slot) + interval
+        delay = slot - now
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def throttled(self, retry_after: float = 0.0) -> None:
+        self.throttled_count += 1
+        self.rate = max(self.min_rate, self.rate / 2)
+        now = time.monotonic()
+        self._paused_until = max(self._paused_until, now + retry_after)
+        # Không cho dồn cả burst ngay khi hết thời gian chờ
+        self._tat = max(self._tat, self._paused_until + (self.burst - 1) * self.interval)
+
+    def succeeded(self) -> None:
+        if self.rate < self.max_rate:
+            self.rate = min(self.max_rate, self.rate + self.max_rate / 20)
+
+    def snapshot(self) -> dict:
+        return {
+            "rate_per_second": round(self.rate, 3),
+            "max_rate_per_second": self.max_rate,
+            "throttled": self.throttled_count,
+            "paused_for_seconds": round(max(0.0, self._paused_until - time.monotonic()), 3),
+        }
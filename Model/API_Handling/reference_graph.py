@@ -0,0 +1,330 @@
+# reference_graph.py
+# Suy luận trên đồ thị lân cận tham chiếu thay cho edge_index rỗng.
+# Mô hình được huấn luyện trên đồ thị kNN cosine (build_fraud_aware_graph trong ethereum_retrain.py:
+# mỗi nút nối hai chiều với 2 láng giềng gần nhất có độ tương đồng > 0.6), nhưng lúc phục vụ mỗi ví
+# là một nút cô lập nên GCNConv không tổng hợp gì từ láng giềng.
+#
+# File reference_graph.npz (cạnh các artifact của mô hình) giữ các vector đặc trưng đã tiền xử lý của
+# tập train, nhãn và đúng đồ thị kNN lúc huấn luyện (dạng CSR). Khi dự đoán, ví mới được nối với
+# k nút tham chiếu gần nhất (tìm bằng chỉ mục ANN) và GCN 2 lớp chạy trên đồ thị con cần thiết:
+# ví mới, các láng giềng của nó và láng giềng của chúng (bậc của mọi nút tính như trên cả đồ thị).
+# Phép tính dùng trọng số gấp của fused_inference (NumPy, không cần torch), kết quả được trả về
+# cạnh dự đoán không cạnh hiện tại.
+#
+# Chỉ mục: FAISS HNSW (reference_index.faiss) nếu cài faiss, ngược lại tìm chính xác bằng NumPy
+# (một phép nhân ma trận ~7k x 47, dưới 1 ms).
+#
+# Dựng (cần scikit-learn; --verify cần torch + torch_geometric để so với ImprovedFraudGNN trên cả đồ thị):
+#   cd Model/API_Handling && python reference_graph.py build --verify
+# Cấu hình lúc chạy: REFERENCE_GRAPH=auto|off, REFERENCE_INDEX_BACKEND=auto|faiss|exact
+
+import argparse
+import logging
+import os
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from fused_inference import FusedFraudModel, FUSED_FILENAME, WEIGHTS_FILENAME
+from preprocessing_plan import PIPELINE_FILENAME, file_sha256
+
+REFERENCE_FORMAT = "fraud-reference-graph"
+REFERENCE_VERSION = 1
+REFERENCE_FILENAME = 'reference_graph.npz'
+FAISS_FILENAME = 'reference_index.faiss'
+DATASET_PATH = os.path.join('..', 'Dataset', 'transaction_dataset.csv')
+
+REFERENCE_GRAPH = os.getenv("REFERENCE_GRAPH", "auto")
+REFERENCE_INDEX_BACKEND = os.getenv("REFERENCE_INDEX_BACKEND", "auto")
+# Giống build_fraud_aware_graph: 2 láng giềng (NearestNeighbors(n_neighbors=3) trừ chính nút), ngưỡng 0.6
+NEIGHBORS = 2
+MIN_SIMILARITY = 0.6
+HNSW_M = 32
+HNSW_EF_SEARCH = 64
+
+
+def _normalize(x: np.ndarray) -> np.ndarray:
+    """Chuẩn hoá L2 từng dòng; dòng toàn 0 giữ nguyên (độ tương đồng cosine 0 như sklearn)."""
+    x = np.asarray(x, dtype=np.float32)
+    norms = np.linalg.norm(x, axis=1, keepdims=True)
+    return x / np.where(norms > 0, norms, 1)
+
+
+class ExactIndex:
+    """Tìm k láng giềng cosine chính xác bằng một phép nhân ma trận."""
+
+    name = "exact"
+
+    def __init__(self, normed: np.ndarray):
+        self.normed = normed
+
+    def search(self, queries: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        sims = queries @ self.normed.T
+        top = np.argpartition(-sims, k - 1, axis=1)[:, :k]
+        top_sims = np.take_along_axis(sims, top, axis=1)
+        order = np.argsort(-top_sims, axis=1, kind='stable')
+        return np.take_along_axis(top_sims, order, axis=1), np.take_along_axis(top, order, axis=1)
+
+
+class FaissIndex:
+    """HNSW của FAISS trên vector đã chuẩn hoá (tích vô hướng = cosine); gần đúng."""
+
+    name = "faiss-hnsw"
+
+    def __init__(self, index):
+        self.index = index
+        self.index.hnsw.efSearch = HNSW_EF_SEARCH
+
+    @classmethod
+    def build(cls, normed: np.ndarray) -> 'FaissIndex':
+        import faiss
+        index = faiss.IndexHNSWFlat(normed.shape[1], HNSW_M, faiss.METRIC_INNER_PRODUCT)
+        index.add(np.ascontiguousarray(normed))
+        return cls(index)
+
+    @classmethod
+    def load(cls, path: str) -> 'FaissIndex':
+        import faiss
+        return cls(faiss.read_index(path))
+
+    def save(self, path: str) -> None:
+        import faiss
+        faiss.write_index(self.index, path)
+
+    def search(self, queries: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        return self.index.search(np.ascontiguousarray(queries), k)
+
+
+class ReferenceGraph:
+    """
+    Đồ thị kNN của tập train. `indptr`/`indices` là CSR theo nút đích: indices[indptr[v]:indptr[v+1]]
+    là các nút gửi thông điệp tới v (có lặp nếu cạnh bị thêm hai lần như trong build_fraud_aware_graph,
+    không có self-loop vì GCNConv thay mọi self-loop bằng đúng một vòng mỗi nút).
+    """
+
+    def __init__(self, features: np.ndarray, labels: np.ndarray, indptr: np.ndarray, indices: np.ndarray,
+                 source: Dict[str, str]):
+        self.features = np.ascontiguousarray(features, dtype=np.float32)
+        self.labels = np.asarray(labels, dtype=np.int8)
+        self.indptr = np.asarray(indptr, dtype=np.int64)
+        self.indices = np.asarray(indices, dtype=np.int32)
+        self.source = source
+        self.degree = (np.diff(self.indptr) + 1).astype(np.float32)   # +1 cho self-loop
+        self.model: Optional[FusedFraudModel] = None
+        self.index = None
+
+    @classmethod
+    def load(cls, path: str) -> 'ReferenceGraph':
+        with np.load(path, allow_pickle=False) as data:
+            if str(data['format']) != REFERENCE_FORMAT or int(data['version']) != REFERENCE_VERSION:
+                raise ValueError(f"{path} không phải đồ thị tham chiếu phiên bản {REFERENCE_VERSION}")
+            source = {key: str(data[key]) for key in ('weights_sha256', 'pipeline_sha256', 'dataset_sha256')}
+            return cls(data['features'], data['labels'], data['indptr'], data['indices'], source)
+
+    def save(self, path: str) -> None:
+        np.savez_compressed(path, format=REFERENCE_FORMAT, version=REFERENCE_VERSION,
+                            features=self.features, labels=self.labels, indptr=self.indptr, indices=self.indices,
+                            **self.source)
+
+    def attach(self, model: FusedFraudModel, index=None) -> 'ReferenceGraph':
+        """Gắn trọng số mô hình và chỉ mục ANN; tính sẵn X @ W1 của mọi nút tham chiếu."""
+        self.model = model
+        self._xw1 = self.features @ model.layers[0][0]
+        self.index = index if index is not None else ExactIndex(_normalize(self.features))
+        return self
+
+    def neighbors(self, x_proc: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """(độ tương đồng, chỉ số) của NEIGHBORS nút tham chiếu gần nhất cho từng dòng."""
+        return self.index.search(_normalize(x_proc), NEIGHBORS)
+
+    def _propagate(self, x: np.ndarray, neighbors: np.ndarray) -> np.ndarray:
+        """Logits của một ví mới nối hai chiều với `neighbors`, GCN 2 lớp trên đồ thị con 2 bước."""
+        (w1, b1), (w2, b2), (w3, b3) = self.model.layers
+        xw_q = x @ w1
+        deg_q = np.float32(1 + len(neighbors))
+        z1_q = xw_q / deg_q + b1
+        z2_q = np.zeros_like(b2)
+        for r in neighbors:
+            deg_r = self.degree[r] + 1   # thêm cạnh tới ví mới
+            sources = self.indices[self.indptr[r]:self.indptr[r + 1]]
+            deg_sources = self.degree[sources] + np.isin(sources, neighbors)
+            z1_r = (self._xw1[r] / deg_r + (self._xw1[sources] / np.sqrt(deg_r * deg_sources)[:, None]).sum(axis=0)
+                    + xw_q / np.sqrt(deg_r * deg_q) + b1)
+            z1_q += self._xw1[r] / np.sqrt(deg_q * deg_r)
+            z2_q += (np.maximum(z1_r, 0) @ w2) / np.sqrt(deg_q * deg_r)
+        z2_q += (np.maximum(z1_q, 0) @ w2) / deg_q + b2
+        return np.maximum(z2_q, 0) @ w3 + b3
+
+    def predict_proba(self, x_proc: np.ndarray) -> Tuple[np.ndarray, List[np.ndarray], List[np.ndarray], List[float]]:
+        """Xác suất (n, 2) trên đồ thị lân cận, kèm nút tham chiếu đã nối, độ tương đồng và thời gian (ms) của từng ví."""
+        x_proc = np.asarray(x_proc, dtype=np.float32)
+        start = time.perf_counter()
+        sims, idx = self.neighbors(x_proc)
+        search_ms = (time.perf_counter() - start) * 1000 / max(len(x_proc), 1)
+        probs = np.empty((len(x_proc), 2), dtype=np.float32)
+        neighbors, similarities, elapsed_ms = [], [], []
+        for i, (x, row_sims, row_idx) in enumerate(zip(x_proc, sims, idx)):
+            start = time.perf_counter()
+            keep = (row_sims > MIN_SIMILARITY) & (row_idx >= 0)
+            logits = self._propagate(x, row_idx[keep])
+            logits = np.exp(logits - logits.max())
+            probs[i] = logits / logits.sum()
+            neighbors.append(row_idx[keep])
+            similarities.append(row_sims[keep])
+            elapsed_ms.append(search_ms + (time.perf_counter() - start) * 1000)
+        return probs, neighbors, similarities, elapsed_ms
+
+    def predict(self, x_proc: np.ndarray) -> List[Dict[str, Any]]:
+        """Dự đoán từng ví trên đồ thị lân cận; mỗi phần tử gồm nhãn, độ tin cậy và các nút tham chiếu đã nối."""
+        probs, neighbors, similarities, elapsed_ms = self.predict_proba(x_proc)
+        results = []
+        for row, row_neighbors, row_sims, ms in zip(probs, neighbors, similarities, elapsed_ms):
+            pred_index = int(row.argmax())
+            confidence = float(row[pred_index])
+            results.append({
+                "status": "fraud" if pred_index == 1 else "non-fraud",
+                "confidence_score": round(confidence, 4),
+                "percent": round(confidence * 100, 2),
+                "neighbors": [{"reference": int(r), "similarity": round(float(s), 4),
+                               "label": "fraud" if self.labels[r] == 1 else "non-fraud"}
+                              for r, s in zip(row_neighbors, row_sims)],
+                "index": self.index.name,
+                "lookup_ms": round(ms, 3),
+            })
+        return results
+
+
+def load_reference_graph(artifacts_dir: str) -> Optional[ReferenceGraph]:
+    """Đồ thị tham chiếu sẵn sàng dự đoán, hoặc None nếu tắt, chưa dựng hoặc dựng từ artifact khác."""
+    path = os.path.join(artifacts_dir, REFERENCE_FILENAME)
+    fused_path = os.path.join(artifacts_dir, FUSED_FILENAME)
+    if REFERENCE_GRAPH == "off" or not os.path.exists(path) or not os.path.exists(fused_path):
+        return None
+    graph = ReferenceGraph.load(path)
+    fused = FusedFraudModel.load(fused_path)
+    weights_sha = file_sha256(os.path.join(artifacts_dir, WEIGHTS_FILENAME))
+    if graph.source['weights_sha256'] != weights_sha or fused.source_sha256 != weights_sha or \
+            graph.source['pipeline_sha256'] != file_sha256(os.path.join(artifacts_dir, PIPELINE_FILENAME)):
+        logging.warning(f"{REFERENCE_FILENAME} hoặc {FUSED_FILENAME} được dựng từ artifact khác, tắt dự đoán lân cận. "
+                        f"Chạy lại: python reference_graph.py build --verify")
+        return None
+    index = None
+    faiss_path = os.path.join(artifacts_dir, FAISS_FILENAME)
+    if REFERENCE_INDEX_BACKEND in ("auto", "faiss") and os.path.exists(faiss_path):
+        try:
+            index = FaissIndex.load(faiss_path)
+        except ImportError:
+            if REFERENCE_INDEX_BACKEND == "faiss":
+                raise
+    return graph.attach(fused, index)
+
+
+# --- Dựng ---
+def load_train_split(csv_path: str, random_state: int = 42):
+    """Tập train giống ethereum_retrain.train_val_test_split(train 0.7, val 0.2, test 0.1)."""
+    import pandas as pd
+    from sklearn.model_selection import train_test_split
+    df = pd.read_csv(csv_path, index_col=0)
+    df.columns = df.columns.str.strip()
+    train_val_df, _ = train_test_split(df, test_size=0.1, random_state=random_state)
+    train_df, _ = train_test_split(train_val_df, test_size=0.2 / 0.9, random_state=random_state)
+    return train_df.drop(columns='FLAG'), train_df['FLAG'].to_numpy()
+
+
+def knn_edges(x: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Cạnh (nguồn, đích) đúng như vòng lặp của build_fraud_aware_graph, kể cả cạnh lặp."""
+    from sklearn.neighbors import NearestNeighbors
+    distances, indices = NearestNeighbors(n_neighbors=NEIGHBORS + 1, metric='cosine').fit(x).kneighbors(x)
+    src = np.repeat(np.arange(len(x)), NEIGHBORS)
+    dst = indices[:, 1:].ravel()
+    keep = (1 - distances[:, 1:].ravel()) > MIN_SIMILARITY
+    src, dst = src[keep], dst[keep]
+    # mỗi cặp thêm i->j rồi j->i
+    return np.stack([src, dst], axis=1).ravel(), np.stack([dst, src], axis=1).ravel()
+
+
+def build_reference_graph(artifacts_dir: str, csv_path: str) -> ReferenceGraph:
+    from preprocessing_plan import PreprocessingPlan, PLAN_FILENAME
+    plan = PreprocessingPlan.load(os.path.join(artifacts_dir, PLAN_FILENAME))
+    frame, labels = load_train_split(csv_path)
+    x = plan.transform(frame)
+    src, dst = knn_edges(x)
+    loops = src == dst
+    src, dst = src[~loops], dst[~loops]
+    order = np.argsort(dst, kind='stable')
+    indptr = np.concatenate([[0], np.cumsum(np.bincount(dst, minlength=len(x)))])
+    source = {"weights_sha256": file_sha256(os.path.join(artifacts_dir, WEIGHTS_FILENAME)),
+              "pipeline_sha256": plan.source_sha256 or '', "dataset_sha256": file_sha256(csv_path)}
+    return ReferenceGraph(x, labels, indptr, src[order], source)
+
+
+def verify(graph: ReferenceGraph, artifacts_dir: str, queries: np.ndarray) -> float:
+    """
+    So xác suất với ImprovedFraudGNN chạy trên toàn bộ đồ thị train cộng thêm từng ví truy vấn
+    (mỗi lần một ví); trả về sai khác lớn nhất.
+    """
+    import torch
+    from gnn_model import load_torch_model
+    model = load_torch_model(os.path.join(artifacts_dir, WEIGHTS_FILENAME), graph.features.shape[1])
+    n = len(graph.features)
+    dst = np.repeat(np.arange(n), np.diff(graph.indptr))
+    base_edges = np.stack([graph.indices.astype(np.int64), dst])
+    probs, neighbors, _, _ = graph.predict_proba(queries)
+    worst = 0.0
+    for x, row, row_neighbors in zip(queries, probs, neighbors):
+        q = np.full(len(row_neighbors), n, dtype=np.int64)
+        row_neighbors = row_neighbors.astype(np.int64)
+        edges = np.concatenate([base_edges, np.stack([q, row_neighbors]), np.stack([row_neighbors, q])], axis=1)
+        with torch.no_grad():
+            out = model(torch.from_numpy(np.vstack([graph.features, x[None]])), torch.from_numpy(edges))
+            expected = torch.softmax(out[n], dim=0).numpy()
+        if expected.argmax() != row.argmax():
+            raise AssertionError("Nhãn dự đoán trên đồ thị con lệch với mô hình torch trên cả đồ thị")
+        worst = max(worst, float(np.max(np.abs(expected - row))))
+    return worst
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Dựng đồ thị tham chiếu (kNN của tập train) cho dự đoán lân cận")
+    sub = parser.add_subparsers(dest="command", required=True)
+    build = sub.add_parser("build")
+    build.add_argument("--artifacts", default='../Model/')
+    build.add_argument("--csv", default=DATASET_PATH)
+    build.add_argument("--verify", action="store_true",
+                       help="so với ImprovedFraudGNN trên cả đồ thị và đo độ trễ tra cứu")
+    args = parser.parse_args()
+
+    graph = build_reference_graph(args.artifacts, args.csv)
+    fused = FusedFraudModel.load(os.path.join(args.artifacts, FUSED_FILENAME))
+    if fused.source_sha256 != graph.source["weights_sha256"]:
+        raise SystemExit(f"{FUSED_FILENAME} cũ hơn {WEIGHTS_FILENAME}. Chạy trước: python fused_inference.py export --verify")
+    index = None
+    try:
+        index = FaissIndex.build(_normalize(graph.features))
+    except ImportError:
+        print("faiss chưa được cài: dùng tìm kiếm chính xác bằng NumPy")
+    graph.attach(fused, index)
+
+    if args.verify:
+        from preprocessing_plan import PreprocessingPlan, PLAN_FILENAME
+        from quantize_model import load_test_split
+        frame, _ = load_test_split(args.csv)
+        queries = PreprocessingPlan.load(os.path.join(args.artifacts, PLAN_FILENAME)).transform(frame).astype(np.float32)
+        worst = verify(graph, args.artifacts, queries[:200])
+        print(f"Sai khác xác suất lớn nhất so với torch trên cả đồ thị (200 ví test): {worst:.3g}")
+        if worst > 1e-5:
+            raise SystemExit("Dự đoán trên đồ thị con lệch với mô hình torch, không ghi file.")
+        latencies = [graph.predict_proba(queries[i:i + 1])[3][0] for i in range(len(queries))]
+        print(f"Độ trễ tra cứu + GCN một ví ({graph.index.name}): p50 {np.percentile(latencies, 50):.3f} ms, "
+              f"p99 {np.percentile(latencies, 99):.3f} ms")
+
+    out = os.path.join(args.artifacts, REFERENCE_FILENAME)
+    graph.save(out)
+    if isinstance(graph.index, FaissIndex):
+        graph.index.save(os.path.join(args.artifacts, FAISS_FILENAME))
+    print(f"Đã ghi đồ thị tham chiếu ({len(graph.features)} nút, {len(graph.indices)} cạnh) vào {out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+# singleflight.py
+# Gộp các lời gọi đồng thời cho cùng một khoá: người gọi đầu tiên chạy công việc,
+# những người đến sau trong lúc nó đang chạy chỉ chờ chung một future.
+# Kết quả thành công được giữ lại thêm `memo_ttl_seconds` giây để các request
+# đến ngay sau đó (ví dụ /analyze rồi /explain cho cùng một ví) không gọi lại Covalent.
+
+import asyncio
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, asdict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+
+@dataclass
+class SingleFlightStats:
+    calls: int = 0          # tổng số lời gọi run()
+    executions: int = 0     # số lần công việc thực sự được chạy
+    coalesced: int = 0      # số lời gọi chờ chung một lần chạy đang diễn ra
+    memo_hits: int = 0      # số lời gọi được trả lời từ memo
+
+
+class SingleFlight:
+    def __init__(self, memo_ttl_seconds: float, memo_max_entries: int = 1024,
+                 should_memoize: Optional[Callable[[Any], bool]] = None):
+        self.memo_ttl_seconds = memo_ttl_seconds
+        self.memo_max_entries = memo_max_entries
+        self.should_memoize = should_memoize or (lambda result: True)
+        self.stats = SingleFlightStats()
+        self._in_flight: Dict[str, asyncio.Task] = {}
+        self._memo: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+
+    async def run(self, key: str, work: Callable[[], Awaitable[Any]], use_memo: bool = True) -> Any:
+        """use_memo=False: bỏ qua kết quả đã memo (vẫn chờ chung lần chạy đang diễn ra và memo kết quả mới)."""
+        self.stats.calls += 1
+
+        memo = self._memo.get(key)
+        if memo is not None:
+            if use_memo and time.monotonic() - memo[0] <= self.memo_ttl_seconds:
+                self.stats.memo_hits += 1
+                return memo[1]
+            del self._memo[key]
+
+        task = self._in_flight.get(key)
+        if task is None:
+            self.stats.executions += 1
+            task = asyncio.create_task(work())
+            self._in_flight[key] = task
+            task.add_done_callback(lambda t: self._finish(key, t))
+        else:
+            self.stats.coalesced += 1
+        # shield: một người gọi bị huỷ không được huỷ công việc mà người khác đang chờ
+        return await asyncio.shield(task)
+
+    def _finish(self, key: str, task: asyncio.Task) -> None:
+        self._in_flight.pop(key, None)
+        if task.cancelled() or task.exception() is not None:
+            return
+        result = task.result()
+        if self.memo_ttl_seconds > 0 and self.should_memoize(result):
+            self._memo[key] = (time.monotonic(), result)
+            self._memo.move_to_end(key)
+            while len(self._memo) > self.memo_max_entries:
+                self._memo.popitem(last=False)
+
+    def summary(self) -> Dict[str, Any]:
+        return {**asdict(self.stats), "in_flight": len(self._in_flight), "memo_entries": len(self._memo),
+                "memo_ttl_seconds": self.memo_ttl_seconds}
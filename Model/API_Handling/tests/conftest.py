@@ -0,0 +1,84 @@
+# tests/conftest.py
+# Các module của API_Handling import phẳng (import model, from feature_schema import ...) và đọc artifact theo
+# đường dẫn tương đối '../Model/', nên test chạy với Model/API_Handling là thư mục làm việc.
+#
+# Chạy: cd Model/API_Handling && python -m pytest -q tests
+
+import os
+import sys
+import warnings
+
+API_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BENCH_DIR = os.path.join(API_DIR, '..', 'benchmarks')
+
+sys.path.insert(0, API_DIR)
+sys.path.insert(0, BENCH_DIR)   # synthetic_workload: ví giả lập
+os.chdir(API_DIR)
+os.environ.setdefault("MODEL_REGISTRY_POLL_SECONDS", "0")
+os.environ.setdefault("TX_CACHE_ENABLED", "0")
+warnings.filterwarnings("ignore", category=DeprecationWarning)
+
+import httpx  # noqa: E402
+import pytest  # noqa: E402
+
+from synthetic_workload import WorkloadGenerator  # noqa: E402
+
+
+class FakeCovalent:
+    """
+    Covalent giả qua httpx.MockTransport: transactions_v3 và balances_v2 của các ví giả lập.
+    faults[số trang]: các response (hoặc ngoại lệ httpx) trả về lần lượt trước khi trang đó thành công.
+    """
+
+    def __init__(self):
+        self.generator = WorkloadGenerator(seed=11)
+        self.profiles = {}
+        self.faults = {}
+        self.served = []            # số trang transactions_v3 đã trả thành công, theo thứ tự
+        self.requests = 0
+
+    def wallet(self, label: str, n_transactions: int):
+        address = self.generator.wallet_address(label)
+        profile = self.generator.profile(n_transactions)
+        self.profiles[address.lower()] = profile
+        return address, profile
+
+    def handle(self, request: httpx.Request) -> httpx.Response:
+        self.requests += 1
+        parts = request.url.path.strip('/').split('/')
+        address = parts[parts.index('address') + 1].lower()
+        if 'balances_v2' in parts:
+            return httpx.Response(200, json=self.generator.covalent_balances(address))
+        page = int(request.url.params.get('page-number', 0))
+        if self.faults.get(page):
+            fault = self.faults[page].pop(0)
+            if isinstance(fault, Exception):
+                raise fault
+            return fault
+        self.served.append(page)
+        return httpx.Response(200, json=self.generator.covalent_page(address, self.profiles[address], page))
+
+    def client(self) -> httpx.AsyncClient:
+        return httpx.AsyncClient(transport=httpx.MockTransport(self.handle))
+
+
+@pytest.fixture
+def covalent():
+    return FakeCovalent()
+
+
+@pytest.fixture
+def fast_fetch(monkeypatch):
+    """feature_engineering_api với bộ giới hạn tốc độ, bộ lập lịch và bộ đếm thử lại riêng, chờ thử lại ~0."""
+    import feature_engineering_api
+    from fetch_scheduler import FetchScheduler
+    from rate_limiter import AdaptiveRateLimiter
+
+    limiter = AdaptiveRateLimiter(1000, burst=100)
+    monkeypatch.setattr(feature_engineering_api, "COVALENT_API_KEY", "test")
+    monkeypatch.setattr(feature_engineering_api, "COVALENT_RATE_LIMITER", limiter)
+    monkeypatch.setattr(feature_engineering_api, "FETCH_SCHEDULER",
+                        FetchScheduler(limiter, feature_engineering_api.COVALENT_MAX_IN_FLIGHT))
+    monkeypatch.setattr(feature_engineering_api, "FETCH_RETRY_STATS", feature_engineering_api.FetchRetryStats())
+    monkeypatch.setattr(feature_engineering_api, "COVALENT_RETRY_BASE_SECONDS", 0.001)
+    return feature_engineering_api
@@ -0,0 +1,45 @@
+# tests/test_app.py
+# /analyze?explain=true: dự đoán lấy từ cache dự đoán (phiên bản cũ) và giải thích tính bằng phiên bản
+# đang phục vụ phải giữ model_version của riêng mình.
+
+import asyncio
+
+from starlette.datastructures import Headers
+from starlette.responses import Response
+
+import app
+from feature_engineering_api import WalletAnalysisResult
+from feature_schema import FeatureVector, default_schema
+from prediction_cache import CachedPrediction
+
+ADDRESS = '0x' + 'ef' * 20
+
+
+class FakeRequest:
+    headers = Headers({})
+
+
+class FakeExplainBatcher:
+    async def submit(self, vector):
+        return {"top_features": [], "model_version": "v2"}
+
+
+def test_explanation_keeps_its_own_model_version(monkeypatch):
+    entry = CachedPrediction(ADDRESS, "v1", 7, {"prediction": ["fraud", 0.8, 80.0], "partial": False}, 0.0, 0.0)
+
+    async def cached(address, request, client, model_version=None):
+        return entry, "hit"
+
+    async def no_neighborhood(result):
+        return None
+
+    monkeypatch.setattr(app, "cached_prediction", cached)
+    monkeypatch.setattr(app, "cached_result",
+                        lambda address, entry: WalletAnalysisResult(address, vector=FeatureVector(default_schema())))
+    monkeypatch.setattr(app, "neighborhood_prediction", no_neighborhood)
+    monkeypatch.setattr(app, "EXPLAIN_BATCHER", FakeExplainBatcher())
+
+    body = asyncio.run(app.analyze(app.AddressRequest(address=ADDRESS), FakeRequest(), Response(), explain=True,
+                                   client=None))
+    assert body["status"] == "fraud" and body["model_version"] == "v1"
+    assert body["explanation"] == {"top_features": [], "model_version": "v2"}
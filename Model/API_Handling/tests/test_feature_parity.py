@@ -0,0 +1,92 @@
+# tests/test_feature_parity.py
+# Engine dạng cột (columnar_features.py + feature_state.py) phải cho cùng đặc trưng với cài đặt gốc
+# calculate_all_features_reference trên các ví giả lập (synthetic_workload), kể cả khi nạp theo từng trang,
+# ghép giao dịch mới vào đầu (prepend) và sau khi lưu/khôi phục trạng thái (to_dict/from_dict).
+# FeatureVector (calculate_feature_vector) phải giữ đúng các giá trị đó theo thứ tự cột của mô hình.
+
+import json
+import math
+
+import pytest
+
+from feature_engineering_api import calculate_all_features, calculate_all_features_reference, calculate_feature_vector
+from feature_state import FeatureState
+from synthetic_workload import WorkloadGenerator
+
+GENERATOR = WorkloadGenerator(seed=7)
+SIZES = [1, 2, 37, 1500]
+PAGE_SIZE = 100
+
+
+def wallet(n_transactions: int, drop_symbols: bool = False):
+    """(địa chỉ, giao dịch mới nhất trước, số dư); drop_symbols: một phần log không có ticker (None)."""
+    address = GENERATOR.wallet_address("parity", n_transactions)
+    items = list(GENERATOR.covalent_transactions(address, GENERATOR.profile(n_transactions), PAGE_SIZE))
+    if drop_symbols:
+        for i, tx in enumerate(items):
+            for j, log in enumerate(tx["log_events"]):
+                if (i + j) % 3 == 0:
+                    log["sender_contract_ticker_symbol"] = None
+    return address, items, GENERATOR.covalent_balances(address)["data"]
+
+
+def assert_same_features(actual, expected):
+    assert list(actual) == list(expected)
+    for name, value in expected.items():
+        if isinstance(value, float) and not isinstance(actual[name], str):
+            assert actual[name] == pytest.approx(value, rel=1e-9, abs=1e-9) or (
+                math.isnan(value) and math.isnan(actual[name])), name
+        else:
+            assert actual[name] == value, name
+
+
+@pytest.mark.parametrize("drop_symbols", [False, True])
+@pytest.mark.parametrize("n_transactions", SIZES)
+def test_columnar_matches_reference(n_transactions, drop_symbols):
+    address, items, balance = wallet(n_transactions, drop_symbols)
+    assert_same_features(calculate_all_features(address, items, balance),
+                         calculate_all_features_reference(address, items, balance))
+
+
+def test_empty_history_matches_reference():
+    address, _, balance = wallet(1)
+    assert_same_features(calculate_all_features(address, [], balance),
+                         calculate_all_features_reference(address, [], balance))
+
+
+@pytest.mark.parametrize("drop_symbols", [False, True])
+@pytest.mark.parametrize("n_transactions", SIZES)
+def test_streaming_pages_match_reference(n_transactions, drop_symbols):
+    """Nạp lần lượt từng trang (mới nhất trước) như stream_feature_state."""
+    address, items, balance = wallet(n_transactions, drop_symbols)
+    state = FeatureState(address)
+    for start in range(0, len(items), PAGE_SIZE):
+        state.update(items[start:start + PAGE_SIZE], prepend=False)
+    assert_same_features(state.to_features(balance), calculate_all_features_reference(address, items, balance))
+
+
+@pytest.mark.parametrize("drop_symbols", [False, True])
+@pytest.mark.parametrize("n_transactions", [2, 37, 1500])
+def test_prepend_after_round_trip_matches_reference(n_transactions, drop_symbols):
+    """Trạng thái của phần cũ được lưu (JSON như tx_cache) rồi khôi phục, sau đó ghép giao dịch mới vào đầu."""
+    address, items, balance = wallet(n_transactions, drop_symbols)
+    split = max(1, len(items) // 3)
+    newer, older = items[:split], items[split:]
+
+    saved = json.loads(json.dumps(FeatureState.from_transactions(address, older).to_dict()))
+    restored = FeatureState.from_dict(saved)
+    assert restored.to_dict() == saved
+    assert_same_features(restored.to_features(balance), calculate_all_features_reference(address, older, balance))
+
+    restored.update(newer, prepend=True)
+    assert restored.highest_block == max(tx["block_height"] for tx in items)
+    assert_same_features(restored.to_features(balance), calculate_all_features_reference(address, items, balance))
+
+
+@pytest.mark.parametrize("drop_symbols", [False, True])
+def test_feature_vector_matches_feature_dict(drop_symbols):
+    """FeatureVector ghi theo chỉ số cố định phải giữ đúng giá trị của dict đặc trưng cho mọi cột của mô hình."""
+    address, items, balance = wallet(1500, drop_symbols)
+    vector = calculate_feature_vector(address, items, balance)
+    features = calculate_all_features(address, items, balance)
+    assert_same_features(vector.to_dict(), {name: features[name] for name in vector.schema.columns})
@@ -0,0 +1,82 @@
+# tests/test_fetch_scheduler.py
+# FetchScheduler: giới hạn số request đang bay và chia chỗ trống theo vòng tròn giữa các ví,
+# nên request của một ví nhỏ không phải chờ sau mọi trang của một ví lớn.
+
+import asyncio
+
+from fetch_scheduler import FetchScheduler
+from rate_limiter import AdaptiveRateLimiter
+
+
+def scheduler(max_in_flight: int) -> FetchScheduler:
+    return FetchScheduler(AdaptiveRateLimiter(1000, burst=100), max_in_flight)
+
+
+def test_free_slots_go_round_robin_between_wallets():
+    fetches = scheduler(max_in_flight=1)
+    order = []
+
+    async def request(key: str, hold: asyncio.Event = None):
+        async with fetches.slot(key):
+            order.append(key)
+            if hold is not None:
+                await hold.wait()
+
+    async def main():
+        hold = asyncio.Event()
+        first = asyncio.create_task(request("big", hold))
+        await asyncio.sleep(0)
+        waiting = [asyncio.create_task(request("big")) for _ in range(4)]
+        await asyncio.sleep(0)
+        waiting.append(asyncio.create_task(request("small")))
+        await asyncio.sleep(0)
+        assert fetches.snapshot() == {"active": 1, "queued": 5, "wallets_waiting": 2}
+        hold.set()
+        await asyncio.gather(first, *waiting)
+
+    asyncio.run(main())
+    assert order == ["big", "big", "small", "big", "big", "big"]
+    assert fetches.snapshot() == {"active": 0, "queued": 0, "wallets_waiting": 0}
+
+
+def test_max_in_flight_is_never_exceeded():
+    fetches = scheduler(max_in_flight=3)
+    active = peak = 0
+
+    async def request(key: str):
+        nonlocal active, peak
+        async with fetches.slot(key):
+            active += 1
+            peak = max(peak, active)
+            await asyncio.sleep(0.005)
+            active -= 1
+
+    async def main():
+        await asyncio.gather(*(request(f"0x{i % 4}") for i in range(20)))
+
+    asyncio.run(main())
+    assert peak == 3
+
+
+def test_cancelled_waiter_does_not_leak_a_slot():
+    fetches = scheduler(max_in_flight=1)
+
+    async def main():
+        hold = asyncio.Event()
+
+        async def holder():
+            async with fetches.slot("a"):
+                await hold.wait()
+
+        first = asyncio.create_task(holder())
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(fetches._acquire("b"))
+        await asyncio.sleep(0)
+        waiter.cancel()
+        hold.set()
+        await first
+        await asyncio.gather(waiter, return_exceptions=True)
+        async with fetches.slot("c"):
+            return fetches.snapshot()
+
+    assert asyncio.run(main()) == {"active": 1, "queued": 0, "wallets_waiting": 0}
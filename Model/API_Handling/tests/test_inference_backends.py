@@ -0,0 +1,122 @@
+# tests/test_inference_backends.py
+# Các backend chọn qua INFERENCE_BACKEND (fused NumPy, ONNX, ONNX int8) so với ImprovedFraudGNN của torch
+# (edge_index rỗng) trên cùng các dòng: ví giả lập qua pipeline đã lưu + các dòng chuẩn hoá ngẫu nhiên như
+# fused_inference.verify(). Bản int8 không thể sát 1e-5 (lượng tử hoá), nên chỉ kiểm tra nhãn và một ngưỡng
+# xác suất rộng hơn trên các ví giả lập; cổng chất lượng đầy đủ của nó nằm trong quantize_model.py.
+# Attribution của explain_addresses được so với gradient x input tính bằng autograd của torch.
+
+import logging
+
+import numpy as np
+import pytest
+
+import model
+from feature_engineering_api import calculate_feature_vector
+from fused_inference import FusedFraudModel
+from onnx_inference import OnnxFraudModel
+from synthetic_workload import WorkloadGenerator
+
+ARTIFACTS_DIR = '../Model/'
+MAX_ABS_DIFF = 1e-5
+INT8_MAX_ABS_DIFF = 0.1
+BACKENDS = {"fused": FusedFraudModel, "onnx": OnnxFraudModel, "onnx-int8": OnnxFraudModel}
+
+
+def load(backend: str):
+    previous, model.INFERENCE_BACKEND = model.INFERENCE_BACKEND, backend
+    try:
+        return model.load_artifacts(ARTIFACTS_DIR)
+    finally:
+        model.INFERENCE_BACKEND = previous
+
+
+@pytest.fixture(scope="module")
+def wallet_rows():
+    generator = WorkloadGenerator(seed=3)
+    rows = []
+    for i, n_transactions in enumerate([1, 2, 5, 40, 300, 1200] * 4):
+        address = generator.wallet_address("backend", i)
+        items = list(generator.covalent_transactions(address, generator.profile(n_transactions, fraud=i % 2 == 1)))
+        rows.append(calculate_feature_vector(address, items, generator.covalent_balances(address)["data"]))
+    return rows
+
+
+@pytest.fixture(scope="module")
+def fixture_matrix(wallet_rows):
+    """(ma trận đã tiền xử lý, số dòng đầu là ví giả lập)."""
+    _, pipeline, feat_names = load("torch")
+    x = np.asarray(model.preprocess(pipeline, wallet_rows, feat_names), dtype=np.float32)
+    rng = np.random.default_rng(0)
+    random_rows = rng.standard_normal((512, x.shape[1])).astype(np.float32)
+    random_rows[:64] *= 50
+    return np.vstack([x, random_rows]), len(wallet_rows)
+
+
+@pytest.fixture(scope="module")
+def torch_proba(fixture_matrix):
+    torch_model, _, _ = load("torch")
+    assert type(torch_model).__name__ == "ImprovedFraudGNN"
+    return model.predict_proba(torch_model, fixture_matrix[0])
+
+
+@pytest.mark.parametrize("backend", list(BACKENDS))
+def test_backend_matches_torch(backend, fixture_matrix, torch_proba):
+    backend_model, _, _ = load(backend)
+    assert isinstance(backend_model, BACKENDS[backend]), f"{backend} quay về {type(backend_model).__name__}"
+    x, n_wallets = fixture_matrix
+    proba = model.predict_proba(backend_model, x)
+    np.testing.assert_array_equal(proba.argmax(axis=1), torch_proba.argmax(axis=1))
+    if backend == "onnx-int8":
+        assert np.max(np.abs(proba[:n_wallets] - torch_proba[:n_wallets])) <= INT8_MAX_ABS_DIFF
+    else:
+        assert np.max(np.abs(proba - torch_proba)) <= MAX_ABS_DIFF
+
+
+@pytest.mark.parametrize("backend", ["torch", *BACKENDS])
+def test_batch_equals_row_by_row(backend, fixture_matrix, wallet_rows):
+    backend_model, pipeline, feat_names = load(backend)
+    x, _ = fixture_matrix
+    batch = model.predict_proba(backend_model, x)
+    rows = np.vstack([model.predict_proba(backend_model, x[i:i + 1]) for i in range(len(x))])
+    # BLAS chọn kernel khác cho 1 dòng và cho cả khối: chênh lệch chỉ ở mức làm tròn float32
+    np.testing.assert_allclose(batch, rows, rtol=0, atol=MAX_ABS_DIFF)
+    batch = model.predict_addresses(backend_model, pipeline, wallet_rows, feat_names)
+    rows = [model.predict_addresses(backend_model, pipeline, [row], feat_names)[0] for row in wallet_rows]
+    assert [status for status, _, _ in batch] == [status for status, _, _ in rows]
+    np.testing.assert_allclose([p for _, p, _ in batch], [p for _, p, _ in rows], rtol=0, atol=MAX_ABS_DIFF)
+
+
+def test_unknown_backend_raises(monkeypatch):
+    monkeypatch.setattr(model, "INFERENCE_BACKEND", "onnx_int8")
+    with pytest.raises(ValueError, match="onnx_int8"):
+        model.load_artifacts(ARTIFACTS_DIR)
+
+
+@pytest.mark.parametrize("backend", list(BACKENDS))
+def test_stale_artifact_falls_back_to_torch_with_warning(backend, monkeypatch, caplog):
+    # Checksum của .pth không còn khớp với checksum ghi trong bản gấp/ONNX
+    file_sha256 = model.file_sha256
+    monkeypatch.setattr(model, "file_sha256", lambda path: "stale" if path.endswith(".pth") else file_sha256(path))
+    with caplog.at_level(logging.WARNING):
+        backend_model, _, _ = load(backend)
+    assert type(backend_model).__name__ == "ImprovedFraudGNN"
+    assert any("dùng lại torch" in record.getMessage() for record in caplog.records
+               if record.levelno == logging.WARNING)
+
+
+@pytest.mark.parametrize("backend", ["torch", "fused", "onnx"])   # int8: trọng số đã lượng tử hoá, không so được
+def test_attributions_match_torch_autograd(backend, fixture_matrix, wallet_rows):
+    """explain_addresses (gradient x input của log-odds gian lận, tính bằng NumPy) so với autograd của torch."""
+    import torch
+    torch_model, _, _ = load("torch")
+    backend_model, pipeline, feat_names = load(backend)
+    x = torch.from_numpy(fixture_matrix[0][:len(wallet_rows)]).requires_grad_()
+    logits = torch_model(x, torch.empty((2, 0), dtype=torch.long))
+    (logits[:, 1] - logits[:, 0]).sum().backward()
+    expected = (x * x.grad).detach().numpy()
+    explanations = model.explain_addresses(backend_model, pipeline, wallet_rows, feat_names)
+    assert len(explanations) == len(wallet_rows)
+    for explanation, row in zip(explanations, expected):
+        values = explanation["attribution"]["values"]
+        # Giá trị được làm tròn 4 chữ số; các attribution lớn chỉ còn sai số tương đối float32
+        np.testing.assert_allclose([values[name] for name in feat_names], row, rtol=1e-5, atol=2e-4)
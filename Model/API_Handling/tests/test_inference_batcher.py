@@ -0,0 +1,94 @@
+# tests/test_inference_batcher.py
+# MicroBatcher: gom các submit() đồng thời thành một lần gọi predict_batch, dự đoán lại từng phần tử khi
+# lô lỗi, và không bao giờ để người gọi chờ mãi (lô trả thiếu kết quả, executor đã đóng, người gọi bị huỷ).
+
+import asyncio
+
+import pytest
+
+from inference_batcher import MicroBatcher
+
+
+def double_all(batch):
+    return [item * 2 for item in batch]
+
+
+def test_concurrent_submits_share_one_batch():
+    calls = []
+
+    def predict(batch):
+        calls.append(list(batch))
+        return double_all(batch)
+
+    batcher = MicroBatcher(predict, max_batch_size=64, max_wait_ms=20)
+
+    async def main():
+        return await asyncio.gather(*(batcher.submit(i) for i in range(10)))
+
+    assert asyncio.run(main()) == [i * 2 for i in range(10)]
+    assert calls == [list(range(10))]
+    assert batcher.stats.batches == 1 and batcher.stats.max_batch == 10
+
+
+def test_full_batch_flushes_without_waiting():
+    batcher = MicroBatcher(double_all, max_batch_size=4, max_wait_ms=60_000)
+
+    async def main():
+        return await asyncio.wait_for(asyncio.gather(*(batcher.submit(i) for i in range(8))), timeout=5)
+
+    assert asyncio.run(main()) == [i * 2 for i in range(8)]
+    assert batcher.stats.batches == 2
+
+
+def test_failing_item_falls_back_to_per_item_prediction():
+    def predict(batch):
+        if 3 in batch:
+            raise ValueError("hỏng")
+        return double_all(batch)
+
+    batcher = MicroBatcher(predict, max_wait_ms=20)
+
+    async def main():
+        return await asyncio.gather(*(batcher.submit(i) for i in range(5)), return_exceptions=True)
+
+    results = asyncio.run(main())
+    assert results[:3] == [0, 2, 4] and results[4] == 8
+    assert isinstance(results[3], ValueError)
+    assert batcher.stats.fallbacks == 1
+
+
+def test_short_result_fails_every_caller():
+    batcher = MicroBatcher(lambda batch: double_all(batch)[:-1], max_wait_ms=20)
+
+    async def main():
+        return await asyncio.wait_for(
+            asyncio.gather(*(batcher.submit(i) for i in range(3)), return_exceptions=True), timeout=5)
+
+    results = asyncio.run(main())
+    assert all(isinstance(result, ValueError) for result in results)
+
+
+def test_closed_executor_fails_callers_instead_of_hanging():
+    batcher = MicroBatcher(double_all, max_wait_ms=1)
+    batcher._executor.shutdown()
+
+    async def main():
+        return await asyncio.wait_for(batcher.submit(1), timeout=5)
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(main())
+
+
+def test_cancelled_caller_does_not_affect_the_rest_of_the_batch():
+    batcher = MicroBatcher(double_all, max_wait_ms=20)
+
+    async def main():
+        cancelled = asyncio.create_task(batcher.submit(1))
+        others = [asyncio.create_task(batcher.submit(i)) for i in (2, 3)]
+        await asyncio.sleep(0)
+        cancelled.cancel()
+        results = await asyncio.gather(*others)
+        return cancelled.cancelled(), results
+
+    assert asyncio.run(main()) == (True, [4, 6])
+    assert batcher.stats.batches == 1 and batcher.stats.max_batch == 3
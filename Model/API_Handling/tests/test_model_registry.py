@@ -0,0 +1,94 @@
+# tests/test_model_registry.py
+# ModelRegistry trên một registry tạm dựng bằng publish(): kiểm tra checksum theo manifest, đổi phiên bản
+# bằng một phép gán, giữ phiên bản cũ khi nạp lỗi, và watcher chỉ phản ứng khi CURRENT thay đổi.
+
+import asyncio
+import logging
+import os
+import tempfile
+
+import pytest
+
+import model_registry
+from model_registry import ModelRegistry, activate, publish, verify_checksums
+from preprocessing_plan import PIPELINE_FILENAME
+
+
+@pytest.fixture(scope="module")
+def registry_dir():
+    """Registry có v1 (đang phục vụ) và v2; test không được sửa các phiên bản này."""
+    path = tempfile.mkdtemp()
+    for version in ("v1", "v2"):
+        publish(model_registry.MODEL_ARTIFACTS_DIR, path, version)
+    activate(path, "v1")
+    return path
+
+
+def corrupted_copy(registry_dir: str, version: str, name: str) -> str:
+    target = publish(model_registry.MODEL_ARTIFACTS_DIR, registry_dir, version)
+    with open(os.path.join(target, name), 'ab') as f:
+        f.write(b'\0')
+    return target
+
+
+def test_verify_checksums_accepts_published_version(registry_dir):
+    checksums = verify_checksums(os.path.join(registry_dir, "v1"))
+    assert PIPELINE_FILENAME in checksums
+
+
+def test_verify_checksums_rejects_modified_or_missing_file(registry_dir):
+    modified = corrupted_copy(registry_dir, "modified", PIPELINE_FILENAME)
+    with pytest.raises(ValueError, match="checksum"):
+        verify_checksums(modified)
+    missing = publish(model_registry.MODEL_ARTIFACTS_DIR, registry_dir, "missing")
+    os.remove(os.path.join(missing, PIPELINE_FILENAME))
+    with pytest.raises(ValueError, match="thiếu file"):
+        verify_checksums(missing)
+
+
+def test_reload_swaps_bundle_and_keeps_old_one_usable(registry_dir):
+    registry = ModelRegistry(registry_dir)
+    old = registry.current
+    assert old.version == "v1"
+
+    result = asyncio.run(registry.reload("v2"))
+    assert result["changed"] and result["previous"] == "v1"
+    assert registry.current.version == "v2" and registry.current is not old
+    # Request đang chạy vẫn giữ bộ cũ nguyên vẹn
+    assert old.version == "v1" and old.model is not None
+    assert not asyncio.run(registry.reload("v2"))["changed"]
+
+
+def test_failed_load_keeps_current_bundle(registry_dir, caplog):
+    corrupted_copy(registry_dir, "broken", PIPELINE_FILENAME)
+    registry = ModelRegistry(registry_dir)
+    old = registry.current
+    with caplog.at_level(logging.WARNING), pytest.raises(ValueError):
+        asyncio.run(registry.reload("broken"))
+    assert registry.current is old and registry.reloads == 0
+    assert "checksum" in registry.last_error
+    assert any("Giữ phiên bản v1" in record.getMessage() for record in caplog.records)
+
+
+def test_watch_reacts_only_to_a_changed_current(registry_dir, monkeypatch):
+    registry = ModelRegistry(registry_dir)
+    reloads = []
+
+    async def fake_reload(version=None, force=False):
+        reloads.append(version)
+
+    monkeypatch.setattr(registry, "reload", fake_reload)
+
+    async def main():
+        watcher = asyncio.create_task(registry.watch(interval=0.01))
+        await asyncio.sleep(0.05)
+        assert reloads == []                    # CURRENT không đổi
+        activate(registry_dir, "v2")
+        await asyncio.sleep(0.05)
+        watcher.cancel()
+
+    try:
+        asyncio.run(main())
+    finally:
+        activate(registry_dir, "v1")
+    assert reloads == ["v2"]
@@ -0,0 +1,115 @@
+# tests/test_model_server.py
+# ModelClient qua Unix socket tới một ModelServer chạy trong luồng riêng, registry tạm có hai phiên bản;
+# /readyz và các endpoint cần mô hình trả 503 kèm Retry-After cho tới khi ServiceLoader nạp xong.
+
+import asyncio
+import os
+import tempfile
+import threading
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+from starlette.datastructures import Headers
+
+import app
+import model_registry
+from model_registry import LocalModelService, ModelRegistry
+from model_server import ModelClient, ModelServer, ServiceLoader
+from prediction_cache import PredictionCache
+
+ADDRESS = '0x' + 'ab' * 20
+
+
+class FakeRequest:
+    headers = Headers({})
+
+
+@pytest.fixture
+def model_server():
+    """Registry v1 (đang phục vụ) + v2, model server trên socket tạm; trả về đường dẫn socket."""
+    registry_dir = tempfile.mkdtemp()
+    for version in ("v1", "v2"):
+        model_registry.publish(model_registry.MODEL_ARTIFACTS_DIR, registry_dir, version)
+    model_registry.activate(registry_dir, "v1")
+    socket_path = os.path.join(tempfile.mkdtemp(), 'model.sock')
+
+    server = ModelServer(LocalModelService(ModelRegistry(registry_dir)))
+    loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    listener = asyncio.run_coroutine_threadsafe(
+        asyncio.start_unix_server(server.handle, path=socket_path), loop).result()
+    yield socket_path
+    asyncio.run_coroutine_threadsafe(server.close(), loop).result()
+    listener.close()
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join()
+
+
+def test_current_version_follows_reload_by_another_worker(model_server):
+    worker, other_worker = ModelClient(model_server), ModelClient(model_server)
+    assert worker.current_version() == "v1"
+    asyncio.run(other_worker.reload("v2"))
+    assert worker.version == "v1"               # chưa có câu trả lời mới nào về worker này
+    assert worker.current_version() == "v2"
+
+
+def test_prediction_cache_misses_after_server_reload(model_server, monkeypatch):
+    worker, other_worker = ModelClient(model_server), ModelClient(model_server)
+    loader = ServiceLoader(lambda: worker)
+    loader.load()
+    cache = PredictionCache(100, fresh_seconds=60, max_age_seconds=3600)
+    monkeypatch.setattr(app, "MODEL", loader)
+    monkeypatch.setattr(app, "PREDICTION_CACHE", cache)
+
+    async def scenario():
+        cache.put(ADDRESS, worker.current_version(), 100, {"prediction": ["non-fraud", 0.9, 90.0],
+                                                           "partial": False, "vector": {}})
+        first = await app.cached_prediction(ADDRESS, FakeRequest(), client=None)
+        await other_worker.reload("v2")
+        second = await app.cached_prediction(ADDRESS, FakeRequest(), client=None)
+        return first, second
+
+    (entry, status), (stale, stale_status) = asyncio.run(scenario())
+    assert status == "hit" and entry.model_version == "v1"
+    assert stale is None and stale_status == "miss"
+
+
+class FakeService:
+    version = "v-test"
+
+    def summary(self):
+        return {"current": {"version": self.version}}
+
+    async def watch(self):
+        return None
+
+
+def test_endpoints_return_503_until_model_is_loaded(monkeypatch):
+    import model_server
+    released = threading.Event()
+
+    def blocking_factory():
+        released.wait(10)
+        return FakeService()
+
+    monkeypatch.setattr(app.MODEL, "_factory", blocking_factory)
+    monkeypatch.setattr(app.MODEL, "_service", None)
+    monkeypatch.setattr(model_server, "ADMIN_TOKEN", "secret")
+    admin = {"X-Admin-Token": "secret"}
+
+    with TestClient(app.app) as client:
+        assert client.get("/healthz").status_code == 200
+        for response in (client.get("/readyz"), client.get("/admin/model", headers=admin),
+                         client.post("/analyze/batch", json={"addresses": [ADDRESS]})):
+            assert response.status_code == 503 and int(response.headers["Retry-After"]) >= 1
+
+        released.set()
+        deadline = time.monotonic() + 10
+        while client.get("/readyz").status_code != 200 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        ready = client.get("/readyz")
+        assert ready.status_code == 200 and ready.json()["version"] == "v-test"
+        response = client.get("/admin/model", headers=admin)
+        assert response.status_code == 200 and response.headers["X-Model-Version"] == "v-test"
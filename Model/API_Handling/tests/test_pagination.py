@@ -0,0 +1,84 @@
+# tests/test_pagination.py
+# paginate_concurrently: trả trang theo thứ tự dù trang về lộn xộn, giữ đúng số request đang bay,
+# dừng ở trang cuối (has_more=false hoặc lỗi) và huỷ các trang đã phát sau nó.
+
+import asyncio
+
+from pagination import paginate_concurrently
+
+
+class FakePages:
+    """fetch_page giả: trang `last` là trang cuối; trong lịch sử, trang sau về nhanh hơn trang trước."""
+
+    def __init__(self, last: int, failing: int = -1):
+        self.last = last
+        self.failing = failing
+        self.started = []
+        self.cancelled = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def __call__(self, page_number: int):
+        self.started.append(page_number)
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(0.02 / (page_number % 4 + 1) if page_number <= self.last else 0.2)
+        except asyncio.CancelledError:
+            self.cancelled.append(page_number)
+            raise
+        finally:
+            self.in_flight -= 1
+        if page_number == self.failing:
+            raise RuntimeError(f"trang {page_number} lỗi")
+        return [{"page": page_number}], page_number < self.last
+
+
+def collect(fetch_page, max_pages: int, max_in_flight: int):
+    async def main():
+        return [page async for page in paginate_concurrently(fetch_page, max_pages, max_in_flight)]
+    return asyncio.run(main())
+
+
+def test_pages_are_yielded_in_order_within_the_window():
+    pages = FakePages(last=9)
+    results = collect(pages, max_pages=50, max_in_flight=4)
+    assert [page.page_number for page in results] == list(range(10))
+    assert [page.items for page in results] == [[{"page": i}] for i in range(10)]
+    assert not results[-1].has_more and all(page.has_more for page in results[:-1])
+    assert pages.max_in_flight == 4
+
+
+def test_pages_after_the_last_page_are_cancelled():
+    pages = FakePages(last=2)
+    results = collect(pages, max_pages=50, max_in_flight=4)
+    assert [page.page_number for page in results] == [0, 1, 2]
+    assert 3 in pages.started and 3 in pages.cancelled
+
+
+def test_failed_page_ends_the_history():
+    pages = FakePages(last=9, failing=1)
+    results = collect(pages, max_pages=50, max_in_flight=3)
+    assert [page.page_number for page in results] == [0, 1]
+    assert isinstance(results[1].error, RuntimeError) and not results[1].has_more
+
+
+def test_max_pages_limits_the_pages_fetched():
+    pages = FakePages(last=100)
+    results = collect(pages, max_pages=5, max_in_flight=4)
+    assert [page.page_number for page in results] == list(range(5))
+    assert max(pages.started) == 4 and results[-1].has_more
+
+
+def test_closing_the_consumer_cancels_in_flight_pages():
+    pages = FakePages(last=100)
+
+    async def main():
+        stream = paginate_concurrently(pages, 50, 4)
+        first = await stream.__anext__()
+        await stream.aclose()
+        await asyncio.sleep(0)
+        return first
+
+    assert asyncio.run(main()).page_number == 0
+    assert pages.in_flight == 0 and pages.cancelled
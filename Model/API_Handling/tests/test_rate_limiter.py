@@ -0,0 +1,117 @@
+# tests/test_rate_limiter.py
+# AdaptiveRateLimiter (burst, giảm tốc và tạm dừng khi gặp 429, tăng tốc trở lại), _covalent_get (thử lại
+# 429/5xx/lỗi mạng rồi bỏ cuộc) và cờ `partial` khi một trang vẫn lỗi hoặc lịch sử chạm MAX_PAGES_TO_FETCH.
+
+import asyncio
+import time
+
+import httpx
+import pytest
+
+from rate_limiter import AdaptiveRateLimiter
+
+
+def timed_acquires(limiter: AdaptiveRateLimiter, count: int) -> float:
+    async def main():
+        start = time.monotonic()
+        for _ in range(count):
+            await limiter.acquire()
+        return time.monotonic() - start
+    return asyncio.run(main())
+
+
+def test_burst_then_steady_rate():
+    limiter = AdaptiveRateLimiter(50, burst=5)
+    assert timed_acquires(limiter, 5) < 0.02
+    assert timed_acquires(limiter, 5) >= 4 / 50
+
+
+def test_throttled_halves_rate_and_pauses_for_retry_after():
+    limiter = AdaptiveRateLimiter(100, burst=10, min_rate=30)
+    limiter.throttled(retry_after=0.1)
+    assert limiter.rate == 50 and limiter.throttled_count == 1
+    assert timed_acquires(limiter, 1) >= 0.09
+    limiter.throttled()
+    limiter.throttled()
+    assert limiter.rate == 30           # không xuống dưới min_rate
+
+
+def test_succeeded_recovers_to_max_rate():
+    limiter = AdaptiveRateLimiter(100, min_rate=1)
+    limiter.throttled()
+    for _ in range(9):
+        limiter.succeeded()
+    assert 50 < limiter.rate < 100
+    limiter.succeeded()
+    limiter.succeeded()
+    assert limiter.rate == 100
+
+
+def covalent_get(fetch, covalent, address: str):
+    url = f"{fetch.COVALENT_BASE_URL}/{fetch.CHAIN_NAME}/address/{address}/transactions_v3/?page-number=0"
+
+    async def main():
+        async with covalent.client() as client:
+            return await fetch._covalent_get(address, url, client)
+    return asyncio.run(main())
+
+
+def test_throttled_request_is_retried_after_retry_after(fast_fetch, covalent):
+    address, _ = covalent.wallet("throttled", 10)
+    covalent.faults[0] = [httpx.Response(429, headers={"Retry-After": "0.05"})]
+    start = time.monotonic()
+    assert covalent_get(fast_fetch, covalent, address).status_code == 200
+    assert time.monotonic() - start >= 0.05
+    assert fast_fetch.FETCH_RETRY_STATS.throttled == 1 and fast_fetch.FETCH_RETRY_STATS.retried == 1
+    assert fast_fetch.COVALENT_RATE_LIMITER.throttled_count == 1
+
+
+def test_server_and_network_errors_are_retried(fast_fetch, covalent):
+    address, _ = covalent.wallet("flaky", 10)
+    covalent.faults[0] = [httpx.Response(503), httpx.ConnectError("mất kết nối"), httpx.Response(502)]
+    assert covalent_get(fast_fetch, covalent, address).status_code == 200
+    assert fast_fetch.FETCH_RETRY_STATS.retried == 3 and fast_fetch.FETCH_RETRY_STATS.throttled == 0
+
+
+def test_gives_up_after_max_retries(fast_fetch, covalent):
+    address, _ = covalent.wallet("down", 10)
+    covalent.faults[0] = [httpx.Response(503)] * (fast_fetch.COVALENT_MAX_RETRIES + 1)
+    with pytest.raises(httpx.HTTPStatusError):
+        covalent_get(fast_fetch, covalent, address)
+    assert covalent.requests == fast_fetch.COVALENT_MAX_RETRIES + 1
+
+
+def test_client_errors_are_not_retried(fast_fetch, covalent):
+    address, _ = covalent.wallet("missing", 10)
+    covalent.faults[0] = [httpx.Response(404)]
+    with pytest.raises(httpx.HTTPStatusError):
+        covalent_get(fast_fetch, covalent, address)
+    assert covalent.requests == 1 and fast_fetch.FETCH_RETRY_STATS.retried == 0
+
+
+def feature_state(fetch, covalent, address: str):
+    async def main():
+        async with covalent.client() as client:
+            return await fetch.fetch_feature_state(address, client)
+    return asyncio.run(main())
+
+
+def test_complete_history_is_not_partial(fast_fetch, covalent):
+    address, profile = covalent.wallet("complete", 250)
+    state, partial = feature_state(fast_fetch, covalent, address)
+    assert not partial and state.txs.count == profile.n_transactions
+
+
+def test_abandoned_page_marks_history_partial(fast_fetch, covalent):
+    address, _ = covalent.wallet("abandoned", 250)
+    covalent.faults[1] = [httpx.Response(500)] * (fast_fetch.COVALENT_MAX_RETRIES + 1)
+    state, partial = feature_state(fast_fetch, covalent, address)
+    assert partial and state.txs.count == 100          # chỉ trang 0 trước trang lỗi
+    assert fast_fetch.FETCH_RETRY_STATS.abandoned == 1
+
+
+def test_page_limit_marks_history_partial(fast_fetch, covalent, monkeypatch):
+    monkeypatch.setattr(fast_fetch, "MAX_PAGES_TO_FETCH", 2)
+    address, _ = covalent.wallet("exchange", 450)
+    state, partial = feature_state(fast_fetch, covalent, address)
+    assert partial and state.truncated and state.txs.count == 200
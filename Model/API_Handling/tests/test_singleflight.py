@@ -0,0 +1,133 @@
+# tests/test_singleflight.py
+# SingleFlight: các lời gọi đồng thời cho cùng một khoá chờ chung một lần chạy, kết quả thành công
+# được memo trong memo_ttl_seconds giây, còn lỗi thì không. Memo của ANALYSIS_FLIGHTS và header
+# X-Prediction-Cache: bypass: yêu cầu bypass phải tính lại phân tích thay vì nhận kết quả đã memo.
+
+import asyncio
+
+import pytest
+from starlette.datastructures import Headers
+from starlette.responses import Response
+
+import app
+import feature_engineering_api
+from feature_engineering_api import WalletAnalysisResult, analyze_wallet
+from feature_schema import FeatureVector, default_schema
+from prediction_cache import BYPASS_HEADER
+from singleflight import SingleFlight
+
+ADDRESS = '0x' + 'cd' * 20
+
+
+def test_concurrent_calls_share_one_run_and_memo():
+    flights = SingleFlight(memo_ttl_seconds=60)
+    runs = []
+
+    async def work():
+        runs.append(len(runs))
+        await asyncio.sleep(0.01)
+        return len(runs)
+
+    async def main():
+        assert await asyncio.gather(*(flights.run("k", work) for _ in range(5))) == [1] * 5
+        assert await flights.run("k", work) == 1                     # memo
+        assert await flights.run("other", work) == 2
+
+    asyncio.run(main())
+    assert len(runs) == 2
+    assert flights.stats.executions == 2 and flights.stats.coalesced == 4 and flights.stats.memo_hits == 1
+
+
+def test_failures_are_not_memoized():
+    flights = SingleFlight(memo_ttl_seconds=60)
+    runs = []
+
+    async def work():
+        runs.append(len(runs))
+        if len(runs) == 1:
+            raise RuntimeError("Covalent lỗi")
+        return len(runs)
+
+    async def main():
+        with pytest.raises(RuntimeError):
+            await flights.run("k", work)
+        assert await flights.run("k", work) == 2
+
+    asyncio.run(main())
+    assert flights.stats.memo_hits == 0 and flights.summary()["in_flight"] == 0
+
+
+def test_use_memo_false_runs_again_and_refreshes_memo():
+    flights = SingleFlight(memo_ttl_seconds=60)
+    runs = []
+
+    async def work():
+        runs.append(len(runs))
+        await asyncio.sleep(0.01)
+        return len(runs)
+
+    async def main():
+        assert await flights.run("k", work) == 1
+        assert await flights.run("k", work) == 1                     # memo
+        fresh = await asyncio.gather(flights.run("k", work, use_memo=False), flights.run("k", work, use_memo=False))
+        assert fresh == [2, 2]                                       # vẫn chờ chung một lần chạy
+        assert await flights.run("k", work) == 2                     # memo mang kết quả mới
+
+    asyncio.run(main())
+    assert len(runs) == 2
+    assert flights.stats.memo_hits == 2 and flights.stats.coalesced == 1
+
+
+@pytest.fixture
+def analyses(monkeypatch):
+    """Thay _analyze_wallet bằng bản đếm số lần chạy, memo ANALYSIS_FLIGHTS riêng cho mỗi test."""
+    runs = []
+
+    async def fake_analyze_wallet(address, client):
+        runs.append(address)
+        return WalletAnalysisResult(address, vector=FeatureVector(default_schema()), last_block=len(runs))
+
+    monkeypatch.setattr(feature_engineering_api, "_analyze_wallet", fake_analyze_wallet)
+    monkeypatch.setattr(feature_engineering_api, "ANALYSIS_FLIGHTS", SingleFlight(memo_ttl_seconds=60))
+    return runs
+
+
+def test_fresh_analysis_skips_memo(analyses):
+    async def main():
+        first = await analyze_wallet(ADDRESS, client=None)
+        assert (await analyze_wallet(ADDRESS.upper(), client=None)).last_block == first.last_block
+        assert (await analyze_wallet(ADDRESS, client=None, fresh=True)).last_block == first.last_block + 1
+
+    asyncio.run(main())
+    assert len(analyses) == 2
+
+
+@pytest.mark.parametrize("headers, runs", [({}, 1), ({BYPASS_HEADER: "bypass"}, 2)])
+def test_analyze_endpoint_passes_bypass_to_memo(analyses, monkeypatch, headers, runs):
+    async def no_cache(address, request, client, model_version=None):
+        return None, "bypass" if headers else "off"
+
+    async def prediction(result, entry):
+        return "non-fraud", 0.9, 90.0, "v1"
+
+    async def no_neighborhood(result):
+        return None
+
+    monkeypatch.setattr(app, "cached_prediction", no_cache)
+    monkeypatch.setattr(app, "predict", prediction)
+    monkeypatch.setattr(app, "neighborhood_prediction", no_neighborhood)
+
+    class FakeRequest:
+        pass
+
+    FakeRequest.headers = Headers(headers)
+
+    async def main():
+        for _ in range(2):
+            response = Response()
+            body = await app.analyze(app.AddressRequest(address=ADDRESS), FakeRequest(), response, client=None)
+            assert body["status"] == "non-fraud" and body["address"] == ADDRESS
+            assert response.headers[BYPASS_HEADER] == ("bypass" if headers else "off")
+
+    asyncio.run(main())
+    assert len(analyses) == runs
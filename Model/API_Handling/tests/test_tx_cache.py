@@ -0,0 +1,103 @@
+# tests/test_tx_cache.py
+
+import asyncio
+import os
+import tempfile
+
+import feature_engineering_api
+from tx_cache import TransactionCache
+
+
+def transactions(address: str, count: int, start_block: int = 1):
+    # Hash ngẫu nhiên để payload nén không nhỏ đi quá nhiều
+    return [{"tx_hash": os.urandom(16).hex(), "block_height": start_block + i, "from_address": address,
+             "to_address": os.urandom(20).hex(), "value": str(i)} for i in range(count)]
+
+
+def new_cache(max_bytes: int) -> TransactionCache:
+    return TransactionCache(os.path.join(tempfile.mkdtemp(), 'tx.sqlite3'), max_bytes, balance_ttl_seconds=300)
+
+
+def test_balances_and_feature_states_count_against_max_bytes():
+    cache = new_cache(max_bytes=20_000)
+    for i in range(40):
+        address = f"0x{i:040x}"
+        cache.put_transactions(address, transactions(address, 5))
+        cache.put_feature_state(address, {"highest_block": 5, "blob": os.urandom(400).hex()})
+        cache.put_balance(address, {"items": [{"blob": os.urandom(400).hex()}]})
+        assert cache.summary()["size_bytes"] <= cache.max_bytes
+    assert cache.stats.evictions > 0
+    # Ví mới nhất còn nguyên, ví cũ nhất bị xoá khỏi cả ba bảng
+    newest, oldest = f"0x{39:040x}", f"0x{0:040x}"
+    assert cache.get_balance(newest) is not None and cache.get_feature_state(newest, 5) is not None
+    assert cache.get_balance(oldest) is None and cache.get_feature_state(oldest, 5) is None
+    assert cache.get_transactions(oldest) is None
+
+
+def test_balances_without_transactions_are_evicted():
+    cache = new_cache(max_bytes=10_000)
+    for i in range(50):
+        cache.put_balance(f"0x{i:040x}", {"items": [{"blob": os.urandom(400).hex()}]})
+    assert cache.summary()["size_bytes"] <= cache.max_bytes
+    assert cache.get_balance(f"0x{49:040x}") is not None
+    assert cache.get_balance(f"0x{0:040x}") is None
+
+
+def test_default_path_does_not_depend_on_working_directory():
+    model_dir = os.path.abspath(os.path.join(os.path.dirname(feature_engineering_api.__file__), '..', 'Model'))
+    assert os.path.abspath(feature_engineering_api.TX_CACHE_PATH) == os.path.join(model_dir, 'cache',
+                                                                                 'transactions.sqlite3')
+
+
+def test_eviction_skips_wallet_with_open_writer():
+    """Các trang đang ghi dở chưa được tính kích thước nên không được bị xoá bởi lần ghi của ví khác."""
+    cache = new_cache(max_bytes=1_500)
+    cache.put_balance('0xA', {"items": []})
+    writer = cache.open_writer('0xA')
+    writer.write_page(0, transactions('0xa', 2, start_block=9))
+    writer.write_page(1, transactions('0xa', 2, start_block=1))
+    cache.put_balance('0xB', {"items": [{"blob": os.urandom(1_500).hex()}]})
+    assert writer.commit()
+    cached = cache.get_transactions('0xA')
+    assert len(cached.items) == 4 and cached.highest_block == 10
+
+
+def test_commit_discards_pages_lost_to_another_writer():
+    cache = new_cache(max_bytes=1_000_000)
+    writer = cache.open_writer('0xA')
+    writer.write_page(0, transactions('0xa', 3))
+    cache.open_writer('0xA').discard()     # một lần lấy khác cho cùng ví xoá các trang đang ghi dở
+    assert not writer.commit()
+    assert cache.get_transactions('0xA') is None and cache.get_highest_block('0xA') is None
+
+
+def test_append_after_eviction_does_not_create_partial_history():
+    cache = new_cache(max_bytes=1_000_000)
+    cache.put_transactions('0xA', transactions('0xa', 3))
+    cache.max_bytes = 0
+    cache.put_balance('0xB', {"items": []})    # xoá 0xA
+    cache.max_bytes = 1_000_000
+    assert not cache.append_transactions('0xA', transactions('0xa', 2, start_block=10))
+    assert cache.get_transactions('0xA') is None
+
+
+def test_get_transactions_does_not_count_a_second_hit():
+    cache = new_cache(max_bytes=1_000_000)
+    cache.put_transactions('0xA', transactions('0xa', 3))
+    assert cache.get_highest_block('0xA') == 3
+    cached = cache.get_transactions('0xA')
+    assert cache.stats.hits == 1 and cache.stats.bytes_saved == cached.raw_bytes
+
+
+def test_evicted_between_lookups_falls_back_to_full_fetch(monkeypatch, fast_fetch, covalent):
+    """get_highest_block thấy ví nhưng nó bị xoá trước get_transactions: lấy lại toàn bộ lịch sử."""
+    address, profile = covalent.wallet("evicted", 250)
+    cache = new_cache(max_bytes=10_000_000)
+    cache.put_transactions(address, transactions(address, 3))   # không có trạng thái đặc trưng đã lưu
+    monkeypatch.setattr(fast_fetch, "get_tx_cache", lambda: cache)
+    monkeypatch.setattr(cache, "get_transactions", lambda address: None)
+
+    state, partial = asyncio.run(fast_fetch.fetch_feature_state(address, covalent.client()))
+    assert not partial and state.txs.count == profile.n_transactions
+    assert sorted(covalent.served)[:3] == [0, 1, 2]     # lịch sử đầy đủ, không chỉ phần bổ sung
+    assert cache.get_feature_state(address, state.highest_block) is not None
@@ -0,0 +1,306 @@
+# tx_cache.py
+# Cache SQLite trên đĩa cho dữ liệu thô của Covalent, khoá theo địa chỉ viết thường:
+# - các item transactions_v3 (nén zlib), lưu thành các đoạn chỉ-ghi-thêm: mỗi lần bổ sung
+#   giao dịch mới chỉ chèn một đoạn mới, không ghi lại toàn bộ lịch sử
+# - block cao nhất đã thấy của mỗi ví
+# - payload balances_v2 kèm thời điểm lấy (có TTL)
+# - trạng thái đặc trưng (FeatureState.to_dict()) gắn với block cao nhất
+# Khi tổng kích thước (các đoạn giao dịch + số dư + trạng thái đặc trưng) vượt MAX_BYTES, các ví ít được
+# truy cập gần đây nhất sẽ bị xoá trước (trừ ví đang được TransactionWriter ghi dở).
+# Lịch sử đầy đủ có thể được ghi theo từng trang qua TransactionWriter (seq = -số trang, nên
+# trang 0 mới nhất có seq lớn nhất trong các trang, và các đoạn bổ sung sau đó có seq dương).
+
+import json
+import logging
+import sqlite3
+import threading
+import time
+import zlib
+from dataclasses import dataclass, asdict
+from typing import List, Dict, Any, Optional
+
+
+@dataclass
+class CachedTransactions:
+    items: List[Dict[str, Any]]
+    highest_block: int
+    raw_bytes: int              # kích thước JSON chưa nén, tức số byte không phải tải lại
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    balance_hits: int = 0
+    balance_misses: int = 0
+    bytes_saved: int = 0
+    evictions: int = 0
+
+
+def highest_block(items: List[Dict[str, Any]]) -> int:
+    return max((tx.get('block_height') or 0 for tx in items), default=0)
+
+
+def merge_transactions(new_items: List[Dict[str, Any]], cached_items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Ghép các giao dịch mới (mới nhất trước) với dữ liệu đã cache, bỏ trùng theo tx_hash."""
+    seen = {tx.get('tx_hash') for tx in new_items}
+    return new_items + [tx for tx in cached_items if tx.get('tx_hash') not in seen]
+
+
+def _pack(data: Any) -> bytes:
+    return json.dumps(data, separators=(',', ':')).encode()
+
+
+class TransactionCache:
+    def __init__(self, path: str, max_bytes: int, balance_ttl_seconds: float):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.balance_ttl_seconds = balance_ttl_seconds
+        self.stats = CacheStats()
+        self._lock = threading.Lock()
+        self._writing: Dict[str, int] = {}     # địa chỉ -> số TransactionWriter đang mở
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.executescript("""
+            PRAGMA journal_mode=WAL;
+            CREATE TABLE IF NOT EXISTS wallets (
+                address TEXT PRIMARY KEY,
+                highest_block INTEGER NOT NULL,
+                raw_bytes INTEGER NOT NULL,
+                size_bytes INTEGER NOT NULL,
+                last_access REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS segments (
+                address TEXT NOT NULL,
+                seq INTEGER NOT NULL,
+                payload BLOB NOT NULL,
+                PRIMARY KEY (address, seq)
+            );
+            CREATE TABLE IF NOT EXISTS balances (
+                address TEXT PRIMARY KEY,
+                payload BLOB NOT NULL,
+                fetched_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS feature_states (
+                address TEXT PRIMARY KEY,
+                payload BLOB NOT NULL,
+                highest_block INTEGER NOT NULL
+            );
+        """)
+
+    # --- Giao dịch ---
+    def get_highest_block(self, address: str) -> Optional[int]:
+        """Block cao nhất đã cache của ví (tính là một lần hit), hoặc None nếu chưa có."""
+        address = address.lower()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT highest_block, raw_bytes FROM wallets WHERE address = ?", (address,)).fetchone()
+            if row is None:
+                self.stats.misses += 1
+                return None
+            self._conn.execute("UPDATE wallets SET last_access = ? WHERE address = ?", (time.time(), address))
+            self._conn.commit()
+            self.stats.hits += 1
+            self.stats.bytes_saved += row[1]
+        return row[0]
+
+    def get_transactions(self, address: str) -> Optional[CachedTransactions]:
+        """
+        Toàn bộ lịch sử đã cache, hoặc None nếu ví không có (hoặc vừa bị xoá).
+        Không tính vào thống kê: người gọi đã tính lần hit khi hỏi get_highest_block.
+        """
+        address = address.lower()
+        with self._lock:
+            wallet = self._conn.execute(
+                "SELECT highest_block, raw_bytes FROM wallets WHERE address = ?", (address,)).fetchone()
+            if wallet is None:
+                return None
+            rows = self._conn.execute(
+                "SELECT payload FROM segments WHERE address = ? ORDER BY seq DESC", (address,)).fetchall()
+        items: List[Dict[str, Any]] = []
+        for (payload,) in rows:
+            items = merge_transactions(items, json.loads(zlib.decompress(payload)))
+        return CachedTransactions(items, wallet[0], wallet[1])
+
+    def put_transactions(self, address: str, items: List[Dict[str, Any]]) -> None:
+        """Ghi đè toàn bộ lịch sử của ví bằng một đoạn duy nhất."""
+        address = address.lower()
+        with self._lock:
+            self._conn.execute("DELETE FROM segments WHERE address = ?", (address,))
+            self._conn.execute("DELETE FROM wallets WHERE address = ?", (address,))
+            self._append(address, items)
+            self._evict()
+            self._conn.commit()
+
+    def append_transactions(self, address: str, new_items: List[Dict[str, Any]]) -> bool:
+        """
+        Thêm một đoạn chứa các giao dịch mới hơn block cao nhất đã cache. Trả về False (không ghi gì) nếu ví
+        đã bị xoá khỏi cache trong lúc lấy các giao dịch mới: chỉ riêng đoạn mới không phải là lịch sử đầy đủ.
+        """
+        address = address.lower()
+        with self._lock:
+            if self._conn.execute("SELECT 1 FROM wallets WHERE address = ?", (address,)).fetchone() is None:
+                return False
+            self._append(address, new_items)
+            self._evict()
+            self._conn.commit()
+        return True
+
+    def open_writer(self, address: str) -> 'TransactionWriter':
+        """Bắt đầu ghi lại toàn bộ lịch sử của ví theo từng trang (xem TransactionWriter)."""
+        address = address.lower()
+        with self._lock:
+            self._writing[address] = self._writing.get(address, 0) + 1
+        return TransactionWriter(self, address)
+
+    def _close_writer(self, address: str) -> None:
+        # Gọi khi đang giữ self._lock
+        if self._writing.get(address, 0) <= 1:
+            self._writing.pop(address, None)
+        else:
+            self._writing[address] -= 1
+
+    def _append(self, address: str, items: List[Dict[str, Any]]) -> None:
+        raw = _pack(items)
+        payload = zlib.compress(raw)
+        seq = self._conn.execute(
+            "SELECT COALESCE(MAX(seq), -1) + 1 FROM segments WHERE address = ?", (address,)).fetchone()[0]
+        self._conn.execute("INSERT INTO segments VALUES (?, ?, ?)", (address, seq, payload))
+        self._conn.execute("""
+            INSERT INTO wallets VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT(address) DO UPDATE SET
+                highest_block = MAX(highest_block, excluded.highest_block),
+                raw_bytes = raw_bytes + excluded.raw_bytes,
+                size_bytes = size_bytes + excluded.size_bytes,
+                last_access = excluded.last_access
+        """, (address, highest_block(items), len(raw), len(payload), time.time()))
+
+    # Kích thước và lần truy cập gần nhất của mỗi ví trên cả ba bảng: số dư có thể được cache cho ví chưa có
+    # lịch sử giao dịch, nên ví không có dòng trong wallets vẫn phải tính (và bị xoá) như các ví khác
+    _SIZES = """
+        SELECT address, MAX(accessed) AS accessed, SUM(size) AS size FROM (
+            SELECT address, last_access AS accessed, size_bytes AS size FROM wallets
+            UNION ALL SELECT address, fetched_at, LENGTH(payload) FROM balances
+            UNION ALL SELECT address, 0, LENGTH(payload) FROM feature_states
+        ) GROUP BY address
+    """
+
+    def _total_bytes(self) -> int:
+        return self._conn.execute(f"SELECT COALESCE(SUM(size), 0) FROM ({self._SIZES})").fetchone()[0]
+
+    def _evict(self) -> None:
+        total = self._total_bytes()
+        if total <= self.max_bytes:
+            return
+        for address, _, size in self._conn.execute(f"{self._SIZES} ORDER BY accessed ASC").fetchall():
+            if total <= self.max_bytes:
+                break
+            if address in self._writing:
+                continue    # các trang đang ghi dở chưa có dòng trong wallets, xoá chúng sẽ làm hỏng commit()
+            for table in ("wallets", "segments", "balances", "feature_states"):
+                self._conn.execute(f"DELETE FROM {table} WHERE address = ?", (address,))
+            total -= size
+            self.stats.evictions += 1
+            logging.info(f"Cache giao dịch: xoá {address} ({size} byte) để giữ dưới {self.max_bytes} byte.")
+
+    # --- Trạng thái đặc trưng ---
+    def get_feature_state(self, address: str, highest_block: int) -> Optional[Dict[str, Any]]:
+        """Trạng thái đã lưu, chỉ trả về nếu nó khớp với block cao nhất của lịch sử đã cache."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT payload, highest_block FROM feature_states WHERE address = ?", (address.lower(),)).fetchone()
+        if row is None or row[1] != highest_block:
+            return None
+        return json.loads(zlib.decompress(row[0]))
+
+    def put_feature_state(self, address: str, state: Dict[str, Any]) -> None:
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO feature_states VALUES (?, ?, ?)",
+                               (address.lower(), zlib.compress(_pack(state)), state['highest_block']))
+            self._evict()
+            self._conn.commit()
+
+    # --- Số dư ---
+    def get_balance(self, address: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT payload, fetched_at FROM balances WHERE address = ?", (address.lower(),)).fetchone()
+            if row is None or time.time() - row[1] > self.balance_ttl_seconds:
+                self.stats.balance_misses += 1
+                return None
+            self.stats.balance_hits += 1
+        return json.loads(zlib.decompress(row[0]))
+
+    def put_balance(self, address: str, balance_data: Dict[str, Any]) -> None:
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO balances VALUES (?, ?, ?)",
+                               (address.lower(), zlib.compress(_pack(balance_data)), time.time()))
+            self._evict()
+            self._conn.commit()
+
+    def summary(self) -> Dict[str, Any]:
+        with self._lock:
+            wallets = self._conn.execute("SELECT COUNT(*) FROM wallets").fetchone()[0]
+            size = self._total_bytes()
+        return {**asdict(self.stats), "wallets": wallets, "size_bytes": size, "max_bytes": self.max_bytes}
+
+
+class TransactionWriter:
+    """
+    Ghi lịch sử của một ví theo từng trang transactions_v3 (mới nhất trước) ngay khi trang về,
+    nên người gọi không phải giữ cả lịch sử trong bộ nhớ. Các trang chỉ hiển thị với người đọc
+    sau commit(); discard() xoá chúng nếu lần lấy dữ liệu không trọn vẹn. Tạo qua
+    TransactionCache.open_writer() để ví không bị xoá khỏi cache khi đang ghi dở.
+    """
+
+    def __init__(self, cache: TransactionCache, address: str):
+        self.cache = cache
+        self.address = address
+        self.highest_block = 0
+        self.raw_bytes = 0
+        self.size_bytes = 0
+        self.pages = 0
+        with cache._lock:
+            # Xoá các trang sót lại của một lần ghi bị gián đoạn trước đó
+            cache._conn.execute("DELETE FROM segments WHERE address = ?", (address,))
+            cache._conn.execute("DELETE FROM wallets WHERE address = ?", (address,))
+            cache._conn.commit()
+
+    def write_page(self, page_number: int, items: List[Dict[str, Any]]) -> None:
+        if not items:
+            return
+        raw = _pack(items)
+        payload = zlib.compress(raw)
+        self.highest_block = max(self.highest_block, highest_block(items))
+        self.raw_bytes += len(raw)
+        self.size_bytes += len(payload)
+        self.pages += 1
+        with self.cache._lock:
+            self.cache._conn.execute("INSERT OR REPLACE INTO segments VALUES (?, ?, ?)",
+                                     (self.address, -page_number, payload))
+            self.cache._conn.commit()
+
+    def commit(self) -> bool:
+        """
+        Công bố lịch sử đã ghi. Nếu các trang không còn đủ (ví dụ một tiến trình khác vừa mở writer mới cho
+        cùng ví) thì huỷ chúng và trả về False, để không bao giờ có dòng wallets trỏ tới lịch sử thiếu.
+        """
+        with self.cache._lock:
+            self.cache._close_writer(self.address)
+            pages = self.cache._conn.execute(
+                "SELECT COUNT(*) FROM segments WHERE address = ? AND seq <= 0", (self.address,)).fetchone()[0]
+            if pages != self.pages:
+                logging.warning(f"Cache giao dịch: {self.address} còn {pages}/{self.pages} trang khi commit, bỏ qua.")
+                self.cache._conn.execute("DELETE FROM segments WHERE address = ?", (self.address,))
+                self.cache._conn.commit()
+                return False
+            self.cache._conn.execute("INSERT OR REPLACE INTO wallets VALUES (?, ?, ?, ?, ?)",
+                                     (self.address, self.highest_block, self.raw_bytes, self.size_bytes, time.time()))
+            self.cache._evict()
+            self.cache._conn.commit()
+        return True
+
+    def discard(self) -> None:
+        with self.cache._lock:
+            self.cache._close_writer(self.address)
+            self.cache._conn.execute("DELETE FROM segments WHERE address = ?", (self.address,))
+            self.cache._conn.commit()
@@ -0,0 +1,86 @@
+# benchmarks/bench_backends.py
+# So sánh các backend suy luận (INFERENCE_BACKEND) trên cùng ma trận đã tiền xử lý:
+# torch (ImprovedFraudGNN, edge_index rỗng), fused (NumPy), onnx và onnx-int8 (ONNX Runtime, nhiều cấu hình luồng).
+# Với mỗi kích thước lô (mặc định 1, 32, 1024) báo độ trễ p50/p99 của một lần gọi và thông lượng (ví/giây).
+# Dữ liệu là các dòng đặc trưng giả lập của synthetic_workload qua preprocessing_plan; kiểm tra
+# các backend cho cùng nhãn.
+#
+# Chạy: python Model/benchmarks/bench_backends.py --batch-sizes 1 32 1024 --ort-threads 1x1 4x1
+#       (--ort-threads: intra x inter; 0 = mặc định của ONNX Runtime)
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ARTIFACTS_DIR = os.path.join(BENCH_DIR, '..', 'Model')
+sys.path.insert(0, os.path.join(BENCH_DIR, '..', 'API_Handling'))
+
+from fused_inference import FusedFraudModel, FUSED_FILENAME, WEIGHTS_FILENAME  # noqa: E402
+from model import predict_proba  # noqa: E402
+from onnx_inference import OnnxFraudModel, ONNX_FILENAME, INT8_FILENAME  # noqa: E402
+from preprocessing_plan import PreprocessingPlan, PLAN_FILENAME  # noqa: E402
+from synthetic_workload import WorkloadGenerator  # noqa: E402
+
+
+def backends(ort_threads):
+    models = {"fused": FusedFraudModel.load(os.path.join(ARTIFACTS_DIR, FUSED_FILENAME))}
+    for spec in ort_threads:
+        intra, inter = (int(n) for n in spec.split('x'))
+        models[f"onnx {spec}"] = OnnxFraudModel(os.path.join(ARTIFACTS_DIR, ONNX_FILENAME), intra, inter)
+        if os.path.exists(os.path.join(ARTIFACTS_DIR, INT8_FILENAME)):
+            models[f"onnx-int8 {spec}"] = OnnxFraudModel(os.path.join(ARTIFACTS_DIR, INT8_FILENAME), intra, inter)
+    try:
+        from gnn_model import load_torch_model
+        import torch
+        models[f"torch ({torch.get_num_threads()} luồng)"] = load_torch_model(
+            os.path.join(ARTIFACTS_DIR, WEIGHTS_FILENAME), models["fused"].num_features)
+    except ImportError:
+        print("(bỏ qua torch: chưa cài torch/torch_geometric)")
+    return models
+
+
+def measure(model, x: np.ndarray, min_seconds: float):
+    predict_proba(model, x)   # khởi động
+    timings = []
+    start = time.perf_counter()
+    while time.perf_counter() - start < min_seconds or len(timings) < 20:
+        t = time.perf_counter()
+        predict_proba(model, x)
+        timings.append(time.perf_counter() - t)
+    timings = np.array(timings)
+    return np.percentile(timings, 50), np.percentile(timings, 99), len(x) / timings.mean()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 32, 1024])
+    parser.add_argument("--ort-threads", nargs="+", default=["1x1", "0x0"])
+    parser.add_argument("--seconds", type=float, default=1.0, help="thời gian đo tối thiểu mỗi ô")
+    args = parser.parse_args()
+
+    plan = PreprocessingPlan.load(os.path.join(ARTIFACTS_DIR, PLAN_FILENAME))
+    rows = WorkloadGenerator(seed=0).feature_rows(max(args.batch_sizes))
+    rows.columns = rows.columns.str.strip()   # tên cột như transaction_dataset.csv sau khi đọc lúc huấn luyện
+    x_all = plan.transform(rows).astype(np.float32)
+    models = backends(args.ort_threads)
+
+    labels = {name: predict_proba(model, x_all).argmax(axis=1) for name, model in models.items()}
+    reference = labels["fused"]
+    assert all(np.array_equal(reference, l) for l in labels.values()), "các backend cho nhãn khác nhau"
+
+    print(f"{'backend':<22} {'lô':>5} {'p50 µs':>10} {'p99 µs':>10} {'ví/giây':>12}")
+    for batch_size in args.batch_sizes:
+        x = np.ascontiguousarray(x_all[:batch_size])
+        for name, model in models.items():
+            p50, p99, throughput = measure(model, x, args.seconds)
+            print(f"{name:<22} {batch_size:>5} {p50 * 1e6:>10.1f} {p99 * 1e6:>10.1f} {throughput:>12.0f}")
+
+
+if __name__ == "__main__":
+    import warnings
+    warnings.simplefilter('ignore')
+    main()
@@ -0,0 +1,80 @@
+# benchmarks/bench_batch_inference.py
+# Thông lượng dự đoán khi fan-out cao (như /graph hay /analyze/batch):
+# - từng địa chỉ: predict_address gọi lần lượt (cách cũ)
+# - theo lô: một lần model.predict_addresses cho cả danh sách
+# - micro-batching: N coroutine đồng thời cùng submit() vào inference_batcher.MicroBatcher
+# Đặc trưng lấy từ các ví giả lập của synthetic_workload; kiểm tra kết quả ba cách trùng nhau.
+#
+# Chạy: python Model/benchmarks/bench_batch_inference.py --wallets 500 --max-wait-ms 2
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, '..', 'API_Handling'))
+os.environ.setdefault('COVALENT_API_KEY', 'benchmark')
+os.environ['TX_CACHE_ENABLED'] = '0'
+
+from feature_engineering_api import calculate_all_features  # noqa: E402
+from inference_batcher import MicroBatcher  # noqa: E402
+from model import load_artifacts, predict_address, predict_addresses  # noqa: E402
+from synthetic_workload import WorkloadGenerator  # noqa: E402
+
+
+def wallet_features(count: int):
+    generator = WorkloadGenerator(seed=0)
+    features = []
+    for i in range(count):
+        address = generator.wallet_address("batch-inference", i)
+        profile = generator.profile(20 + (i * 53) % 600, fraud=i % 5 == 0)
+        items = list(generator.covalent_transactions(address, profile))
+        features.append(calculate_all_features(address, items, generator.covalent_balances(address)))
+    return features
+
+
+async def micro_batched(batcher: MicroBatcher, features):
+    return await asyncio.gather(*(batcher.submit(f) for f in features))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--wallets", type=int, default=500)
+    parser.add_argument("--max-batch", type=int, default=256)
+    parser.add_argument("--max-wait-ms", type=float, default=2.0)
+    args = parser.parse_args()
+
+    model, pipeline, feat_names = load_artifacts(os.path.join(BENCH_DIR, '..', 'Model'))
+    features = wallet_features(args.wallets)
+
+    start = time.perf_counter()
+    single = [predict_address(model, pipeline, f, feat_names) for f in features]
+    single_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    batched = predict_addresses(model, pipeline, features, feat_names)
+    batch_seconds = time.perf_counter() - start
+
+    batcher = MicroBatcher(lambda batch: predict_addresses(model, pipeline, batch, feat_names),
+                           max_batch_size=args.max_batch, max_wait_ms=args.max_wait_ms)
+    start = time.perf_counter()
+    micro = asyncio.run(micro_batched(batcher, features))
+    micro_seconds = time.perf_counter() - start
+
+    assert single == batched == micro, "kết quả theo lô lệch với từng địa chỉ"
+    print(f"{args.wallets} ví")
+    print(f"{'cách':<16} {'giây':>8} {'ví/giây':>10} {'tăng tốc':>9}")
+    for name, seconds in [("từng địa chỉ", single_seconds), ("theo lô", batch_seconds),
+                          ("micro-batching", micro_seconds)]:
+        print(f"{name:<16} {seconds:>8.3f} {args.wallets / seconds:>10.0f} {single_seconds / seconds:>8.1f}x")
+    print(f"micro-batching: {batcher.summary()}")
+
+
+if __name__ == "__main__":
+    import logging
+    import warnings
+    logging.disable(logging.INFO)
+    warnings.simplefilter('ignore')
+    main()
@@ -0,0 +1,62 @@
+# benchmarks/bench_cold_start.py
+# Thời gian khởi động lạnh và bộ nhớ của một worker theo từng backend suy luận:
+# mỗi cấu hình chạy trong một tiến trình Python mới: import model -> load_artifacts -> một lần dự đoán,
+# rồi báo thời gian, RSS đỉnh và các thư viện nặng đã bị import (torch, torch_geometric, sklearn, joblib).
+#
+# Chạy: python Model/benchmarks/bench_cold_start.py --repeat 3
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+API_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'API_Handling')
+
+CHILD = r'''
+import json, resource, sys, time, warnings
+warnings.simplefilter('ignore')
+start = time.perf_counter()
+import model
+loaded = model.load_artifacts('../Model/')
+status = model.predict_address(*loaded[:2], {}, loaded[2])
+elapsed = time.perf_counter() - start
+print(json.dumps({
+    "seconds": elapsed,
+    "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    "model": type(loaded[0]).__name__, "preprocessing": type(loaded[1]).__name__,
+    "imported": [m for m in ("torch", "torch_geometric", "sklearn", "joblib", "pandas", "onnxruntime") if m in sys.modules],
+}))
+'''
+
+CONFIGS = {
+    "torch + pickle": {"INFERENCE_BACKEND": "torch", "PREPROCESSING_BACKEND": "pipeline"},
+    "torch + plan": {"INFERENCE_BACKEND": "torch", "PREPROCESSING_BACKEND": "plan"},
+    "fused + plan": {"INFERENCE_BACKEND": "fused", "PREPROCESSING_BACKEND": "plan"},
+    "onnx + plan": {"INFERENCE_BACKEND": "onnx", "PREPROCESSING_BACKEND": "plan"},
+}
+
+
+def run(env_overrides):
+    env = {**os.environ, **env_overrides}
+    out = subprocess.run([sys.executable, "-c", CHILD], cwd=API_DIR, env=env, capture_output=True, text=True)
+    if out.returncode:
+        raise RuntimeError(out.stderr)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'cấu hình':<16} {'giây':>7} {'RSS MB':>8}  {'mô hình':<18} {'đã import'}")
+    for name, env in CONFIGS.items():
+        runs = [run(env) for _ in range(args.repeat)]
+        best = min(runs, key=lambda r: r["seconds"])
+        print(f"{name:<16} {best['seconds']:>7.2f} {best['max_rss_mb']:>8.0f}  {best['model']:<18} "
+              f"{', '.join(best['imported'])}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+# benchmarks/bench_connection_pool.py
+# So sánh "mỗi ví một httpx.AsyncClient" (cách cũ) với một client dùng chung
+# (covalent_client.create_covalent_client) trên một server giả lập cục bộ có TLS.
+# Server đếm số kết nối được chấp nhận = số lần bắt tay TCP/TLS.
+#
+# Chạy: cd Model/API_Handling && python ../benchmarks/bench_connection_pool.py --wallets 50
+
+import argparse
+import asyncio
+import json
+import os
+import ssl
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'API_Handling'))
+
+import httpx  # noqa: E402
+from covalent_client import create_covalent_client  # noqa: E402
+
+PAGES_PER_WALLET = 3
+BODY = json.dumps({"data": {"items": [], "pagination": {"has_more": False}}}).encode()
+
+
+class StandInServer:
+    """Server HTTP/1.1 keep-alive tối giản, trả cùng một body JSON cho mọi request."""
+
+    def __init__(self, ssl_context=None):
+        self.ssl_context = ssl_context
+        self.connections = 0
+        self.requests = 0
+        self.server = None
+
+    async def _handle(self, reader, writer):
+        self.connections += 1
+        try:
+            while True:
+                await reader.readuntil(b"\r\n\r\n")
+                self.requests += 1
+                writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n"
+                             b"Content-Length: " + str(len(BODY)).encode() + b"\r\n\r\n" + BODY)
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def start(self) -> int:
+        self.server = await asyncio.start_server(self._handle, "127.0.0.1", 0, ssl=self.ssl_context)
+        return self.server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        self.server.close()
+        await self.server.wait_closed()
+
+
+def make_self_signed_cert(directory: str):
+    cert, key = os.path.join(directory, "cert.pem"), os.path.join(directory, "key.pem")
+    subprocess.run(["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-keyout", key, "-out", cert,
+                    "-days", "1", "-subj", "/CN=127.0.0.1", "-addext", "subjectAltName=IP:127.0.0.1"],
+                   check=True, capture_output=True)
+    return cert, key
+
+
+async def simulate_wallet(client: httpx.AsyncClient, base_url: str, wallet: int):
+    # Một lần phân tích: vài trang giao dịch + số dư, chạy song song như analyze_wallet_address
+    urls = [f"{base_url}/v1/eth-mainnet/address/{wallet}/transactions_v3/?page-number={p}"
+            for p in range(PAGES_PER_WALLET)]
+    urls.append(f"{base_url}/v1/eth-mainnet/address/{wallet}/balances_v2/")
+    await asyncio.gather(*(client.get(url) for url in urls))
+
+
+async def run_mode(mode: str, wallets: int, concurrency: int, base_url: str, verify) -> dict:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def per_wallet_client(wallet):
+        async with semaphore:
+            async with httpx.AsyncClient(verify=verify, timeout=httpx.Timeout(30.0, connect=60.0)) as client:
+                await simulate_wallet(client, base_url, wallet)
+
+    async def shared(client, wallet):
+        async with semaphore:
+            await simulate_wallet(client, base_url, wallet)
+
+    start = time.perf_counter()
+    if mode == "per_wallet_client":
+        await asyncio.gather(*(per_wallet_client(w) for w in range(wallets)))
+    else:
+        async with create_covalent_client(verify=verify) as client:
+            await asyncio.gather(*(shared(client, w) for w in range(wallets)))
+    return {"seconds": time.perf_counter() - start}
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Benchmark bắt tay TCP/TLS: client theo ví so với client dùng chung")
+    parser.add_argument("--wallets", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--no-tls", action="store_true", help="Chỉ đo bắt tay TCP")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        server_ctx, verify, scheme = None, True, "http"
+        if not args.no_tls:
+            cert, key = make_self_signed_cert(tmp)
+            server_ctx = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+            server_ctx.load_cert_chain(cert, key)
+            verify, scheme = ssl.create_default_context(cafile=cert), "https"
+
+        report = {"wallets": args.wallets, "requests_per_wallet": PAGES_PER_WALLET + 1, "tls": not args.no_tls}
+        for mode in ("per_wallet_client", "shared_client"):
+            server = StandInServer(server_ctx)
+            port = await server.start()
+            result = await run_mode(mode, args.wallets, args.concurrency, f"{scheme}://127.0.0.1:{port}", verify)
+            await server.stop()
+            result.update(handshakes=server.connections, requests=server.requests)
+            report[mode] = result
+
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,103 @@
+# benchmarks/bench_decode.py
+# So sánh thời gian parse và bộ nhớ giữ lại của một trang transactions_v3 giữa:
+# - json:    res.json() như trước (dict đầy đủ, json chuẩn)
+# - orjson:  orjson.loads + chiếu bằng Python
+# - msgspec: covalent_decode.decode_transactions_page (giải mã thẳng vào TypedDict đã chiếu)
+# trên các trang đã ghi lại trong benchmarks/fixtures/<địa chỉ>/transactions_v3_p<N>.json.
+# Nếu chưa có fixture nào, dùng trang của synthetic_workload (qua bench_streaming_memory.make_page).
+#
+# Ghi fixture thật (cần COVALENT_API_KEY):
+#   python Model/benchmarks/mock_upstream.py record 0x... --pages 3
+# Chạy benchmark:
+#   cd Model/API_Handling && python ../benchmarks/bench_decode.py --repeat 20
+
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, '..', 'API_Handling'))
+
+import covalent_decode  # noqa: E402
+from covalent_decode import decode_transactions_page, project_transaction  # noqa: E402
+from mock_upstream import FIXTURES_DIR  # noqa: E402
+
+
+def load_pages():
+    paths = sorted(glob.glob(os.path.join(FIXTURES_DIR, '*', 'transactions_v3_p*.json')))
+    if paths:
+        pages = []
+        for path in paths:
+            with open(path, 'rb') as f:
+                pages.append(f.read())
+        return pages, f"{len(paths)} fixture trong {FIXTURES_DIR}"
+    from bench_streaming_memory import make_page
+    return [make_page(p, 10) for p in range(10)], "10 trang giả lập (chưa có fixture)"
+
+
+def decode_json(content: bytes):
+    data = json.loads(content).get("data", {})
+    items = data.get("items") or []
+    return items, bool(items) and data.get("pagination", {}).get("has_more", False)
+
+
+def decode_orjson(content: bytes):
+    import orjson
+    data = orjson.loads(content).get("data", {})
+    items = [project_transaction(tx) for tx in data.get("items") or []]
+    return items, bool(items) and data.get("pagination", {}).get("has_more", False)
+
+
+def measure(decode, pages, repeat: int):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for content in pages:
+            decode(content)
+    per_page = (time.perf_counter() - start) / (repeat * len(pages))
+
+    # Bộ nhớ còn giữ sau khi decode tất cả các trang (những gì streaming/cache phải giữ)
+    tracemalloc.start()
+    kept = [decode(content) for content in pages]
+    retained, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del kept
+    return per_page, retained
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    pages, source = load_pages()
+    total_bytes = sum(len(p) for p in pages)
+    print(f"Nguồn: {source}, {total_bytes / 2**20:.1f} MB JSON")
+
+    decoders = [("json (cũ)", decode_json)]
+    try:
+        import orjson  # noqa: F401
+        decoders.append(("orjson + chiếu", decode_orjson))
+    except ImportError:
+        print("orjson chưa được cài, bỏ qua.")
+    if covalent_decode.MSGSPEC_AVAILABLE:
+        decoders.append(("msgspec (đã chiếu)", decode_transactions_page))
+    else:
+        print("msgspec chưa được cài, decode_transactions_page đang dùng đường dự phòng.")
+
+    # Các bộ giải mã gọn phải cho cùng kết quả chiếu
+    expected = [([project_transaction(tx) for tx in decode_json(p)[0]], decode_json(p)[1]) for p in pages]
+    for name, decode in decoders[1:]:
+        assert [decode(p) for p in pages] == expected, f"{name} lệch với phép chiếu chuẩn"
+
+    print(f"{'bộ giải mã':<20} {'ms/trang':>9} {'MB giữ lại':>11}")
+    for name, decode in decoders:
+        per_page, retained = measure(decode, pages, args.repeat)
+        print(f"{name:<20} {per_page * 1000:>9.2f} {retained / 2**20:>11.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+# benchmarks/bench_streaming_memory.py
+# So sánh bộ nhớ đỉnh (tracemalloc) của một lần phân tích khi:
+# - buffered: fetch_all_transactions giữ mọi trang rồi mới dựng FeatureState (cách cũ)
+# - streaming: stream_feature_state gộp từng trang vào FeatureState rồi bỏ đi
+# với lịch sử dài dần. Covalent được thay bằng httpx.MockTransport trả trang của
+# synthetic_workload.WorkloadGenerator (100 giao dịch/trang, đối tác Zipf, log ERC20) nên không cần mạng hay API key.
+#
+# Chạy: cd Model/API_Handling && python ../benchmarks/bench_streaming_memory.py --pages 5 20 50
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'API_Handling'))
+os.environ.setdefault('COVALENT_API_KEY', 'benchmark')
+os.environ['TX_CACHE_ENABLED'] = '0'
+
+import httpx  # noqa: E402
+import feature_engineering_api as fe  # noqa: E402
+from feature_state import FeatureState  # noqa: E402
+from fetch_scheduler import FetchScheduler  # noqa: E402
+from rate_limiter import AdaptiveRateLimiter  # noqa: E402
+from synthetic_workload import WorkloadGenerator  # noqa: E402
+
+ADDRESS = "0x" + "ab" * 20
+ITEMS_PER_PAGE = 100
+
+
+GENERATOR = WorkloadGenerator(seed=0)
+
+
+def make_page(page_number: int, total_pages: int) -> bytes:
+    """Một trang transactions_v3 giả lập của ví `total_pages` trang (sinh theo trang, không giữ lại giữa các request)."""
+    profile = GENERATOR.profile(total_pages * ITEMS_PER_PAGE)
+    return json.dumps(GENERATOR.covalent_page(ADDRESS, profile, page_number, ITEMS_PER_PAGE)).encode()
+
+
+def mock_client(total_pages: int) -> httpx.AsyncClient:
+    def handler(request: httpx.Request) -> httpx.Response:
+        page_number = int(request.url.params.get("page-number", 0))
+        return httpx.Response(200, content=make_page(page_number, total_pages),
+                              headers={"Content-Type": "application/json"})
+    return httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+
+async def buffered(client: httpx.AsyncClient) -> FeatureState:
+    items = await fe.fetch_all_transactions(ADDRESS, client)
+    return FeatureState.from_transactions(ADDRESS, items)
+
+
+async def streaming(client: httpx.AsyncClient) -> FeatureState:
+    state, _, _ = await fe.stream_feature_state(ADDRESS, client)
+    return state
+
+
+async def measure(mode, total_pages: int):
+    async with mock_client(total_pages) as client:
+        tracemalloc.start()
+        start = time.perf_counter()
+        state = await mode(client)
+        elapsed = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    return state, peak, elapsed
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pages", type=int, nargs="+", default=[5, 20, 50])
+    parser.add_argument("--in-flight", type=int, default=fe.MAX_PAGES_IN_FLIGHT)
+    args = parser.parse_args()
+
+    # Bỏ giới hạn tốc độ để chỉ đo bộ nhớ và CPU phía client
+    fe.MAX_PAGES_TO_FETCH = max(fe.MAX_PAGES_TO_FETCH, max(args.pages))
+    fe.MAX_PAGES_IN_FLIGHT = args.in_flight
+    fe.COVALENT_RATE_LIMITER = AdaptiveRateLimiter(1e6, burst=args.in_flight)
+    fe.FETCH_SCHEDULER = FetchScheduler(fe.COVALENT_RATE_LIMITER, args.in_flight)
+
+    print(f"{'trang':>6} {'giao dịch':>10} {'buffered MB':>12} {'streaming MB':>13} {'tỉ lệ':>7}")
+    for total_pages in args.pages:
+        ref_state, ref_peak, _ = await measure(buffered, total_pages)
+        state, peak, _ = await measure(streaming, total_pages)
+        assert state.to_features({"items": []}) == ref_state.to_features({"items": []}), "streaming lệch buffered"
+        print(f"{total_pages:>6} {state.txs.count:>10} {ref_peak / 2**20:>12.1f} {peak / 2**20:>13.1f} "
+              f"{ref_peak / peak:>6.1f}x")
+
+
+if __name__ == "__main__":
+    import logging
+    logging.disable(logging.INFO)
+    asyncio.run(main())
@@ -0,0 +1,266 @@
+# benchmarks/bench_suite.py
+# Bộ benchmark (pytest-benchmark) cho các đường nóng của việc chấm điểm:
+# - calculate_all_features / calculate_feature_vector theo kích thước ví (synthetic_workload.WALLET_SIZES)
+# - predict_address / predict_addresses (theo lô) / explain_address
+# - ControlCharacterCleaner và IntelligentImputer (các bước đã fit trong preprocessing_pipeline.pkl),
+#   cả pipeline so với kế hoạch đã biên dịch (preprocessing_plan.py)
+# - build_fraud_aware_graph (lấy nguyên hàm từ Training_Process/ethereum_retrain.py)
+# - xuất CSV và vẽ PNG của api_graph.py
+# - truy vấn FAISS của ChatbotService (knowledge_base_retriever), bỏ qua nếu thiếu faiss/langchain hoặc vector DB
+#
+# Mỗi benchmark giữ số vòng đo và vòng khởi động riêng (benchmark.pedantic). pytest-benchmark ghi kết quả
+# kèm commit và thông tin máy, và báo lỗi khi một lần chạy chậm hơn lần đã lưu quá ngưỡng.
+#
+# Chạy (cần pytest-benchmark):
+#   python -m pytest Model/benchmarks/bench_suite.py --benchmark-autosave --benchmark-storage=Model/benchmarks/results
+#   python -m pytest Model/benchmarks/bench_suite.py --benchmark-storage=Model/benchmarks/results \
+#       --benchmark-compare --benchmark-compare-fail=median:20%
+#   python -m pytest Model/benchmarks/bench_suite.py -k features --sizes small medium large
+#   python -m pytest Model/benchmarks/bench_suite.py --benchmark-json=out.json
+
+import contextlib
+import io
+import os
+import random
+from typing import Any, Callable, Dict
+
+import pytest
+
+import matplotlib
+matplotlib.use('Agg')
+
+from synthetic_workload import WorkloadGenerator  # noqa: E402
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+TRAINING_SCRIPT = os.path.join(BENCH_DIR, '..', 'Training_Process', 'ethereum_retrain.py')
+RAG_ROOT = os.path.join(BENCH_DIR, '..', '..', 'RAG_Chatbot')
+
+GENERATOR = WorkloadGenerator(seed=0)
+
+# InconsistentVersionWarning của pipeline.pkl, FutureWarning của torch
+pytestmark = pytest.mark.filterwarnings("ignore")
+
+
+def measure(benchmark, run: Callable[[], Any], rounds: int = 20, warmup: int = 2):
+    return benchmark.pedantic(run, rounds=rounds, warmup_rounds=warmup, iterations=1)
+
+
+@contextlib.contextmanager
+def quiet():
+    """Nuốt các dòng print của code được đo để không làm nhiễu kết quả."""
+    with contextlib.redirect_stdout(io.StringIO()):
+        yield
+
+
+@pytest.fixture(scope="session")
+def artifacts():
+    with quiet():
+        from model import load_artifacts
+        return load_artifacts('../Model/')
+
+
+@pytest.fixture(scope="session")
+def sklearn_pipeline():
+    """preprocessing_pipeline.pkl gốc (load_artifacts trả về kế hoạch đã biên dịch nếu có)."""
+    import joblib
+    return joblib.load('../Model/preprocessing_pipeline.pkl')
+
+
+def wallet(size: int):
+    address = GENERATOR.wallet_address("bench", size)
+    profile = GENERATOR.profile(size)
+    return address, list(GENERATOR.covalent_transactions(address, profile)), GENERATOR.covalent_balances(address)
+
+
+def dataset_frame(n_rows: int):
+    """Các dòng đặc trưng đọc giống lúc huấn luyện: bỏ cột chỉ mục, strip tên cột, bỏ FLAG."""
+    df = GENERATOR.feature_rows(n_rows)
+    df.columns = df.columns.str.strip()
+    return df.drop(columns='FLAG')
+
+
+# --- Đặc trưng ---
+def feature_rounds(size: int) -> int:
+    return 20 if size <= 10_000 else 3
+
+
+def test_calculate_all_features(benchmark, wallet_size):
+    from feature_engineering_api import calculate_all_features
+    address, items, balance = wallet(wallet_size)
+    measure(benchmark, lambda: calculate_all_features(address, items, balance), feature_rounds(wallet_size), warmup=1)
+
+
+def test_calculate_feature_vector(benchmark, wallet_size):
+    from feature_engineering_api import calculate_feature_vector
+    address, items, balance = wallet(wallet_size)
+    measure(benchmark, lambda: calculate_feature_vector(address, items, balance), feature_rounds(wallet_size), warmup=1)
+
+
+# --- Mô hình ---
+@pytest.fixture(scope="module")
+def model_features():
+    from feature_engineering_api import calculate_all_features
+    address, items, balance = wallet(1_000)
+    return calculate_all_features(address, items, balance)
+
+
+def test_predict_address(benchmark, artifacts, model_features):
+    from model import predict_address
+    model, pipeline, feat_names = artifacts
+    measure(benchmark, lambda: predict_address(model, pipeline, model_features, feat_names), rounds=200, warmup=10)
+
+
+def test_predict_addresses_batch_256(benchmark, artifacts, model_features):
+    from model import predict_addresses
+    model, pipeline, feat_names = artifacts
+    features = [model_features] * 256
+    measure(benchmark, lambda: predict_addresses(model, pipeline, features, feat_names), rounds=50, warmup=3)
+
+
+def test_explain_address(benchmark, artifacts, model_features):
+    from model import explain_address
+    model, pipeline, feat_names = artifacts
+
+    def run():
+        with quiet():
+            return explain_address(model, pipeline, model_features, feat_names)
+    measure(benchmark, run, rounds=100, warmup=5)
+
+
+def test_explain_addresses_batch_256(benchmark, artifacts, model_features):
+    from model import explain_addresses
+    model, pipeline, feat_names = artifacts
+    features = [model_features] * 256
+    measure(benchmark, lambda: explain_addresses(model, pipeline, features, feat_names), rounds=20, warmup=2)
+
+
+def test_reference_graph_predict(benchmark, artifacts):
+    from model import preprocess
+    from reference_graph import load_reference_graph
+    model, pipeline, feat_names = artifacts
+    with quiet():
+        reference = load_reference_graph('../Model/')
+    if reference is None:
+        pytest.skip("chưa có đồ thị tham chiếu (chạy reference_graph.py build)")
+    # Một dòng dạng tập dữ liệu (giống ví thật hơn ví giả lập từ giao dịch) để có láng giềng vượt ngưỡng
+    x = preprocess(pipeline, [dataset_frame(1).iloc[0].to_dict()], feat_names)
+    measure(benchmark, lambda: reference.predict(x), rounds=200, warmup=10)
+
+
+# --- Tiền xử lý ---
+ROWS = pytest.mark.parametrize("n_rows", [1, 10_000], ids=["rows=1", "rows=10000"])
+
+
+def preprocessing_rounds(n_rows: int) -> int:
+    return 200 if n_rows == 1 else 10
+
+
+@ROWS
+@pytest.mark.parametrize("step", ['control_char_cleaner', 'intelligent_imputer'])
+def test_pipeline_step(benchmark, sklearn_pipeline, step, n_rows):
+    frame = dataset_frame(n_rows)
+    # Cho dữ liệu qua các bước đứng trước để bước được đo nhận đúng đầu vào như lúc phục vụ
+    for name, transformer in sklearn_pipeline.steps:
+        if name == step:
+            break
+        frame = transformer.transform(frame)
+    else:
+        raise KeyError(step)
+    measure(benchmark, lambda: transformer.transform(frame), preprocessing_rounds(n_rows))
+
+
+@ROWS
+@pytest.mark.parametrize("compiled", [False, True], ids=["sklearn_pipeline", "compiled_plan"])
+def test_full_preprocessing(benchmark, sklearn_pipeline, compiled, n_rows):
+    from preprocessing_plan import compile_pipeline
+    frame = dataset_frame(n_rows)
+    transform = compile_pipeline(sklearn_pipeline).transform if compiled else sklearn_pipeline.transform
+    measure(benchmark, lambda: transform(frame), preprocessing_rounds(n_rows))
+
+
+# --- Đồ thị huấn luyện ---
+def training_function(name: str, namespace: Dict[str, Any]) -> Callable:
+    """
+    Lấy một hàm cấp module từ ethereum_retrain.py (script xuất từ notebook, không import được)
+    bằng cách cắt đúng khối `def` của nó và exec trong `namespace`.
+    """
+    with open(TRAINING_SCRIPT, encoding='utf-8') as f:
+        lines = f.read().splitlines()
+    start = next(i for i, line in enumerate(lines) if line.startswith(f"def {name}("))
+    end = next((i for i in range(start + 1, len(lines)) if lines[i] and not lines[i][0].isspace()), len(lines))
+    exec(compile("\n".join(lines[start:end]), TRAINING_SCRIPT, 'exec'), namespace)
+    return namespace[name]
+
+
+@pytest.mark.parametrize("n_rows", [2_000, 10_000], ids=["rows=2000", "rows=10000"])
+def test_build_fraud_aware_graph(benchmark, sklearn_pipeline, n_rows):
+    import numpy as np
+    import torch
+    from sklearn.neighbors import NearestNeighbors
+    from torch_geometric.data import Data
+    build = training_function('build_fraud_aware_graph',
+                              {'np': np, 'torch': torch, 'NearestNeighbors': NearestNeighbors, 'Data': Data})
+    rows = GENERATOR.feature_rows(n_rows)
+    X = sklearn_pipeline.transform(dataset_frame(n_rows))
+    y = rows['FLAG'].to_numpy()
+    measure(benchmark, lambda: build(X, y), rounds=5, warmup=1)
+
+
+# --- Báo cáo của api_graph.py ---
+@pytest.fixture(scope="module")
+def api_graph():
+    with quiet():
+        import api_graph
+    return api_graph
+
+
+@pytest.fixture(scope="module")
+def graph_report():
+    """Ví 500 giao dịch cùng dự đoán giả cho mọi đối tác của nó."""
+    address = GENERATOR.wallet_address("graph-report")
+    transactions = GENERATOR.etherscan_transactions(address, GENERATOR.profile(500))
+    rng = random.Random(0)
+    predictions = {}
+    for tx in transactions:
+        for addr in (tx['from'], tx['to']):
+            if addr and addr != address and addr not in predictions:
+                probability = rng.random()
+                predictions[addr] = {"address": addr, "probability_fraud": probability,
+                                     "prediction": "fraud" if probability > 0.5 else "non-fraud"}
+    return address, transactions, predictions
+
+
+def test_export_transactions_to_csv_buffer(benchmark, api_graph, graph_report):
+    address, transactions, predictions = graph_report
+
+    def run():
+        with quiet():
+            return api_graph.export_transactions_to_csv_buffer(transactions, predictions, address)
+    measure(benchmark, run, rounds=20)
+
+
+def test_draw_transaction_graph_to_buffer(benchmark, api_graph, graph_report):
+    address, transactions, predictions = graph_report
+
+    def run():
+        with quiet():
+            return api_graph.draw_transaction_graph_to_buffer(address, transactions, predictions)
+    measure(benchmark, run, rounds=3, warmup=1)
+
+
+# --- RAG ---
+def test_faiss_similarity_search(benchmark):
+    """Cùng truy vấn với knowledge_base_retriever: vectordb.similarity_search(query, k=3)."""
+    dotenv = pytest.importorskip("dotenv", reason="thiếu thư viện RAG (python-dotenv)")
+    vectorstores = pytest.importorskip("langchain_community.vectorstores", reason="thiếu thư viện RAG (langchain)")
+    embeddings = pytest.importorskip("langchain_huggingface", reason="thiếu thư viện RAG (langchain_huggingface)")
+    env = dotenv.dotenv_values(os.path.join(RAG_ROOT, 'backend', '.env'))
+    db_path = env.get("VECTOR_DB_PATH")
+    if not db_path or not os.path.isdir(os.path.join(RAG_ROOT, db_path)):
+        pytest.skip("chưa có vector DB (chạy RAG_Chatbot/scripts/build_vectordb.py)")
+    # Không khởi tạo ChatbotService: nó cần Ollama, còn ở đây chỉ đo phần truy vấn vector DB
+    vectordb = vectorstores.FAISS.load_local(os.path.join(RAG_ROOT, db_path),
+                                             embeddings.HuggingFaceEmbeddings(model_name=env["EMBEDDING_MODEL_NAME"]),
+                                             allow_dangerous_deserialization=True)
+    measure(benchmark, lambda: vectordb.similarity_search("Dấu hiệu của một ví lừa đảo airdrop ERC20 là gì?", k=3),
+            rounds=50, warmup=3)
@@ -0,0 +1,153 @@
+# benchmarks/bench_worker_memory.py
+# Bộ nhớ mỗi worker của app.py theo cách triển khai nhiều worker:
+#   - "trong tiến trình": N tiến trình độc lập, mỗi tiến trình tự nạp mô hình (mặc định, uvicorn --workers N);
+#   - "preload + fork":   nạp một lần rồi fork N worker, chia sẻ copy-on-write (gunicorn --preload);
+#   - "model server":     một model_server.py giữ mô hình, N worker chỉ giữ ModelClient (MODEL_SERVER_SOCKET).
+# Mỗi worker import app, chạy thử predict/explain/neighborhood rồi đứng yên; số đo lấy từ
+# /proc/<pid>/smaps_rollup (Linux): RSS, PSS (phần trang dùng chung chia đều) và USS (trang riêng).
+# Tổng PSS của mọi tiến trình (kể cả master/model server) là bộ nhớ thật cả cấu hình chiếm.
+#
+# Chạy: python Model/benchmarks/bench_worker_memory.py --workers 4
+
+import argparse
+import json
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+API_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'API_Handling')
+
+WARM = r'''
+import warnings
+warnings.simplefilter('ignore')
+import app
+from feature_schema import FeatureVector, default_schema
+rows = [FeatureVector(default_schema()) for _ in range(64)]
+def warm():
+    app.MODEL.predict(rows)
+    app.MODEL.explain(rows)
+    app.MODEL.neighborhood(rows[:1])
+'''
+
+# Một worker: báo pid (một lần write để các worker fork cùng lúc không chen dòng của nhau) rồi chờ bị kết thúc
+WORKER = WARM + r'''
+import os, signal
+warm()
+os.write(1, f"{os.getpid()}\n".encode())
+signal.pause()
+'''
+
+# Master kiểu gunicorn --preload: nạp + chạy thử rồi fork; worker chạy thử lại sau khi fork như khi nhận request
+PRELOAD = WARM + r'''
+import os, signal, sys
+sys.stdout.flush()
+warm()
+os.write(1, f"{os.getpid()}\n".encode())
+for _ in range(int(sys.argv[1])):
+    if os.fork() == 0:
+        warm()
+        os.write(1, f"{os.getpid()}\n".encode())
+        signal.pause()
+signal.pause()
+'''
+
+
+def memory_mb(pid: int) -> Dict[str, float]:
+    fields = {}
+    with open(f'/proc/{pid}/smaps_rollup', 'r') as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == 'kB':
+                fields[parts[0].rstrip(':')] = int(parts[1]) / 1024
+    return {"rss": fields["Rss"], "pss": fields["Pss"],
+            "uss": fields["Private_Clean"] + fields["Private_Dirty"]}
+
+
+def spawn(script: str, args: List[str], env: Dict[str, str], pids: int) -> (subprocess.Popen, List[int]):
+    process = subprocess.Popen([sys.executable, "-c", script, *args], cwd=API_DIR, env=env,
+                               stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True, start_new_session=True)
+    found = []
+    while len(found) < pids:
+        line = process.stdout.readline()
+        if not line:
+            raise RuntimeError(f"Tiến trình con thoát sớm (mã {process.wait()})")
+        if line.strip().isdigit():
+            found.append(int(line))
+    return process, found
+
+
+def stop(process: subprocess.Popen) -> None:
+    os.killpg(process.pid, signal.SIGTERM)
+    process.wait()
+
+
+def in_process(workers: int, env: Dict[str, str]):
+    processes = [spawn(WORKER, [], env, 1) for _ in range(workers)]
+    try:
+        return [memory_mb(pids[0]) for _, pids in processes], None
+    finally:
+        for process, _ in processes:
+            stop(process)
+
+
+def preload_fork(workers: int, env: Dict[str, str]):
+    process, pids = spawn(PRELOAD, [str(workers)], env, workers + 1)
+    try:
+        return [memory_mb(pid) for pid in pids[1:]], memory_mb(pids[0])
+    finally:
+        stop(process)
+
+
+def model_server(workers: int, env: Dict[str, str]):
+    socket_path = os.path.join(tempfile.mkdtemp(), 'model.sock')
+    server = subprocess.Popen([sys.executable, "model_server.py", "--socket", socket_path], cwd=API_DIR, env=env,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, start_new_session=True)
+    try:
+        env = {**env, "MODEL_SERVER_SOCKET": socket_path}
+        processes = [spawn(WORKER, [], env, 1) for _ in range(workers)]
+        try:
+            return [memory_mb(pids[0]) for _, pids in processes], memory_mb(server.pid)
+        finally:
+            for process, _ in processes:
+                stop(process)
+    finally:
+        stop(server)
+
+
+CONFIGS = {"trong tiến trình": in_process, "preload + fork": preload_fork, "model server": model_server}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--json", action="store_true", help="in kết quả dạng JSON")
+    args = parser.parse_args()
+
+    env = {k: v for k, v in os.environ.items() if k != "MODEL_SERVER_SOCKET"}
+    env["MODEL_REGISTRY_POLL_SECONDS"] = "0"
+    env["MODEL_LOAD"] = "eager"   # worker không chạy lifespan: nạp mô hình ngay lúc import app
+    results = {}
+    for name, run in CONFIGS.items():
+        per_worker, shared = run(args.workers, env)
+        mean = {key: sum(m[key] for m in per_worker) / len(per_worker) for key in ("rss", "pss", "uss")}
+        results[name] = {"worker_mean_mb": mean, "shared_process_mb": shared,
+                         "total_pss_mb": sum(m["pss"] for m in per_worker) + (shared["pss"] if shared else 0.0)}
+        time.sleep(0.5)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{args.workers} worker; MB, trung bình mỗi worker (tiến trình dùng chung: master/model server)")
+    print(f"{'cấu hình':<18} {'RSS':>7} {'PSS':>7} {'USS':>7} {'PSS chung':>10} {'tổng PSS':>9}")
+    for name, r in results.items():
+        m, shared = r["worker_mean_mb"], r["shared_process_mb"]
+        print(f"{name:<18} {m['rss']:>7.1f} {m['pss']:>7.1f} {m['uss']:>7.1f} "
+              f"{(shared['pss'] if shared else 0.0):>10.1f} {r['total_pss_mb']:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+# benchmarks/conftest.py
+# Cấu hình pytest cho bench_suite.py: đường dẫn import của API_Handling, thư mục làm việc khi đo
+# và tuỳ chọn --sizes chọn kích thước ví cho các benchmark đặc trưng.
+
+import os
+import sys
+
+import pytest
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+API_DIR = os.path.join(BENCH_DIR, '..', 'API_Handling')
+
+sys.path.insert(0, API_DIR)
+os.environ.setdefault('COVALENT_API_KEY', 'benchmark')
+os.environ['TX_CACHE_ENABLED'] = '0'
+
+from synthetic_workload import WALLET_SIZES  # noqa: E402
+
+
+def pytest_addoption(parser):
+    parser.addoption("--sizes", nargs="+", choices=list(WALLET_SIZES), default=["small", "medium"],
+                     help="kích thước ví cho benchmark đặc trưng (synthetic_workload.WALLET_SIZES)")
+
+
+def pytest_generate_tests(metafunc):
+    if "wallet_size" in metafunc.fixturenames:
+        labels = metafunc.config.getoption("sizes")
+        metafunc.parametrize("wallet_size", [WALLET_SIZES[label] for label in labels],
+                             ids=[f"{label}={WALLET_SIZES[label]}" for label in labels])
+
+
+@pytest.fixture(scope="session", autouse=True)
+def api_working_dir():
+    """
+    model.py và api_graph.py dùng đường dẫn tương đối '../Model/'. Chỉ đổi thư mục trong lúc đo để
+    --benchmark-json / --benchmark-storage trên dòng lệnh vẫn tính theo thư mục gọi.
+    """
+    previous = os.getcwd()
+    os.chdir(API_DIR)
+    yield
+    os.chdir(previous)
@@ -0,0 +1,250 @@
+# benchmarks/mock_upstream.py
+# Server giả lập cục bộ cho Covalent (transactions_v3, balances_v2) và Etherscan (txlist),
+# để benchmark và kiểm thử hồi quy feature_engineering_api.py, api_graph.py và Graph/API/API_graph.py
+# mà không cần API key hay mạng.
+#
+# Dữ liệu: fixture đã ghi lại trong benchmarks/fixtures/<địa chỉ viết thường>/
+#   transactions_v3_p<N>.json, balances_v2.json, txlist.json (body gốc của API),
+# nếu không có thì sinh dữ liệu giả lập bằng synthetic_workload.WorkloadGenerator (xác định theo seed, địa chỉ).
+# Có thể cấu hình: latency (+ jitter), kích thước trang, tỉ lệ 429 (kèm Retry-After), tỉ lệ 5xx
+# và tỉ lệ request bị treo (để client timeout). Cấu hình đổi được lúc chạy qua POST /_mock/config.
+#
+# Chạy server:
+#   python Model/benchmarks/mock_upstream.py serve --port 9000 --latency-ms 80 --rate-429 0.05
+# rồi trỏ các fetcher sang nó:
+#   COVALENT_BASE_URL=http://127.0.0.1:9000/v1 ETHERSCAN_API_URL=http://127.0.0.1:9000/api
+#   FRAUD_API_URL=http://127.0.0.1:8000/analyze   (cho Graph/API/API_graph.py)
+# Ghi fixture thật (cần COVALENT_API_KEY / ETHERSCAN_API_KEY):
+#   python Model/benchmarks/mock_upstream.py record 0x... --pages 3
+# Dùng trong tiến trình (không mở cổng): httpx.AsyncClient(transport=httpx.ASGITransport(app=create_app(...)))
+
+import argparse
+import asyncio
+import json
+import os
+import random
+from collections import Counter
+from typing import Dict, Optional
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response
+from pydantic import BaseModel
+
+from synthetic_workload import WorkloadGenerator
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+
+class MockConfig(BaseModel):
+    latency_ms: float = 0.0             # độ trễ cố định của mỗi response
+    jitter_ms: float = 0.0              # cộng thêm ngẫu nhiên đều trong [0, jitter_ms]
+    page_size: int = 100                # số giao dịch mỗi trang transactions_v3 giả lập
+    rate_429: float = 0.0               # xác suất trả về 429
+    retry_after_seconds: float = 1.0    # giá trị header Retry-After của các response 429
+    rate_5xx: float = 0.0               # xác suất trả về 503
+    rate_timeout: float = 0.0           # xác suất treo `hang_seconds` trước khi trả lời
+    hang_seconds: float = 30.0
+    synthetic_transactions: int = 250   # số giao dịch của mỗi ví giả lập
+    wallet_sizes: Dict[str, int] = {}   # số giao dịch riêng cho từng địa chỉ (viết thường)
+    erc20_logs_per_tx: float = 1.5
+    seed: int = 0
+
+
+class FixtureStore:
+    """Đọc fixture đã ghi; trả về None nếu địa chỉ không có fixture tương ứng."""
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def _read(self, address: str, name: str) -> Optional[bytes]:
+        path = os.path.join(self.root, address.lower(), name)
+        if not os.path.exists(path):
+            return None
+        with open(path, 'rb') as f:
+            return f.read()
+
+    def transactions_page(self, address: str, page: int) -> Optional[bytes]:
+        if not os.path.isdir(os.path.join(self.root, address.lower())):
+            return None
+        body = self._read(address, f"transactions_v3_p{page}.json")
+        if body is None:
+            # Sau trang cuối đã ghi: trang rỗng
+            return json.dumps({"data": {"items": [], "pagination": {"has_more": False}}, "error": False}).encode()
+        return body
+
+    def balances(self, address: str) -> Optional[bytes]:
+        return self._read(address, "balances_v2.json")
+
+    def txlist(self, address: str) -> Optional[bytes]:
+        return self._read(address, "txlist.json")
+
+
+def create_app(config: Optional[MockConfig] = None, fixtures_dir: str = FIXTURES_DIR) -> FastAPI:
+    app = FastAPI(title="Mock Covalent/Etherscan upstream")
+    app.state.config = config or MockConfig()
+    app.state.stats = Counter()
+    app.state.rng = random.Random(app.state.config.seed)
+    app.state.generator = WorkloadGenerator(app.state.config.seed)
+    store = FixtureStore(fixtures_dir)
+
+    def wallet_profile(address: str):
+        cfg: MockConfig = app.state.config
+        size = cfg.wallet_sizes.get(address.lower(), cfg.synthetic_transactions)
+        return app.state.generator.profile(size, erc20_logs_per_tx=cfg.erc20_logs_per_tx)
+
+    async def inject_faults(kind: str, covalent: bool) -> Optional[Response]:
+        """Áp dụng latency và các lỗi giả lập; trả về response lỗi hoặc None để phục vụ bình thường."""
+        cfg: MockConfig = app.state.config
+        rng: random.Random = app.state.rng
+        stats: Counter = app.state.stats
+        stats[f"{kind}_requests"] += 1
+        roll = rng.random()
+        if roll < cfg.rate_429:
+            stats["throttled"] += 1
+            body = ({"error": True, "error_message": "Too many requests", "error_code": 429} if covalent
+                    else {"status": "0", "message": "NOTOK", "result": "Max rate limit reached"})
+            return JSONResponse(body, status_code=429,
+                                headers={"Retry-After": f"{cfg.retry_after_seconds:g}"})
+        roll -= cfg.rate_429
+        if roll < cfg.rate_5xx:
+            stats["server_errors"] += 1
+            return JSONResponse({"error": True, "error_message": "Service unavailable", "error_code": 503},
+                                status_code=503)
+        roll -= cfg.rate_5xx
+        if roll < cfg.rate_timeout:
+            stats["hung"] += 1
+            await asyncio.sleep(cfg.hang_seconds)
+        delay = cfg.latency_ms + (rng.uniform(0, cfg.jitter_ms) if cfg.jitter_ms else 0.0)
+        if delay > 0:
+            await asyncio.sleep(delay / 1000)
+        return None
+
+    def json_bytes(body: bytes) -> Response:
+        return Response(content=body, media_type="application/json")
+
+    @app.get("/v1/{chain}/address/{address}/transactions_v3/")
+    @app.get("/v1/{chain}/address/{address}/transactions_v3/page/{page}/")
+    async def transactions_v3(chain: str, address: str, request: Request, page: Optional[int] = None):
+        fault = await inject_faults("transactions_v3", covalent=True)
+        if fault is not None:
+            return fault
+        if page is None:
+            page = int(request.query_params.get("page-number", 0))
+        recorded = store.transactions_page(address, page)
+        if recorded is not None:
+            return json_bytes(recorded)
+        return app.state.generator.covalent_page(address, wallet_profile(address), page, app.state.config.page_size)
+
+    @app.get("/v1/{chain}/address/{address}/balances_v2/")
+    async def balances_v2(chain: str, address: str):
+        fault = await inject_faults("balances_v2", covalent=True)
+        if fault is not None:
+            return fault
+        recorded = store.balances(address)
+        if recorded is not None:
+            return json_bytes(recorded)
+        return app.state.generator.covalent_balances(address)
+
+    @app.get("/api")
+    async def etherscan(request: Request):
+        params = request.query_params
+        if params.get("module") != "account" or params.get("action") != "txlist":
+            return {"status": "0", "message": "NOTOK", "result": "Mock chỉ hỗ trợ module=account&action=txlist"}
+        fault = await inject_faults("txlist", covalent=False)
+        if fault is not None:
+            return fault
+        address = params.get("address", "")
+        recorded = store.txlist(address)
+        if recorded is not None:
+            return json_bytes(recorded)
+        result = app.state.generator.etherscan_transactions(address, wallet_profile(address), params.get("sort", "asc"))
+        page, offset = int(params.get("page", 1)), int(params.get("offset", 0))
+        if offset:
+            result = result[(page - 1) * offset:page * offset]
+        if not result:
+            return {"status": "0", "message": "No transactions found", "result": []}
+        return {"status": "1", "message": "OK", "result": result}
+
+    @app.get("/_mock/config")
+    async def get_config():
+        return app.state.config
+
+    @app.post("/_mock/config")
+    async def set_config(config: MockConfig):
+        app.state.config = config
+        app.state.rng = random.Random(config.seed)
+        app.state.generator = WorkloadGenerator(config.seed)
+        return config
+
+    @app.get("/_mock/stats")
+    async def get_stats():
+        return dict(app.state.stats)
+
+    @app.post("/_mock/reset")
+    async def reset_stats():
+        app.state.stats.clear()
+        return {}
+
+    return app
+
+
+def record(address: str, pages: int, fixtures_dir: str = FIXTURES_DIR) -> None:
+    """Ghi body gốc của Covalent và Etherscan cho một địa chỉ vào fixtures_dir/<địa chỉ>/."""
+    import httpx
+    from dotenv import load_dotenv
+    load_dotenv()
+    target = os.path.join(fixtures_dir, address.lower())
+    os.makedirs(target, exist_ok=True)
+    covalent = {"Authorization": f"Bearer {os.environ['COVALENT_API_KEY']}"}
+    base = "https://api.covalenthq.com/v1/eth-mainnet/address"
+
+    def save(name: str, content: bytes) -> None:
+        with open(os.path.join(target, name), 'wb') as f:
+            f.write(content)
+        print(f"Đã ghi {os.path.join(target, name)} ({len(content)} byte)")
+
+    with httpx.Client(timeout=120) as client:
+        for page in range(pages):
+            res = client.get(f"{base}/{address}/transactions_v3/?page-number={page}", headers=covalent)
+            res.raise_for_status()
+            save(f"transactions_v3_p{page}.json", res.content)
+            if not res.json()["data"]["pagination"]["has_more"]:
+                break
+        res = client.get(f"{base}/{address}/balances_v2/", headers=covalent)
+        res.raise_for_status()
+        save("balances_v2.json", res.content)
+        if os.environ.get("ETHERSCAN_API_KEY"):
+            res = client.get("https://api.etherscan.io/api", params={
+                "module": "account", "action": "txlist", "address": address, "startblock": 0,
+                "endblock": 99999999, "sort": "asc", "apikey": os.environ["ETHERSCAN_API_KEY"]})
+            res.raise_for_status()
+            save("txlist.json", res.content)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    sub = parser.add_subparsers(dest="command", required=True)
+    serve = sub.add_parser("serve")
+    serve.add_argument("--host", default="127.0.0.1")
+    serve.add_argument("--port", type=int, default=9000)
+    serve.add_argument("--fixtures", default=FIXTURES_DIR)
+    for name, field in MockConfig.model_fields.items():
+        if name == "wallet_sizes":
+            continue
+        serve.add_argument(f"--{name.replace('_', '-')}", type=type(field.default), default=field.default)
+    rec = sub.add_parser("record")
+    rec.add_argument("address")
+    rec.add_argument("--pages", type=int, default=3)
+    rec.add_argument("--fixtures", default=FIXTURES_DIR)
+    args = parser.parse_args()
+
+    if args.command == "record":
+        record(args.address, args.pages, args.fixtures)
+        return
+    import uvicorn
+    config = MockConfig(**{name: getattr(args, name) for name in MockConfig.model_fields if name != "wallet_sizes"})
+    uvicorn.run(create_app(config, args.fixtures), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
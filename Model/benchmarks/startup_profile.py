@@ -0,0 +1,146 @@
+# benchmarks/startup_profile.py
+# Ngân sách thời gian khởi động của các service FastAPI.
+#
+# Với mỗi module (app, api_graph, model_server, RAG_Chatbot.backend.app.main, ...) chạy một tiến trình Python
+# mới `python -X importtime -c "import <module>"` và báo:
+#   - thời gian import thực (wall) của cả module;
+#   - bảng phân rã theo gói cấp cao nhất (tổng thời gian "self" của mọi module con: numpy, pandas, torch, ...),
+#     N gói tốn nhất;
+#   - --serve: khởi động uvicorn trên một cổng trống và đo thời gian tới khi /healthz (tiến trình đã lên)
+#     và /readyz (mô hình đã nạp và chạy thử) trả 200.
+# --budget GIÂY: thoát với mã 1 nếu thời gian import (hoặc thời gian tới /healthz khi có --serve) vượt ngân sách,
+# để dùng làm cổng kiểm tra trong CI.
+#
+# Chạy:
+#   python Model/benchmarks/startup_profile.py app api_graph --budget 1.5
+#   python Model/benchmarks/startup_profile.py app --serve --top 10
+#   python Model/benchmarks/startup_profile.py RAG_Chatbot.backend.app.main --cwd .
+
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+
+API_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'API_Handling')
+
+CHILD = r'''
+import sys, time, warnings
+warnings.simplefilter('ignore')
+start = time.perf_counter()
+__import__(sys.argv[1])
+sys.stdout.write(f"{time.perf_counter() - start}\n")
+'''
+
+
+def parse_importtime(stderr: str) -> Dict[str, float]:
+    """Tổng thời gian self (giây) theo gói cấp cao nhất từ đầu ra của -X importtime."""
+    packages: Dict[str, float] = defaultdict(float)
+    for line in stderr.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        fields = line[len('import time:'):].split('|')
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            continue   # dòng tiêu đề
+        packages[fields[2].strip().split('.')[0]] += int(fields[0]) / 1e6
+    return dict(packages)
+
+
+def profile_imports(module: str, cwd: str, env: Dict[str, str]) -> Tuple[float, Dict[str, float]]:
+    out = subprocess.run([sys.executable, "-X", "importtime", "-c", CHILD, module], cwd=cwd, env=env,
+                         capture_output=True, text=True)
+    if out.returncode:
+        raise RuntimeError(f"import {module} thất bại:\n{out.stderr[-2000:]}")
+    return float(out.stdout.strip().splitlines()[-1]), parse_importtime(out.stderr)
+
+
+def _free_port() -> int:
+    with socket.socket() as probe:
+        probe.bind(('127.0.0.1', 0))
+        return probe.getsockname()[1]
+
+
+def _status(url: str) -> Optional[int]:
+    try:
+        with urllib.request.urlopen(url, timeout=1) as response:
+            return response.status
+    except urllib.error.HTTPError as e:
+        return e.code
+    except OSError:
+        return None
+
+
+def profile_serve(module: str, cwd: str, env: Dict[str, str], timeout: float) -> Dict[str, Optional[float]]:
+    """Giây từ lúc chạy uvicorn tới khi /healthz và /readyz lần đầu trả 200 (None nếu quá timeout)."""
+    port = _free_port()
+    base = f"http://127.0.0.1:{port}"
+    start = time.perf_counter()
+    server = subprocess.Popen([sys.executable, "-m", "uvicorn", f"{module}:app", "--port", str(port),
+                               "--log-level", "warning"], cwd=cwd, env=env,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    timings: Dict[str, Optional[float]] = {"healthz": None, "readyz": None}
+    try:
+        while time.perf_counter() - start < timeout and None in timings.values():
+            if server.poll() is not None:
+                raise RuntimeError(f"uvicorn {module}:app thoát sớm (mã {server.returncode})")
+            for probe in [name for name, seconds in timings.items() if seconds is None]:
+                if _status(f"{base}/{probe}") == 200:
+                    timings[probe] = time.perf_counter() - start
+            time.sleep(0.02)
+    finally:
+        server.terminate()
+        server.wait()
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Thời gian import/khởi động của các service và gói tốn thời gian nhất")
+    parser.add_argument("modules", nargs="+", help="module cần đo, ví dụ app api_graph")
+    parser.add_argument("--cwd", default=API_DIR, help="thư mục chạy (mặc định Model/API_Handling)")
+    parser.add_argument("--top", type=int, default=12, help="số gói hiển thị")
+    parser.add_argument("--serve", action="store_true", help="đo thêm thời gian tới /healthz và /readyz qua uvicorn")
+    parser.add_argument("--timeout", type=float, default=120.0, help="giây chờ /readyz khi --serve")
+    parser.add_argument("--budget", type=float, help="ngân sách giây cho import (hoặc /healthz khi --serve)")
+    parser.add_argument("--json", action="store_true", help="in kết quả dạng JSON")
+    args = parser.parse_args()
+
+    env = {**os.environ, "MODEL_REGISTRY_POLL_SECONDS": "0"}
+    results = {}
+    for module in args.modules:
+        seconds, packages = profile_imports(module, args.cwd, env)
+        results[module] = {"import_seconds": seconds,
+                           "packages": dict(sorted(packages.items(), key=lambda item: -item[1])[:args.top])}
+        if args.serve:
+            results[module]["serve"] = profile_serve(module, args.cwd, env, args.timeout)
+
+    over: List[str] = []
+    for module, r in results.items():
+        startup = r["serve"]["healthz"] if args.serve else r["import_seconds"]
+        if args.budget is not None and (startup is None or startup > args.budget):
+            over.append(module)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        for module, r in results.items():
+            print(f"\n{module}: import {r['import_seconds']:.2f}s")
+            if "serve" in r:
+                live, ready = r["serve"]["healthz"], r["serve"]["readyz"]
+                print(f"  /healthz sau {live:.2f}s" if live is not None else "  /healthz: không trả 200")
+                print(f"  /readyz  sau {ready:.2f}s" if ready is not None else "  /readyz: không trả 200")
+            print(f"  {'gói':<28} {'giây':>7}")
+            for package, package_seconds in r["packages"].items():
+                print(f"  {package:<28} {package_seconds:>7.3f}")
+    if over:
+        print(f"\n⚠️ Vượt ngân sách {args.budget:.2f}s: {', '.join(over)}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,7 @@
 # backend/app/api.py
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
-from RAG_Chatbot.backend.app.services.chatbot_service import chatbot_service
+from RAG_Chatbot.backend.app.services.chatbot_service import get_chatbot_service
 # Pydantic model để xác thực dữ liệu đầu vào. Luôn làm điều này.
 class ChatRequest(BaseModel):
     question: str
@@ -18,7 +18,8 @@ def handle_chat(request: ChatRequest):
         raise HTTPException(status_code=400, detail="Câu hỏi không được để trống.")
     
     try:
-        answer = chatbot_service.ask(request.question)
+        # Request đến trong lúc main.py còn khởi tạo nền sẽ chờ ở đây tới khi xong
+        answer = get_chatbot_service().ask(request.question)
         return {"answer": answer}
     except Exception as e:
         # Bắt lỗi chung để API không bị sập
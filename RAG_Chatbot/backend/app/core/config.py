@@ -1,13 +1,14 @@
 # RAG_chatbot/backend/app/core/config.py
+import logging
 import os
 from pathlib import Path  # Dùng pathlib để xử lý đường dẫn cho chuyên nghiệp
 from dotenv import load_dotenv
 
 # ==============================================================================
-# PHẦN DEBUG ĐƯỜNG DẪN - KHÔNG THỂ SAI ĐƯỢC
+# ĐƯỜNG DẪN
+# Module được import khi khởi động nên không in banner; chi tiết đường dẫn ở mức DEBUG của logging.
 # ==============================================================================
-print("\n" + "="*60)
-print("--- KHỞI ĐỘNG MODULE CONFIG ---")
+logger = logging.getLogger(__name__)
 
 # Path(biến) sẽ tạo ra một đối tượng đường dẫn thông minh.
 # __file__ là đường dẫn đến file này (config.py)
@@ -19,12 +20,8 @@ RAG_CHATBOT_ROOT = CONFIG_FILE_PATH.parent.parent.parent.parent
 # Đường dẫn đến file .env được xây dựng từ gốc đó
 DOTENV_PATH = RAG_CHATBOT_ROOT / "backend" / ".env"
 
-print(f"Thư mục làm việc hiện tại (CWD): {Path.cwd()}")
-print(f"Đường dẫn file config.py được giải quyết: {CONFIG_FILE_PATH}")
-print(f"Đường dẫn gốc RAG_CHATBOT_ROOT được tính toán: {RAG_CHATBOT_ROOT}")
-print(f"Đường dẫn file .env đang tìm kiếm: {DOTENV_PATH}")
-print(f"File .env có tồn tại ở đường dẫn trên không? {'CÓ' if DOTENV_PATH.exists() else 'KHÔNG. ĐÂY LÀ VẤN ĐỀ CHÍNH!'}")
-print("="*60 + "\n")
+logger.debug(f"CWD: {Path.cwd()} | config.py: {CONFIG_FILE_PATH} | RAG_CHATBOT_ROOT: {RAG_CHATBOT_ROOT} | "
+             f".env: {DOTENV_PATH} (tồn tại: {DOTENV_PATH.exists()})")
 
 # ==============================================================================
 # TẢI BIẾN MÔI TRƯỜNG
@@ -53,7 +50,7 @@ try:
     ANOMALY_API_URL = get_env_var("ANOMALY_API_URL")
     GRAPH_API_URL = get_env_var("GRAPH_API_URL")
 except ValueError as e:
-    print(f"LỖI NGHIÊM TRỌNG KHI TẢI CẤU HÌNH: {e}")
+    logger.critical(f"LỖI NGHIÊM TRỌNG KHI TẢI CẤU HÌNH: {e}")
     # Thoát tiến trình nếu cấu hình sai, để server không khởi động với trạng thái lỗi
     import sys
     sys.exit(1)
\ No newline at end of file
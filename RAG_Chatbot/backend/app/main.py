@@ -1,16 +1,68 @@
 # backend/app/main.py
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+from typing import Optional
+
 from fastapi import FastAPI
+from fastapi.responses import JSONResponse
 from RAG_Chatbot.backend.app.api import router as api_router
+from RAG_Chatbot.backend.app.services.chatbot_service import get_chatbot_service, chatbot_service_ready
+
+# Khởi tạo ChatbotService (embedding HuggingFace + FAISS + Ollama) chạy nền sau khi server lên:
+# /healthz trả 200 ngay, /readyz trả 200 khi chatbot đã sẵn sàng; lỗi được thử lại sau chừng này giây
+WARMUP_RETRY_SECONDS = 10
+STARTED_AT = time.monotonic()
+warmup_error: Optional[str] = None
+
+
+async def warm_up_chatbot():
+    global warmup_error
+    while not chatbot_service_ready():
+        try:
+            await asyncio.to_thread(get_chatbot_service)
+            warmup_error = None
+        except Exception as e:
+            warmup_error = f"{type(e).__name__}: {e}"
+            logging.warning(f"Không khởi tạo được ChatbotService ({warmup_error}), thử lại sau {WARMUP_RETRY_SECONDS}s")
+            await asyncio.sleep(WARMUP_RETRY_SECONDS)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    warmup = asyncio.create_task(warm_up_chatbot())
+    try:
+        yield
+    finally:
+        warmup.cancel()
+
 
 app = FastAPI(
     title="RAG Chatbot API",
     description="API cho chatbot phát hiện giao dịch bất thường trên blockchain.",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 @app.get("/", tags=["Status"])
 def read_root():
     return {"status": "API is running"}
 
+@app.get("/healthz", tags=["Status"])
+async def healthz():
+    """Liveness: tiến trình đang chạy, không phụ thuộc mô hình."""
+    return {"status": "ok"}
+
+@app.get("/readyz", tags=["Status"])
+async def readyz():
+    """Readiness: 200 khi mô hình embedding, vector DB và LLM đã được khởi tạo."""
+    readiness = {"ready": chatbot_service_ready(), "error": warmup_error,
+                 "uptime_seconds": round(time.monotonic() - STARTED_AT, 3)}
+    if not readiness["ready"]:
+        return JSONResponse(status_code=503, headers={"Retry-After": str(WARMUP_RETRY_SECONDS // 2)},
+                            content=readiness)
+    return readiness
+
 # Gắn router API vào ứng dụng chính
-app.include_router(api_router, prefix="/api/v1")
\ No newline at end of file
+app.include_router(api_router, prefix="/api/v1")
@@ -2,13 +2,14 @@
 import httpx
 import re
 import json
-from langchain_huggingface import HuggingFaceEmbeddings
-from langchain_community.vectorstores import FAISS
-from langchain_community.llms import Ollama
+import threading
+from typing import Optional
 from langchain.tools import tool
-from duckduckgo_search import DDGS
 from RAG_Chatbot.backend.app.core import config
 
+# HuggingFaceEmbeddings, FAISS, Ollama và DDGS được import trong hàm dùng chúng: import module này (và khởi
+# động server) không nạp mô hình embedding; ChatbotService chỉ được tạo ở get_chatbot_service() đầu tiên.
+
 # ==============================================================================
 # --- ĐỊNH NGHĨA CÁC TOOL BÊN NGOÀI CLASS ---
 # Các tool này là các hàm độc lập.
@@ -21,6 +22,7 @@ def internet_search(query: str) -> str:
     Sử dụng để tìm kiếm thông tin mới nhất trên Internet về các sự kiện, tin tức, giá cả, hoặc kiến thức chung.
     """
     print(f"--- [Tool Call] internet_search với query: {query} ---")
+    from duckduckgo_search import DDGS
     try:
         with DDGS(timeout=20) as ddgs:
             results = ddgs.text(query, region='us-en', max_results=7) # Lấy nhiều hơn một chút để có cái mà lọc
@@ -66,7 +68,7 @@ def knowledge_base_retriever(query: str) -> str:
     # --- TRUY CẬP INSTANCE chatbot_service ĐỂ LẤY VECTORDB ---
     # Đây là một "trick" nhỏ: vì chatbot_service là một instance toàn cục trong module này,
     # tool có thể gọi nó để truy cập các thuộc tính như vectordb.
-    docs = chatbot_service.vectordb.similarity_search(query, k=3)
+    docs = get_chatbot_service().vectordb.similarity_search(query, k=3)
     if not docs:
         return "Không tìm thấy thông tin liên quan."
     return "\n---\n".join([doc.page_content for doc in docs])
@@ -345,6 +347,9 @@ class ManualAgent:
 class ChatbotService:
     def __init__(self):
         print("Đang khởi tạo ChatbotService (Manual Agent)...")
+        from langchain_community.llms import Ollama
+        from langchain_community.vectorstores import FAISS
+        from langchain_huggingface import HuggingFaceEmbeddings
         # Dùng Ollama bản thường
         self.llm = Ollama(model=config.LLM_MODEL_NAME)
         
@@ -370,4 +375,19 @@ class ChatbotService:
         return self.agent.run(question)
 
 # --- INSTANCE ---
-chatbot_service = ChatbotService()
\ No newline at end of file
+# Tạo ở lần gọi đầu tiên (main.py khởi động nó trong nền khi server lên), một lần duy nhất dù nhiều luồng cùng gọi
+_chatbot_service: Optional[ChatbotService] = None
+_chatbot_service_lock = threading.Lock()
+
+
+def get_chatbot_service() -> ChatbotService:
+    global _chatbot_service
+    if _chatbot_service is None:
+        with _chatbot_service_lock:
+            if _chatbot_service is None:
+                _chatbot_service = ChatbotService()
+    return _chatbot_service
+
+
+def chatbot_service_ready() -> bool:
+    return _chatbot_service is not None